@@ -0,0 +1,9 @@
+"""Benchmarks of y-cli storage and network paths on synthetic data."""
+
+from chat.repository.cloudflare_d1_local import LocalD1Database, SqliteD1Engine
+from .corpus import CorpusConfig, CorpusGenerator, generate_corpus
+from .d1_server import D1StandInServer
+from .storage import BACKENDS, run_storage_benchmark
+from .timing import Samples
+
+__all__ = ['CorpusConfig', 'CorpusGenerator', 'generate_corpus', 'LocalD1Database', 'SqliteD1Engine', 'D1StandInServer', 'BACKENDS', 'run_storage_benchmark', 'Samples']
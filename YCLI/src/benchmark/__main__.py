@@ -0,0 +1,195 @@
+"""Run benchmarks: python -m benchmark <suite> [options]"""
+import asyncio
+import json
+import platform
+import sys
+from importlib import metadata
+from typing import Dict, Optional
+
+import click
+
+from util import get_iso8601_timestamp
+from .corpus import CorpusConfig
+from .storage import BACKENDS, run_storage_benchmark
+from .d1_latency import run_d1_latency_benchmark
+from .d1_compression import run_d1_compression_benchmark
+from .d1_server import D1StandInServer
+from .provider_ttft import run_provider_ttft_benchmark
+from chat.repository.cloudflare_d1_compression import CODECS
+
+def environment() -> Dict:
+    """Describe the environment a benchmark ran in"""
+    try:
+        version = metadata.version('y-cli')
+    except metadata.PackageNotFoundError:
+        version = None
+    return {
+        'y_cli_version': version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': get_iso8601_timestamp(),
+    }
+
+def emit(report: Dict, output: Optional[str]) -> None:
+    """Write a report as JSON to a file, or to stdout"""
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        click.echo(f"Results written to {output}", err=True)
+    else:
+        click.echo(text)
+
+def parse_range(value: str) -> tuple:
+    """Parse MIN-MAX (or a single number) into an inclusive range"""
+    low, _, high = value.partition('-')
+    try:
+        low, high = int(low), int(high or low)
+    except ValueError:
+        raise click.BadParameter(f"expected MIN-MAX, got {value!r}")
+    if low < 0 or high < low:
+        raise click.BadParameter(f"invalid range {value!r}")
+    return (low, high)
+
+@click.group()
+def benchmark():
+    """Benchmark y-cli on synthetic data and print JSON results."""
+
+@benchmark.command('storage')
+@click.option('--backend', '-b', 'backends', multiple=True, type=click.Choice(BACKENDS), help='Backend to benchmark (repeatable, default: all)')
+@click.option('--chats', '-n', default=1000, help='Number of chats in the corpus (default: 1000)')
+@click.option('--messages', default='2-40', help='Messages per chat as MIN-MAX (default: 2-40)')
+@click.option('--message-chars', default='20-2000', help='Characters per message as MIN-MAX (default: 20-2000)')
+@click.option('--tool-ratio', default=0.1, type=click.FloatRange(0, 1), help='Share of turns with a tool call (default: 0.1)')
+@click.option('--tool-result-chars', default='2000-20000', help='Characters per tool result as MIN-MAX (default: 2000-20000)')
+@click.option('--reasoning-ratio', default=0.3, type=click.FloatRange(0, 1), help='Share of answers with reasoning_content (default: 0.3)')
+@click.option('--reasoning-chars', default='200-4000', help='Characters of reasoning_content as MIN-MAX (default: 200-4000)')
+@click.option('--iterations', '-i', default=20, help='Timed calls per operation (default: 20)')
+@click.option('--seed', default=42, help='Corpus seed (default: 42)')
+@click.option('--output', '-o', type=click.Path(), help='Write JSON results to a file instead of stdout')
+def storage(backends, chats: int, messages: str, message_chars: str, tool_ratio: float, tool_result_chars: str,
+            reasoning_ratio: float, reasoning_chars: str, iterations: int, seed: int, output: Optional[str]):
+    """Time list/get/add/update/delete for every ChatRepository backend.
+
+    The cloudflare_d1 backend runs against a local SQLite stand-in of the
+    D1 API, so no Cloudflare account or network is needed.
+    """
+    corpus_config = CorpusConfig(
+        chats=chats,
+        messages_per_chat=parse_range(messages),
+        message_chars=parse_range(message_chars),
+        tool_call_ratio=tool_ratio,
+        tool_result_chars=parse_range(tool_result_chars),
+        reasoning_ratio=reasoning_ratio,
+        reasoning_chars=parse_range(reasoning_chars),
+        seed=seed
+    )
+    report = asyncio.run(run_storage_benchmark(
+        corpus_config,
+        list(backends) or BACKENDS,
+        iterations=iterations,
+        progress=lambda label: click.echo(label, err=True)
+    ))
+    emit({'suite': 'storage', 'environment': environment(), **report}, output)
+
+@benchmark.command('d1-latency')
+@click.option('--chats', '-n', default=50, help='Number of chats to seed (default: 50)')
+@click.option('--iterations', '-i', default=30, help='Timed calls per operation and mode (default: 30)')
+@click.option('--latency-ms', default=0.0, help='Simulated per-request latency in ms (default: 0)')
+@click.option('--handshake-ms', default=30.0, help='Simulated TCP+TLS handshake per new connection in ms (default: 30)')
+@click.option('--output', '-o', type=click.Path(), help='Write JSON results to a file instead of stdout')
+def d1_latency(chats: int, iterations: int, latency_ms: float, handshake_ms: float, output: Optional[str]):
+    """Compare a new HTTP client per D1 statement with the pooled client.
+
+    Runs get_chat, list_chats and update_chat through CloudflareD1Repository
+    against a local HTTP stand-in of the D1 API.
+    """
+    report = asyncio.run(run_d1_latency_benchmark(
+        chats=chats,
+        iterations=iterations,
+        latency_ms=latency_ms,
+        handshake_ms=handshake_ms,
+        progress=lambda label: click.echo(label, err=True)
+    ))
+    emit({'suite': 'd1-latency', 'environment': environment(), **report}, output)
+
+@benchmark.command('provider-ttft')
+@click.option('--turns', '-n', default=30, help='Timed chat completions per mode (default: 30)')
+@click.option('--handshake-ms', default=100.0, help='Simulated DNS+TCP+TLS setup per new connection in ms (default: 100)')
+@click.option('--first-token-ms', default=0.0, help='Simulated time for the model to start answering in ms (default: 0)')
+@click.option('--output', '-o', type=click.Path(), help='Write JSON results to a file instead of stdout')
+def provider_ttft(turns: int, handshake_ms: float, first_token_ms: float, output: Optional[str]):
+    """Compare a new HTTP client per turn with pooled and pre-warmed clients.
+
+    Streams chat completions through OpenAIFormatProvider from a local
+    stand-in of an OpenAI-format API and reports time to first token.
+    """
+    report = asyncio.run(run_provider_ttft_benchmark(
+        turns=turns,
+        handshake_ms=handshake_ms,
+        first_token_ms=first_token_ms,
+        progress=lambda label: click.echo(label, err=True)
+    ))
+    emit({'suite': 'provider-ttft', 'environment': environment(), **report}, output)
+
+@benchmark.command('d1-compression')
+@click.option('--codec', '-c', 'codecs', multiple=True, type=click.Choice(CODECS), help='Codec to compare (repeatable, default: all available)')
+@click.option('--chats', '-n', default=100, help='Number of chats in the corpus (default: 100)')
+@click.option('--messages', default='2-40', help='Messages per chat as MIN-MAX (default: 2-40)')
+@click.option('--tool-ratio', default=0.1, type=click.FloatRange(0, 1), help='Share of turns with a tool call (default: 0.1)')
+@click.option('--tool-result-chars', default='2000-20000', help='Characters per tool result as MIN-MAX (default: 2000-20000)')
+@click.option('--iterations', '-i', default=30, help='Timed update_chat and get_chat calls per codec (default: 30)')
+@click.option('--latency-ms', default=0.0, help='Simulated per-request latency in ms (default: 0)')
+@click.option('--uplink-mbps', default=10.0, help='Upload bandwidth for transfer time estimates (default: 10)')
+@click.option('--downlink-mbps', default=50.0, help='Download bandwidth for transfer time estimates (default: 50)')
+@click.option('--seed', default=42, help='Corpus seed (default: 42)')
+@click.option('--output', '-o', type=click.Path(), help='Write JSON results to a file instead of stdout')
+def d1_compression(codecs, chats: int, messages: str, tool_ratio: float, tool_result_chars: str, iterations: int,
+                   latency_ms: float, uplink_mbps: float, downlink_mbps: float, seed: int, output: Optional[str]):
+    """Compare upload size, stored size and latency of D1 message compression.
+
+    Saves, updates and reads a synthetic corpus through CloudflareD1Repository
+    with each json_content codec against a local HTTP stand-in of the D1 API.
+    """
+    corpus_config = CorpusConfig(
+        chats=chats,
+        messages_per_chat=parse_range(messages),
+        tool_call_ratio=tool_ratio,
+        tool_result_chars=parse_range(tool_result_chars),
+        seed=seed
+    )
+    report = asyncio.run(run_d1_compression_benchmark(
+        corpus_config,
+        iterations=iterations,
+        latency_ms=latency_ms,
+        uplink_mbps=uplink_mbps,
+        downlink_mbps=downlink_mbps,
+        codecs=list(codecs) or None,
+        progress=lambda label: click.echo(label, err=True)
+    ))
+    emit({'suite': 'd1-compression', 'environment': environment(), **report}, output)
+
+@benchmark.command('d1-server')
+@click.option('--db', 'db_path', default=':memory:', help='SQLite file backing the stand-in (default: in memory)')
+@click.option('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+@click.option('--port', '-p', default=8787, help='Port to listen on (default: 8787)')
+@click.option('--latency-ms', default=0.0, help='Simulated per-request latency in ms (default: 0)')
+@click.option('--handshake-ms', default=0.0, help='Simulated handshake per new connection in ms (default: 0)')
+@click.option('--error-rate', default=0.0, type=click.FloatRange(0, 1), help='Share of requests failing with --error-status (default: 0)')
+@click.option('--error-status', default=503, help='HTTP status of injected errors (default: 503)')
+def d1_server(db_path: str, host: str, port: int, latency_ms: float, handshake_ms: float, error_rate: float, error_status: int):
+    """Serve a local stand-in of the D1 /query API backed by SQLite.
+
+    Set cloudflare_d1.base_url to the printed URL (any account_id,
+    database_id and api_token will do) to run y-cli fully offline.
+    """
+    server = D1StandInServer(db_path, latency_ms=latency_ms, handshake_ms=handshake_ms, host=host, port=port,
+                             error_rate=error_rate, error_status=error_status)
+    click.echo(f"D1 stand-in listening on {server.base_url}", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    sys.exit(benchmark())
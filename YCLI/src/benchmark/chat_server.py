@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+class ChatStandInServer:
+    """
+    Local HTTP server speaking the OpenAI-format streaming chat completions API.
+
+    Point a bot's base_url at `base_url` to exercise the real provider code.
+    `handshake_ms` is slept once per new connection to stand in for the DNS
+    lookup and TCP and TLS handshake to the provider, and `first_token_ms`
+    once per request for the model to start answering, so connection reuse
+    shows up in time to first token as it would remotely. Every reply
+    streams `chunks` content deltas followed by [DONE].
+    """
+    def __init__(self, handshake_ms: float = 0.0, first_token_ms: float = 0.0, chunks: int = 5,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.handshake_ms = handshake_ms
+        self.first_token_ms = first_token_ms
+        self.chunks = chunks
+        self.connections = 0
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; Nagle would hold the body back
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stand_in.connections += 1
+                if stand_in.handshake_ms:
+                    time.sleep(stand_in.handshake_ms / 1000)
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                # What pre-warming sends; answered without closing the connection, like real APIs
+                stand_in.requests += 1
+                self.send_response(405)
+                self.send_header('Allow', 'POST')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                stand_in.requests += 1
+                length = int(self.headers.get('Content-Length', 0))
+                model = json.loads(self.rfile.read(length) or b'{}').get('model', 'stand-in')
+                if stand_in.first_token_ms:
+                    time.sleep(stand_in.first_token_ms / 1000)
+                events = [
+                    {'model': model, 'provider': 'stand-in',
+                     'choices': [{'delta': {'content': f"token{i} "}}]}
+                    for i in range(stand_in.chunks)
+                ]
+                data = ''.join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                body = data.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self) -> 'ChatStandInServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'ChatStandInServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
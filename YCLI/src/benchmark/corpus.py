@@ -0,0 +1,140 @@
+import random
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from chat.models import Chat, Message
+
+WORDS = (
+    "the model returns a response with tokens context window latency cache request "
+    "python function async await repository storage query index vector embedding "
+    "error retry timeout stream chunk json schema database table column row update "
+    "user assistant tool server prompt system reasoning answer question explain why "
+    "how what performance benchmark memory cpu disk network file path config option "
+    "数据 模型 请求 缓存 延迟 问题 回答 解释 性能 存储"
+).split()
+
+YEAR_MS = 365 * 24 * 3600 * 1000
+
+TOOLS = [
+    ("brave-search", "brave_web_search"),
+    ("filesystem", "read_file"),
+    ("fetch", "fetch"),
+    ("sqlite", "read_query"),
+]
+
+@dataclass
+class CorpusConfig:
+    """Shape of a synthetic chat corpus"""
+    chats: int = 1000
+    messages_per_chat: Tuple[int, int] = (2, 40)
+    message_chars: Tuple[int, int] = (20, 2000)
+    tool_call_ratio: float = 0.1
+    tool_result_chars: Tuple[int, int] = (2000, 20000)
+    reasoning_ratio: float = 0.3
+    reasoning_chars: Tuple[int, int] = (200, 4000)
+    models: List[str] = field(default_factory=lambda: [
+        "anthropic/claude-3.7-sonnet", "openai/gpt-4o", "deepseek/deepseek-r1", "google/gemini-2.0-flash"
+    ])
+    providers: List[str] = field(default_factory=lambda: ["OpenRouter", "Anthropic", "DeepSeek", "Google"])
+    seed: int = 42
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+class CorpusGenerator:
+    """
+    Deterministic generator of realistic synthetic chats.
+
+    Chats alternate user and assistant turns linked through parent_id, with
+    assistant metadata, optional reasoning_content and MCP tool calls whose
+    results come back as large user messages. The same config and seed
+    always produce the same corpus.
+    """
+    def __init__(self, config: CorpusConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        # Start from a fixed instant and spread chats over about a year so runs are comparable
+        self.clock = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+        self.counter = 0
+
+    def _text(self, chars: Tuple[int, int]) -> str:
+        target = self.random.randint(*chars)
+        words = []
+        length = 0
+        while length < target:
+            word = self.random.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)[:target]
+
+    def _next_id(self) -> str:
+        self.counter += 1
+        return f"{self.counter:06x}"
+
+    def _message(self, role: str, content: str, parent_id: str, **fields) -> Message:
+        self.clock += self.random.randint(1000, 120000)
+        timestamp = datetime.fromtimestamp(self.clock / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+        return Message(
+            role=role,
+            content=content,
+            timestamp=timestamp,
+            unix_timestamp=self.clock,
+            id=self._next_id(),
+            parent_id=parent_id,
+            **fields
+        )
+
+    def chat(self) -> Chat:
+        """Generate one chat"""
+        config = self.config
+        self.clock += self.random.randint(60000, max(60000, 2 * YEAR_MS // max(1, config.chats)))
+        n_messages = self.random.randint(*config.messages_per_chat)
+        model_index = self.random.randrange(len(config.models))
+        model = config.models[model_index]
+        provider = config.providers[model_index % len(config.providers)]
+
+        messages: List[Message] = []
+        parent_id = None
+        while len(messages) < n_messages:
+            user = self._message("user", self._text(config.message_chars), parent_id)
+            messages.append(user)
+            reply_to = user.id
+            fields = {"model": model, "provider": provider}
+            if self.random.random() < config.reasoning_ratio:
+                fields["reasoning_content"] = self._text(config.reasoning_chars)
+            if self.random.random() < config.tool_call_ratio:
+                server, tool = self.random.choice(TOOLS)
+                arguments = {"query": self._text((10, 60))}
+                call = self._message("assistant", self._text(config.message_chars), user.id,
+                                     server=server, tool=tool, arguments=arguments, **fields)
+                result = self._message("user", self._text(config.tool_result_chars), call.id,
+                                       server=server, tool=tool, arguments=arguments)
+                messages.extend([call, result])
+                reply_to = result.id
+                fields.pop("reasoning_content", None)
+            answer = self._message("assistant", self._text(config.message_chars), reply_to, **fields)
+            messages.append(answer)
+            parent_id = answer.id
+
+        create_time = messages[0].timestamp
+        return Chat(
+            id=self._next_id(),
+            create_time=create_time,
+            update_time=messages[-1].timestamp,
+            messages=messages,
+            selected_message_id=messages[-1].id
+        )
+
+def generate_corpus(config: CorpusConfig) -> List[Chat]:
+    """
+    Generate a synthetic chat corpus.
+
+    Args:
+        config: Shape of the corpus
+
+    Returns:
+        List[Chat]: The generated chats, oldest first
+    """
+    generator = CorpusGenerator(config)
+    return [generator.chat() for _ in range(config.chats)]
@@ -0,0 +1,127 @@
+import copy
+import random
+from typing import Callable, Dict, List, Optional
+
+from chat.repository.cloudflare_d1 import CloudflareD1Repository
+from chat.repository.cloudflare_d1_compression import available_codecs
+from chat.repository.cloudflare_d1_util import D1Database
+from chat.repository.metrics import OperationMetrics, collect
+from .corpus import CorpusConfig, generate_corpus
+from .d1_server import D1StandInServer
+from .storage import _with_reply
+from .timing import Samples
+
+async def _measured(samples: Samples, totals: Dict[str, int], pending) -> None:
+    """Await an operation, adding its time to samples and its request bytes to totals"""
+    metrics = OperationMetrics(operation='benchmark', backend='cloudflare_d1')
+    with collect(metrics):
+        with samples.time():
+            await pending
+    totals['bytes_written'] += metrics.bytes_written
+    totals['bytes_read'] += metrics.bytes_read
+
+def _transfer_ms(size: int, mbps: float) -> float:
+    return round(size * 8 / (mbps * 1000), 3)
+
+async def run_d1_compression_benchmark(config: CorpusConfig, iterations: int = 30, latency_ms: float = 0.0,
+                                       uplink_mbps: float = 10.0, downlink_mbps: float = 50.0,
+                                       codecs: Optional[List[str]] = None,
+                                       progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Compare upload size, stored size and latency of message row codecs.
+
+    For every codec a fresh D1StandInServer is seeded with the same corpus,
+    then whole chats are saved (the bulk path of import and migration),
+    turns are appended with update_chat and chats are read with get_chat.
+    The stand-in adds no bandwidth cost, so the time the measured request
+    bytes would take on the given links is reported alongside.
+
+    Args:
+        config: Shape of the corpus
+        iterations: Timed update_chat and get_chat calls per codec
+        latency_ms: Simulated per-request latency
+        uplink_mbps: Upload bandwidth for the transfer time estimates
+        downlink_mbps: Download bandwidth for the transfer time estimates
+        codecs: Codecs to compare (default: every available one)
+        progress: Optional callback receiving "codec: step" labels
+
+    Returns:
+        Dict: Per-codec bytes, stored size and timings, plus ratios to 'none'
+    """
+    corpus = generate_corpus(config)
+    report = {
+        'chats': config.chats,
+        'iterations': iterations,
+        'latency_ms': latency_ms,
+        'uplink_mbps': uplink_mbps,
+        'downlink_mbps': downlink_mbps,
+        'codecs': {}
+    }
+    for codec in codecs or available_codecs():
+        with D1StandInServer(latency_ms=latency_ms) as server:
+            db = D1Database(account_id='local', database_id='local', api_token='local', base_url=server.base_url)
+            repository = CloudflareD1Repository(user_prefix='benchmark', db=db, compression=codec)
+            await repository._ensure_schema_exists()
+            rng = random.Random(0)
+
+            if progress:
+                progress(f"{codec}: save_chats")
+            save = Samples()
+            save_bytes = {'bytes_written': 0, 'bytes_read': 0}
+            await _measured(save, save_bytes, repository.save_chats([copy.deepcopy(chat) for chat in corpus]))
+
+            if progress:
+                progress(f"{codec}: update_chat")
+            update = Samples()
+            update_bytes = {'bytes_written': 0, 'bytes_read': 0}
+            for _ in range(iterations):
+                chat = _with_reply(rng.choice(corpus))
+                await _measured(update, update_bytes, repository.update_chat(chat))
+
+            if progress:
+                progress(f"{codec}: get_chat")
+            # A fresh repository, so reads are not served from known signatures
+            reader = CloudflareD1Repository(user_prefix='benchmark', db=db, compression=codec)
+            read = Samples()
+            read_bytes = {'bytes_written': 0, 'bytes_read': 0}
+            for _ in range(iterations):
+                await _measured(read, read_bytes, reader.get_chat(rng.choice(corpus).id))
+
+            stored = server.engine.execute(
+                "SELECT SUM(LENGTH(json_content)) AS bytes, COUNT(*) AS rows FROM message"
+            )[0]['results'][0]
+            await repository.close()
+
+        report['codecs'][codec] = {
+            'stored_message_bytes': stored['bytes'],
+            'message_rows': stored['rows'],
+            'save_chats': {
+                'bytes_uploaded': save_bytes['bytes_written'],
+                'upload_ms_estimate': _transfer_ms(save_bytes['bytes_written'], uplink_mbps),
+                **save.summary()
+            },
+            'update_chat': {
+                'bytes_uploaded_per_call': update_bytes['bytes_written'] // max(1, iterations),
+                'upload_ms_estimate': _transfer_ms(update_bytes['bytes_written'] // max(1, iterations), uplink_mbps),
+                **update.summary()
+            },
+            'get_chat': {
+                'bytes_downloaded_per_call': read_bytes['bytes_read'] // max(1, iterations),
+                'download_ms_estimate': _transfer_ms(read_bytes['bytes_read'] // max(1, iterations), downlink_mbps),
+                **read.summary()
+            },
+        }
+
+    baseline = report['codecs'].get('none')
+    if baseline:
+        report['ratio_to_none'] = {
+            codec: {
+                'stored': round(result['stored_message_bytes'] / baseline['stored_message_bytes'], 3),
+                'save_chats_upload': round(result['save_chats']['bytes_uploaded'] / baseline['save_chats']['bytes_uploaded'], 3),
+                'get_chat_download': round(
+                    result['get_chat']['bytes_downloaded_per_call'] / max(1, baseline['get_chat']['bytes_downloaded_per_call']), 3
+                ),
+            }
+            for codec, result in report['codecs'].items() if codec != 'none'
+        }
+    return report
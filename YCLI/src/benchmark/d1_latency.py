@@ -0,0 +1,98 @@
+import copy
+import json
+import random
+from typing import Callable, Dict, Optional
+
+import httpx
+
+from chat.repository.cloudflare_d1 import CloudflareD1Repository
+from chat.repository.cloudflare_d1_util import D1Database
+from chat.repository.metrics import phase, add_bytes, add_count
+from .corpus import CorpusConfig, generate_corpus
+from .d1_server import D1StandInServer
+from .storage import _with_reply
+from .timing import Samples
+
+class PerRequestClientD1Database(D1Database):
+    """D1Database that opens a new HTTP client for every statement, as it did before pooling"""
+    async def _post(self, url: str, payload: Dict, read: bool = False) -> httpx.Response:
+        body = json.dumps(payload).encode('utf-8')
+        with phase('request'):
+            async with httpx.AsyncClient(headers=self.headers, timeout=self.timeout) as client:
+                response = await client.post(url, content=body)
+        add_bytes(read=len(response.content), written=len(body))
+        add_count('requests')
+        return response
+
+CLIENT_MODES = {
+    'per_request': PerRequestClientD1Database,
+    'pooled': D1Database,
+}
+
+def _database(mode: str, server: D1StandInServer) -> D1Database:
+    return CLIENT_MODES[mode](account_id='local', database_id='local', api_token='local', base_url=server.base_url)
+
+async def run_d1_latency_benchmark(chats: int = 50, iterations: int = 30, latency_ms: float = 0.0,
+                                   handshake_ms: float = 30.0,
+                                   progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Compare per-statement clients with the pooled D1 client over local HTTP.
+
+    Both modes run the same repository operations against a D1StandInServer
+    that charges handshake_ms per new connection and latency_ms per request.
+
+    Args:
+        chats: Number of chats to seed
+        iterations: Timed calls per operation and mode
+        latency_ms: Simulated per-request latency
+        handshake_ms: Simulated cost of opening a connection
+        progress: Optional callback receiving "mode: operation" labels
+
+    Returns:
+        Dict: Timing summaries and connection counts per mode, plus median speedups
+    """
+    corpus = generate_corpus(CorpusConfig(chats=chats, messages_per_chat=(2, 20)))
+    report = {
+        'chats': chats,
+        'iterations': iterations,
+        'latency_ms': latency_ms,
+        'handshake_ms': handshake_ms,
+        'modes': {}
+    }
+    with D1StandInServer(latency_ms=latency_ms, handshake_ms=handshake_ms) as server:
+        seeder = CloudflareD1Repository(user_prefix='benchmark', db=_database('pooled', server))
+        await seeder._ensure_schema_exists()
+        await seeder._write_chats([copy.deepcopy(chat) for chat in corpus])
+        await seeder.close()
+
+        for mode in CLIENT_MODES:
+            rng = random.Random(0)
+            repository = CloudflareD1Repository(user_prefix='benchmark', db=_database(mode, server))
+            connections_before = server.connections
+            operations = {
+                'get_chat': lambda: repository.get_chat(rng.choice(corpus).id),
+                'list_chats': lambda: repository.list_chats(limit=10),
+                'update_chat': lambda: repository.update_chat(_with_reply(rng.choice(corpus))),
+            }
+            results = {}
+            for name, operation in operations.items():
+                if progress:
+                    progress(f"{mode}: {name}")
+                samples = Samples()
+                for _ in range(iterations):
+                    pending = operation()
+                    with samples.time():
+                        await pending
+                results[name] = samples.summary()
+            await repository.close()
+            report['modes'][mode] = {
+                'connections_opened': server.connections - connections_before,
+                'operations': results
+            }
+
+    per_request, pooled = report['modes']['per_request']['operations'], report['modes']['pooled']['operations']
+    report['speedup'] = {
+        name: round(per_request[name]['median_ms'] / pooled[name]['median_ms'], 2)
+        for name in pooled if pooled[name]['median_ms']
+    }
+    return report
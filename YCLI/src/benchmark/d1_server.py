@@ -0,0 +1,125 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from chat.repository.cloudflare_d1_local import SqliteD1Engine
+
+class D1StandInServer:
+    """
+    Local HTTP server speaking the Cloudflare D1 /query API, backed by SQLite.
+
+    Point D1Database at `base_url` to exercise the real HTTP client code.
+    `handshake_ms` is slept once per new connection to stand in for the TCP
+    and TLS handshake to api.cloudflare.com, and `latency_ms` once per
+    request, so connection reuse shows up in timings as it would remotely.
+    Request bodies larger than `max_body_bytes` are refused with 413, like
+    the real API does past its payload limit. A share `error_rate` of
+    requests fails with `error_status` before any statement runs, to
+    exercise retries and the circuit breaker; 429 replies carry Retry-After.
+    """
+    def __init__(self, db_path: str = ":memory:", latency_ms: float = 0.0, handshake_ms: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0, max_body_bytes: Optional[int] = None,
+                 error_rate: float = 0.0, error_status: int = 503, seed: Optional[int] = None):
+        self.engine = SqliteD1Engine(db_path)
+        self.latency_ms = latency_ms
+        self.handshake_ms = handshake_ms
+        self.max_body_bytes = max_body_bytes
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/client/v4/accounts/local/d1/database/local"
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; Nagle would hold the body back
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stand_in.connections += 1
+                if stand_in.handshake_ms:
+                    time.sleep(stand_in.handshake_ms / 1000)
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                stand_in.requests += 1
+                if stand_in.latency_ms:
+                    time.sleep(stand_in.latency_ms / 1000)
+                length = int(self.headers.get('Content-Length', 0))
+                raw = self.rfile.read(length)
+                if stand_in.max_body_bytes is not None and length > stand_in.max_body_bytes:
+                    self._reply(413, {'result': None, 'success': False, 'messages': [],
+                                      'errors': [{'code': 7011, 'message': 'Request body too large'}]})
+                    return
+                if stand_in.error_rate and stand_in.rng.random() < stand_in.error_rate:
+                    stand_in.errors += 1
+                    headers = {'Retry-After': '1'} if stand_in.error_status == 429 else {}
+                    self._reply(stand_in.error_status, {'result': None, 'success': False, 'messages': [],
+                                                        'errors': [{'code': 7500, 'message': 'Injected error'}]}, headers)
+                    return
+                try:
+                    payload = json.loads(raw)
+                    if 'batch' in payload:
+                        result = stand_in.engine.execute_batch(payload['batch'])
+                    else:
+                        result = stand_in.engine.execute(payload['sql'], payload.get('params'))
+                    body = {'result': result, 'success': True, 'errors': [], 'messages': []}
+                    status = 200
+                except Exception as e:
+                    body = {'result': None, 'success': False, 'errors': [{'code': 7500, 'message': str(e)}], 'messages': []}
+                    status = 400
+                self._reply(status, body)
+
+            def _reply(self, status: int, body: dict, headers: Optional[dict] = None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self) -> 'D1StandInServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests in the calling thread until interrupted"""
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.engine.close()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.engine.close()
+
+    def __enter__(self) -> 'D1StandInServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,84 @@
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from bot.models import BotConfig
+from chat.provider.http_client import close_clients
+from chat.provider.openai_format_provider import OpenAIFormatProvider
+from chat.utils.message_utils import create_message
+from .chat_server import ChatStandInServer
+from .timing import Samples
+
+class FirstChunkTimer:
+    """Display manager stand-in recording when the first streamed chunk arrives"""
+    def __init__(self):
+        self.first_chunk_at: Optional[float] = None
+
+    async def stream_response(self, response_stream) -> Tuple[str, str]:
+        content = ''
+        async for chunk in response_stream:
+            if self.first_chunk_at is None:
+                self.first_chunk_at = time.perf_counter()
+            content += chunk.choices[0].delta.content or ''
+        return content, None
+
+CLIENT_MODES = ['per_turn', 'pooled', 'prewarmed']
+
+async def run_provider_ttft_benchmark(turns: int = 30, handshake_ms: float = 100.0, first_token_ms: float = 0.0,
+                                      progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Compare a new HTTP client per turn with pooled and pre-warmed clients.
+
+    All modes send the same conversation through OpenAIFormatProvider to a
+    ChatStandInServer that charges handshake_ms per new connection and
+    first_token_ms per request. Time to first token runs from the call to
+    the first streamed chunk; per_turn closes the shared clients before
+    every turn, as the providers did before pooling, and prewarmed does
+    too but then pre-warms the connection untimed, as a session does while
+    the user types before the first turn or after keep-alive expiry.
+
+    Args:
+        turns: Timed chat completions per mode
+        handshake_ms: Simulated DNS, TCP and TLS cost of opening a connection
+        first_token_ms: Simulated time for the model to start answering
+        progress: Optional callback receiving mode labels
+
+    Returns:
+        Dict: Time to first token and connection counts per mode, plus median savings over per_turn
+    """
+    report = {
+        'turns': turns,
+        'handshake_ms': handshake_ms,
+        'first_token_ms': first_token_ms,
+        'modes': {}
+    }
+    with ChatStandInServer(handshake_ms=handshake_ms, first_token_ms=first_token_ms) as server:
+        provider = OpenAIFormatProvider(BotConfig(name='benchmark', base_url=server.base_url, api_key='local', model='stand-in'))
+        messages = [create_message('user', 'Hello')]
+        for mode in CLIENT_MODES:
+            if progress:
+                progress(mode)
+            await close_clients()
+            connections_before = server.connections
+            ttft = Samples()
+            for _ in range(turns):
+                if mode != 'pooled':
+                    await close_clients()
+                if mode == 'prewarmed':
+                    await provider.prewarm()
+                timer = FirstChunkTimer()
+                provider.set_display_manager(timer)
+                start = time.perf_counter()
+                await provider.call_chat_completions(messages)
+                ttft.seconds.append(timer.first_chunk_at - start)
+            report['modes'][mode] = {
+                'connections_opened': server.connections - connections_before,
+                'ttft': ttft.summary()
+            }
+        await close_clients()
+
+    per_turn = report['modes']['per_turn']['ttft']
+    report['median_saving_ms'] = {
+        mode: round(per_turn['median_ms'] - report['modes'][mode]['ttft']['median_ms'], 3)
+        for mode in CLIENT_MODES if mode != 'per_turn'
+    }
+    return report
@@ -0,0 +1,156 @@
+import copy
+import os
+import random
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+from chat.models import Chat
+from chat.repository import ChatRepository
+from chat.repository.file import FileRepository
+from chat.repository.cloudflare_d1 import CloudflareD1Repository
+from chat.repository.cloudflare_d1_local import LocalD1Database
+from chat.utils.message_utils import create_message
+from .corpus import CorpusConfig, generate_corpus
+from .timing import Samples
+
+BACKENDS = ['file', 'cloudflare_d1']
+
+def create_repository(backend: str, work_dir: str) -> ChatRepository:
+    """
+    Create an isolated repository of the given backend inside work_dir.
+
+    Args:
+        backend: One of BACKENDS
+        work_dir: Directory for the backend's files
+
+    Returns:
+        ChatRepository: An empty repository
+    """
+    if backend == 'file':
+        return FileRepository(data_file=os.path.join(work_dir, 'chat.jsonl'))
+    if backend == 'cloudflare_d1':
+        db = LocalD1Database(os.path.join(work_dir, 'd1.sqlite3'))
+        return CloudflareD1Repository(user_prefix='benchmark', db=db)
+    raise ValueError(f"Unsupported backend: {backend}")
+
+async def seed_repository(repository: ChatRepository, chats: List[Chat]) -> None:
+    """Load a corpus into an empty repository"""
+    if isinstance(repository, CloudflareD1Repository):
+        await repository._ensure_schema_exists()
+    await repository._write_chats([copy.deepcopy(chat) for chat in chats])
+
+def _list_filters(chats: List[Chat], rng: random.Random) -> Dict[str, Dict]:
+    """Pick list_chats filters that match part of the corpus"""
+    sample = rng.choice(chats)
+    assistant = next((m for m in sample.messages if m.role == 'assistant'), sample.messages[0])
+    keyword = max(str(assistant.content).split(), key=len)
+    return {
+        'list_chats': {},
+        'list_chats[keyword]': {'keyword': keyword},
+        'list_chats[model]': {'model': assistant.model or ''},
+        'list_chats[provider]': {'provider': assistant.provider or ''},
+    }
+
+async def benchmark_repository(repository: ChatRepository, chats: List[Chat], extra_chats: List[Chat],
+                               iterations: int, seed: int = 0,
+                               progress: Optional[Callable[[str], None]] = None) -> Dict[str, Dict]:
+    """
+    Time every ChatRepository operation against a seeded repository.
+
+    Args:
+        repository: Repository already holding `chats`
+        chats: The corpus in the repository
+        extra_chats: Chats not yet stored, used by add_chat (at least `iterations`)
+        iterations: Number of timed calls per operation
+        seed: Seed for choosing chats and filters
+        progress: Optional callback receiving each operation name
+
+    Returns:
+        Dict: Timing summary per operation
+    """
+    rng = random.Random(seed)
+    results: Dict[str, Dict] = {}
+
+    for name, kwargs in _list_filters(chats, rng).items():
+        if progress:
+            progress(name)
+        samples = Samples()
+        for _ in range(iterations):
+            with samples.time():
+                listed = await repository.list_chats(limit=10, **kwargs)
+        results[name] = {**samples.summary(), 'returned': len(listed)}
+
+    operations = {
+        'list_chat_summaries': lambda i: repository.list_chat_summaries(limit=10),
+        'get_chat': lambda i: repository.get_chat(rng.choice(chats).id),
+        'add_chat': lambda i: repository.add_chat(copy.deepcopy(extra_chats[i])),
+        'update_chat': lambda i: repository.update_chat(_with_reply(rng.choice(chats))),
+        'delete_chat': lambda i: repository.delete_chat(extra_chats[i].id),
+    }
+    for name, operation in operations.items():
+        if progress:
+            progress(name)
+        samples = Samples()
+        for i in range(iterations):
+            # Arguments are prepared when the coroutine is created, outside the timed block
+            pending = operation(i)
+            with samples.time():
+                await pending
+        results[name] = samples.summary()
+    return results
+
+def _with_reply(chat: Chat) -> Chat:
+    """Copy a chat with one more exchange appended, as a chat turn would"""
+    chat = copy.deepcopy(chat)
+    branch = chat.active_messages()
+    chat.update_messages(branch + [
+        create_message('user', 'benchmark follow-up question'),
+        create_message('assistant', 'benchmark follow-up answer')
+    ])
+    return chat
+
+async def run_storage_benchmark(corpus_config: CorpusConfig, backends: List[str], iterations: int = 20,
+                                progress: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Generate a corpus and benchmark every requested backend on it.
+
+    Each backend gets its own temporary directory; the D1 backend runs
+    against LocalD1Database instead of Cloudflare.
+
+    Args:
+        corpus_config: Shape of the synthetic corpus
+        backends: Backends to benchmark, from BACKENDS
+        iterations: Number of timed calls per operation
+        progress: Optional callback receiving "backend: operation" labels
+
+    Returns:
+        Dict: Corpus statistics and timing summaries per backend and operation
+    """
+    all_chats = generate_corpus(CorpusConfig(**{**corpus_config.to_dict(), 'chats': corpus_config.chats + iterations}))
+    chats, extra_chats = all_chats[:corpus_config.chats], all_chats[corpus_config.chats:]
+    report = {
+        'corpus': {
+            **corpus_config.to_dict(),
+            'messages': sum(len(chat.messages) for chat in chats),
+        },
+        'iterations': iterations,
+        'backends': {}
+    }
+
+    for backend in backends:
+        with tempfile.TemporaryDirectory(prefix=f"y-cli-bench-{backend}-") as work_dir:
+            repository = create_repository(backend, work_dir)
+            if progress:
+                progress(f"{backend}: seeding")
+            await seed_repository(repository, chats)
+            store_bytes = _directory_size(work_dir)
+            operations = await benchmark_repository(
+                repository, chats, extra_chats, iterations, seed=corpus_config.seed,
+                progress=(lambda name, backend=backend: progress(f"{backend}: {name}")) if progress else None
+            )
+            report['backends'][backend] = {'store_bytes': store_bytes, 'operations': operations}
+            await repository.close()
+    return report
+
+def _directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
@@ -0,0 +1,38 @@
+import statistics
+import time
+from typing import Dict, List
+
+class Samples:
+    """Wall-clock samples of one benchmarked operation"""
+    def __init__(self):
+        self.seconds: List[float] = []
+
+    def time(self) -> 'SampleTimer':
+        return SampleTimer(self)
+
+    def summary(self) -> Dict[str, float]:
+        """Summarize the samples in milliseconds"""
+        if not self.seconds:
+            return {'iterations': 0}
+        ms = sorted(s * 1000 for s in self.seconds)
+        return {
+            'iterations': len(ms),
+            'min_ms': round(ms[0], 3),
+            'median_ms': round(statistics.median(ms), 3),
+            'mean_ms': round(statistics.fmean(ms), 3),
+            'p95_ms': round(ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))], 3),
+            'max_ms': round(ms[-1], 3),
+        }
+
+class SampleTimer:
+    """Context manager adding the duration of its block to Samples"""
+    def __init__(self, samples: Samples):
+        self.samples = samples
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.seconds.append(time.perf_counter() - self.start)
+        return False
@@ -0,0 +1,6 @@
+"""Columnar views of the chat store for analytics and export."""
+
+from .columns import MessageColumns, load_message_columns
+from .stats import UsageRow, usage_report, GROUP_BY_CHOICES, PERIOD_CHOICES
+
+__all__ = ['MessageColumns', 'load_message_columns', 'UsageRow', 'usage_report', 'GROUP_BY_CHOICES', 'PERIOD_CHOICES']
@@ -0,0 +1,148 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+from chat.models import Chat
+from chat.repository import ChatRepository
+from chat.repository.file import FileRepository
+from chat.repository.instrumented import unwrap_repository
+from chat.utils.message_utils import get_message_text
+
+# Categorical columns are dictionary-encoded; code 0 always means "not set"
+CATEGORICAL_COLUMNS = ['chat', 'role', 'model', 'provider', 'tool']
+NUMERIC_COLUMNS = {
+    'unix_timestamp': np.int64,
+    'content_chars': np.int64,
+    'reasoning_chars': np.int64,
+}
+
+class DictionaryEncoder:
+    """Map string values to dense integer codes, reserving 0 for None"""
+    def __init__(self):
+        self.values: List[Optional[str]] = [None]
+        self._codes = {None: 0}
+
+    def encode(self, value: Optional[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._codes[value] = code
+        return code
+
+@dataclass
+class MessageColumns:
+    """
+    Chat messages laid out as columnar NumPy arrays.
+
+    One row per message. Categorical fields are stored as int32 codes into
+    the matching entry of `dictionaries`, so group-by aggregations run over
+    plain integer arrays instead of Message objects.
+    """
+    columns: Dict[str, np.ndarray]
+    dictionaries: Dict[str, List[Optional[str]]]
+    source: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.columns['unix_timestamp'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def labels(self, name: str, codes: np.ndarray) -> List[Optional[str]]:
+        """Decode integer codes of a categorical column back into strings"""
+        values = self.dictionaries[name]
+        return [values[code] for code in codes]
+
+    @classmethod
+    async def from_chats(cls, chats: AsyncIterator[Chat], source: Optional[str] = None) -> 'MessageColumns':
+        """
+        Build columns by streaming over chats once.
+
+        Args:
+            chats: Async iterator of chats, e.g. ChatRepository.iter_chats()
+            source: Optional signature of the store the columns were built from
+
+        Returns:
+            MessageColumns: The built columns
+        """
+        encoders = {name: DictionaryEncoder() for name in CATEGORICAL_COLUMNS}
+        values: Dict[str, List[int]] = {name: [] for name in CATEGORICAL_COLUMNS + list(NUMERIC_COLUMNS)}
+        async for chat in chats:
+            chat_code = encoders['chat'].encode(chat.id)
+            for message in chat.messages:
+                tool = f"{message.server}/{message.tool}" if message.tool else None
+                values['chat'].append(chat_code)
+                values['role'].append(encoders['role'].encode(message.role))
+                values['model'].append(encoders['model'].encode(message.model))
+                values['provider'].append(encoders['provider'].encode(message.provider))
+                values['tool'].append(encoders['tool'].encode(tool))
+                values['unix_timestamp'].append(message.unix_timestamp)
+                values['content_chars'].append(len(get_message_text(message)))
+                values['reasoning_chars'].append(len(message.reasoning_content) if message.reasoning_content else 0)
+
+        columns = {name: np.asarray(values[name], dtype=np.int32) for name in CATEGORICAL_COLUMNS}
+        columns.update({name: np.asarray(values[name], dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()})
+        dictionaries = {name: encoder.values for name, encoder in encoders.items()}
+        return cls(columns=columns, dictionaries=dictionaries, source=source)
+
+    def save(self, path: str) -> None:
+        """Write columns and dictionaries to a single .npz file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = json.dumps({'dictionaries': self.dictionaries, 'source': self.source})
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, __header__=np.array(header), **self.columns)
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['MessageColumns']:
+        """Read columns written by save(), or None if the file is missing or unreadable"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                header = json.loads(str(data['__header__']))
+                columns = {name: data[name] for name in data.files if name != '__header__'}
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(columns=columns, dictionaries=header['dictionaries'], source=header.get('source'))
+
+def store_signature(repository: ChatRepository) -> Optional[str]:
+    """
+    Cheap fingerprint of the chat store used to validate cached columns.
+
+    Only the file store can be fingerprinted without reading it; other
+    backends return None and are always rebuilt.
+    """
+    repository = unwrap_repository(repository)
+    if isinstance(repository, FileRepository) and os.path.exists(repository.data_file):
+        stat = os.stat(repository.data_file)
+        return f"{repository.data_file}:{stat.st_size}:{stat.st_mtime_ns}"
+    return None
+
+async def load_message_columns(repository: ChatRepository, cache_file: str, refresh: bool = False) -> MessageColumns:
+    """
+    Get message columns for a store, building and caching them on first use.
+
+    Args:
+        repository: The chat repository to read from
+        cache_file: Path of the .npz cache
+        refresh: Rebuild even if the cache is still valid
+
+    Returns:
+        MessageColumns: Columns covering every message in the store
+    """
+    source = store_signature(repository)
+    if not refresh and source is not None:
+        cached = MessageColumns.load(cache_file)
+        if cached is not None and cached.source == source:
+            return cached
+
+    columns = await MessageColumns.from_chats(repository.iter_chats(), source=source)
+    if source is not None:
+        columns.save(cache_file)
+    return columns
@@ -0,0 +1,112 @@
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from .columns import MessageColumns
+
+GROUP_BY_CHOICES = ['model', 'provider', 'tool', 'role']
+PERIOD_CHOICES = ['all', 'day', 'week', 'month', 'year']
+
+@dataclass
+class UsageRow:
+    group: Optional[str]
+    period: Optional[str]
+    messages: int
+    chats: int
+    content_chars: int
+    reasoning_chars: int
+    tool_calls: int
+
+def _period_buckets(unix_timestamps: np.ndarray, period: str) -> np.ndarray:
+    """Truncate millisecond timestamps (shifted to local time) to period starts"""
+    local = (unix_timestamps + time.localtime().tm_gmtoff * 1000).astype('datetime64[ms]')
+    if period == 'day':
+        return local.astype('datetime64[D]')
+    if period == 'week':
+        days = local.astype('datetime64[D]')
+        # 1970-01-01 was a Thursday; shift every day back to its Monday
+        weekday = (days.astype(np.int64) + 3) % 7
+        return days - weekday.astype('timedelta64[D]')
+    if period == 'month':
+        return local.astype('datetime64[M]')
+    if period == 'year':
+        return local.astype('datetime64[Y]')
+    return np.zeros(len(unix_timestamps), dtype='datetime64[D]')
+
+def usage_report(columns: MessageColumns, by: str = 'model', period: str = 'all',
+                 since: Optional[int] = None) -> List[UsageRow]:
+    """
+    Aggregate message usage per group and period.
+
+    Grouping by model or provider only considers assistant messages, the only
+    ones carrying those fields; grouping by tool considers tool calls and
+    their results.
+
+    Args:
+        columns: Message columns of the chat store
+        by: Column to group by, one of GROUP_BY_CHOICES
+        period: Time bucket, one of PERIOD_CHOICES
+        since: Optional unix timestamp in milliseconds; older messages are ignored
+
+    Returns:
+        List[UsageRow]: One row per (period, group), periods ascending and
+        groups by descending message count
+    """
+    if by not in GROUP_BY_CHOICES:
+        raise ValueError(f"Unsupported group: {by}")
+    if period not in PERIOD_CHOICES:
+        raise ValueError(f"Unsupported period: {period}")
+    if len(columns) == 0:
+        return []
+
+    roles = columns.dictionaries['role']
+    assistant_code = roles.index('assistant') if 'assistant' in roles else -1
+    is_assistant = columns['role'] == assistant_code
+    has_tool = columns['tool'] != 0
+
+    mask = np.ones(len(columns), dtype=bool)
+    if by in ('model', 'provider'):
+        mask &= is_assistant
+    elif by == 'tool':
+        mask &= has_tool
+    if since is not None:
+        mask &= columns['unix_timestamp'] >= since
+    if not mask.any():
+        return []
+
+    group_codes = columns[by][mask].astype(np.int64)
+    chat_codes = columns['chat'][mask].astype(np.int64)
+    period_values, period_codes = np.unique(_period_buckets(columns['unix_timestamp'][mask], period), return_inverse=True)
+
+    # One dense key per (group, period) pair, then bincount does every sum
+    keys = group_codes * len(period_values) + period_codes
+    key_values, inverse = np.unique(keys, return_inverse=True)
+    n_keys = len(key_values)
+    messages = np.bincount(inverse, minlength=n_keys)
+    content_chars = np.bincount(inverse, weights=columns['content_chars'][mask], minlength=n_keys)
+    reasoning_chars = np.bincount(inverse, weights=columns['reasoning_chars'][mask], minlength=n_keys)
+    tool_calls = np.bincount(inverse, weights=(is_assistant & has_tool)[mask], minlength=n_keys)
+
+    # Distinct chats per key: count unique (key, chat) pairs
+    n_chats = len(columns.dictionaries['chat'])
+    pairs = np.unique(inverse.astype(np.int64) * n_chats + chat_codes)
+    chats = np.bincount(pairs // n_chats, minlength=n_keys)
+
+    groups = columns.labels(by, key_values // len(period_values))
+    periods = period_values[key_values % len(period_values)]
+    rows = [
+        UsageRow(
+            group=groups[i],
+            period=None if period == 'all' else str(periods[i]),
+            messages=int(messages[i]),
+            chats=int(chats[i]),
+            content_chars=int(content_chars[i]),
+            reasoning_chars=int(reasoning_chars[i]),
+            tool_calls=int(tool_calls[i])
+        )
+        for i in range(n_keys)
+    ]
+    rows.sort(key=lambda row: (row.period or '', -row.messages))
+    return rows
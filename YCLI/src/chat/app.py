@@ -14,18 +14,23 @@ from .provider.topia_orch_provider import TopiaOrchProvider
 from .chat_manager import ChatManager
 from bot.models import BotConfig
 from config import bot_service
+from loguru import logger
 
 class ChatApp:
-    def __init__(self, bot_config: Optional[BotConfig] = None, chat_id: Optional[str] = None, verbose: bool = False):
+    def __init__(self, bot_config: Optional[BotConfig] = None, chat_id: Optional[str] = None, verbose: bool = False,
+                 profile: bool = False):
         """Initialize the chat application.
 
         Args:
             bot_config: Bot configuration to use
             chat_id: Optional ID of existing chat to load
-            verbose: Whether to show verbose output
+            verbose: Whether to show verbose output (including repository timings)
+            profile: Whether to record repository metrics for a profile report
         """
         # Initialize repository based on configuration
-        repository = get_chat_repository()
+        sinks = [lambda metrics: logger.info(metrics.summary())] if verbose else None
+        repository = get_chat_repository(instrument=profile, sinks=sinks)
+        self.repository = repository
 
         # Use default bot config if not provided
         if not bot_config:
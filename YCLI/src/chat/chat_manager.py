@@ -1,3 +1,4 @@
+import asyncio
 from typing import List, Dict, Optional
 from contextlib import AsyncExitStack
 from types import SimpleNamespace
@@ -5,6 +6,7 @@ from types import SimpleNamespace
 from chat.models import Chat, Message
 from .repository import ChatRepository
 from .service import ChatService
+from .index import SemanticIndex
 from cli.display_manager import DisplayManager
 from cli.input_manager import InputManager
 from mcp_server.mcp_manager import MCPManager
@@ -43,6 +45,7 @@ class ChatManager:
             verbose: Whether to show verbose output
         """
         self.service = ChatService(repository)
+        self.semantic_index = SemanticIndex(config['index_dir'])
         self.bot_config = bot_config
         self.model = bot_config.model
         self.display_manager = display_manager
@@ -76,7 +79,7 @@ class ChatManager:
             self.display_manager.print_error(f"Chat {chat_id} not found")
             raise ValueError(f"Chat {chat_id} not found")
 
-        self.messages = existing_chat.messages
+        self.messages = existing_chat.active_messages()
         self.current_chat = existing_chat
 
         if self.verbose:
@@ -168,23 +171,69 @@ class ChatManager:
 
     async def persist_chat(self):
         """Persist current chat state"""
-        if not self.current_chat:
-            # Create new chat with pre-generated ID
-            self.current_chat = await self.service.create_chat(self.messages, self.external_id, self.chat_id)
-        else:
-            # Update existing chat - external_id will be preserved automatically
-            self.current_chat = await self.service.update_chat(self.current_chat.id, self.messages, self.external_id)
+        try:
+            if not self.current_chat:
+                # Create new chat with pre-generated ID
+                self.current_chat = await self.service.create_chat(self.messages, self.external_id, self.chat_id)
+            else:
+                # Update existing chat - external_id will be preserved automatically
+                self.current_chat = await self.service.update_chat(
+                    self.current_chat.id, self.messages, self.external_id, chat=self.current_chat
+                )
+        except Exception as e:
+            if not self.service.writes_unqueued():
+                raise
+            # Without the mirror nothing queues the turn; keep it for the next save
+            self.display_manager.print_error(f"Failed to save chat to D1: {str(e)}")
+            self.display_manager.console.print(
+                "[yellow]The conversation is kept in this session and saved with the next turn. "
+                "Enable cloudflare_d1.mirror to queue saves while D1 is unreachable.[/yellow]"
+            )
+            return
+        # With a D1 mirror the turn is saved locally; upload it without holding up the session
+        self.service.push_in_background()
+        self.update_semantic_index()
+
+    def update_semantic_index(self):
+        """Index newly persisted messages for local semantic search"""
+        try:
+            indexed = self.semantic_index.add_chat(self.current_chat)
+            if self.verbose and indexed:
+                logger.info(f"Indexed {indexed} new message(s) for semantic search")
+        except Exception as e:
+            # Search indexing must never fail a turn
+            logger.warning(f"Failed to update semantic index: {str(e)}")
+
+    async def _finish_sync(self, sync_task: asyncio.Task):
+        """Wait for the background sync, then push the chats saved during the session"""
+        try:
+            await sync_task
+            stats = await self.service.sync(pull=False)
+            if self.verbose and stats:
+                logger.info(f"Pushed {stats['pushed']} chat(s) to D1")
+        except Exception as e:
+            # Unpushed chats stay queued in the mirror for the next sync
+            logger.warning(f"Failed to sync with D1: {str(e)}")
+
+    async def _prewarm_provider(self):
+        """Warm the provider connection in the background; a failure only costs the saved setup time"""
+        try:
+            await self.provider.prewarm()
+        except Exception as e:
+            logger.warning(f"Failed to pre-warm provider connection: {str(e)}")
 
     async def run(self):
         """Run the chat session"""
         async with AsyncExitStack() as exit_stack:
+            sync_task = None
+            prewarm_task = None
+            prewarm = config.get('provider_http', {}).get('prewarm', False)
             try:
                 if self.verbose:
                     logger.info("Starting chat session...")
-                # if cloudflare repository, sync
-                storage_type = config.get('storage_type', 'file')
-                if storage_type == 'cloudflare':
-                    await self.service.repository._sync_from_r2_if_needed()
+                # A mirrored D1 store syncs in the background; reads are served locally meanwhile
+                if self.service.mirror() is not None:
+                    sync_task = asyncio.create_task(self.service.sync())
                 # Load chat if chat_id was provided and not already loaded
                 if self.continue_exist:
                     await self._load_chat(self.chat_id)
@@ -218,8 +267,12 @@ class ChatManager:
                     self.display_manager.display_chat_history(self.messages)
 
                 while True:
-                    # Get user input, multi-line flag, and line count
-                    user_input, is_multi_line, line_count = self.input_manager.get_input()
+                    # Connect to the provider while the prompt waits for input
+                    if prewarm and (prewarm_task is None or prewarm_task.done()):
+                        prewarm_task = asyncio.create_task(self._prewarm_provider())
+
+                    # Get user input, multi-line flag, and line count; in a thread, so background tasks keep running
+                    user_input, is_multi_line, line_count = await asyncio.to_thread(self.input_manager.get_input)
 
                     if self.input_manager.is_exit_command(user_input):
                         self.display_manager.console.print("\n[yellow]Goodbye![/yellow]")
@@ -249,3 +302,9 @@ class ChatManager:
             finally:
                 # Clear sessions on exit
                 self.mcp_manager.clear_sessions()
+                if prewarm_task is not None:
+                    prewarm_task.cancel()
+                if sync_task is not None:
+                    await self._finish_sync(sync_task)
+                await self.service.repository.close()
+                await self.provider.close()
@@ -0,0 +1,303 @@
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+from chat.models import Chat
+from chat.analytics.columns import DictionaryEncoder
+from chat.utils.message_utils import get_message_text
+from util import get_iso8601_timestamp
+
+MANIFEST_FILE = 'manifest.json'
+FORMAT_NAME = 'y-cli-columnar'
+FORMAT_VERSION = 1
+ENGINES = ['auto', 'numpy', 'arrow']
+ARROW_BATCH_ROWS = 65536
+
+# Column name -> (logical type, numpy engine encoding)
+COLUMNS = {
+    'chat_id': ('string', 'offsets'),
+    'message_index': ('int32', 'plain'),
+    'role': ('string', 'dictionary'),
+    'model': ('string', 'dictionary'),
+    'provider': ('string', 'dictionary'),
+    'server': ('string', 'dictionary'),
+    'tool': ('string', 'dictionary'),
+    'unix_timestamp': ('timestamp[ms]', 'plain'),
+    'content': ('string', 'offsets'),
+    'reasoning_content': ('string', 'offsets'),
+}
+STRING_COLUMNS = [name for name, (_, encoding) in COLUMNS.items() if encoding == 'offsets']
+DICTIONARY_COLUMNS = [name for name, (_, encoding) in COLUMNS.items() if encoding == 'dictionary']
+
+@dataclass
+class ExportResult:
+    part: Optional[str]
+    chats: int
+    rows: int
+    unchanged: int
+    deleted: int
+
+def message_rows(chat: Chat):
+    """Yield one flat row per message of a chat"""
+    for index, message in enumerate(chat.messages):
+        yield {
+            'chat_id': chat.id,
+            'message_index': index,
+            'role': message.role,
+            'model': message.model,
+            'provider': message.provider,
+            'server': message.server,
+            'tool': message.tool,
+            'unix_timestamp': message.unix_timestamp,
+            'content': get_message_text(message),
+            'reasoning_content': message.reasoning_content,
+        }
+
+class StringHeapWriter:
+    """Append strings to a UTF-8 heap file, tracking int64 end offsets"""
+    def __init__(self, path: str):
+        self.file = open(path, 'wb')
+        self.offsets: List[int] = [0]
+
+    def append(self, value: Optional[str]) -> None:
+        data = value.encode('utf-8') if value else b''
+        self.file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self) -> np.ndarray:
+        self.file.close()
+        return np.asarray(self.offsets, dtype=np.int64)
+
+class NumpyPartWriter:
+    """
+    Write one export part as .npy column files.
+
+    String columns become `<name>.offsets.npy` (n + 1 int64 offsets) plus a
+    `<name>.utf8` heap, low-cardinality columns become int32 codes into a
+    dictionary stored in the manifest (code 0 is null), everything else is
+    a plain typed array. All files can be memory-mapped.
+    """
+    def __init__(self, part_dir: str):
+        self.part_dir = part_dir
+        os.makedirs(part_dir, exist_ok=True)
+        self.heaps = {name: StringHeapWriter(os.path.join(part_dir, f"{name}.utf8")) for name in STRING_COLUMNS}
+        self.encoders = {name: DictionaryEncoder() for name in DICTIONARY_COLUMNS}
+        self.codes: Dict[str, List[int]] = {name: [] for name in DICTIONARY_COLUMNS}
+        self.message_index: List[int] = []
+        self.unix_timestamp: List[int] = []
+        self.rows = 0
+
+    def add_chat(self, chat: Chat) -> None:
+        for row in message_rows(chat):
+            for name, heap in self.heaps.items():
+                heap.append(row[name])
+            for name, encoder in self.encoders.items():
+                self.codes[name].append(encoder.encode(row[name]))
+            self.message_index.append(row['message_index'])
+            self.unix_timestamp.append(row['unix_timestamp'])
+            self.rows += 1
+
+    def close(self) -> Dict:
+        for name, heap in self.heaps.items():
+            np.save(os.path.join(self.part_dir, f"{name}.offsets.npy"), heap.close())
+        for name, codes in self.codes.items():
+            np.save(os.path.join(self.part_dir, f"{name}.npy"), np.asarray(codes, dtype=np.int32))
+        np.save(os.path.join(self.part_dir, 'message_index.npy'), np.asarray(self.message_index, dtype=np.int32))
+        np.save(os.path.join(self.part_dir, 'unix_timestamp.npy'), np.asarray(self.unix_timestamp, dtype=np.int64))
+        return {'dictionaries': {name: encoder.values for name, encoder in self.encoders.items()}}
+
+class ArrowPartWriter:
+    """Write one export part as a single Arrow IPC file, in record batches"""
+    def __init__(self, part_file: str):
+        import pyarrow as pa
+        self.pa = pa
+        self.schema = pa.schema([
+            ('chat_id', pa.string()),
+            ('message_index', pa.int32()),
+            ('role', pa.dictionary(pa.int32(), pa.string())),
+            ('model', pa.dictionary(pa.int32(), pa.string())),
+            ('provider', pa.dictionary(pa.int32(), pa.string())),
+            ('server', pa.dictionary(pa.int32(), pa.string())),
+            ('tool', pa.dictionary(pa.int32(), pa.string())),
+            ('unix_timestamp', pa.timestamp('ms')),
+            ('content', pa.string()),
+            ('reasoning_content', pa.string()),
+        ])
+        self.sink = pa.OSFile(part_file, 'wb')
+        self.writer = pa.ipc.new_file(self.sink, self.schema, options=pa.ipc.IpcWriteOptions(unify_dictionaries=True))
+        self.buffer: Dict[str, List] = {name: [] for name in COLUMNS}
+        self.rows = 0
+
+    def _flush(self) -> None:
+        if not self.buffer['chat_id']:
+            return
+        arrays = []
+        for field in self.schema:
+            values = self.buffer[field.name]
+            if self.pa.types.is_dictionary(field.type):
+                arrays.append(self.pa.array(values, type=self.pa.string()).dictionary_encode())
+            else:
+                arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_batch(self.pa.record_batch(arrays, schema=self.schema))
+        self.buffer = {name: [] for name in COLUMNS}
+
+    def add_chat(self, chat: Chat) -> None:
+        for row in message_rows(chat):
+            for name in COLUMNS:
+                self.buffer[name].append(row[name])
+            self.rows += 1
+        if len(self.buffer['chat_id']) >= ARROW_BATCH_ROWS:
+            self._flush()
+
+    def close(self) -> Dict:
+        self._flush()
+        self.writer.close()
+        self.sink.close()
+        return {}
+
+def resolve_engine(engine: str) -> str:
+    """Pick the export engine, preferring Arrow when pyarrow is installed"""
+    if engine != 'auto':
+        return engine
+    try:
+        import pyarrow  # noqa: F401
+        return 'arrow'
+    except ImportError:
+        return 'numpy'
+
+class ColumnarExporter:
+    """
+    Incremental columnar export of chat messages.
+
+    Each run appends a new part holding every message of the chats that
+    were added or changed since the previous run. manifest.json lists the
+    parts and, per chat, the update_time and part of its latest export, so
+    readers keep only the rows of a chat that come from that part.
+    """
+    def __init__(self, output_dir: str, engine: str = 'auto', full: bool = False):
+        self.output_dir = os.path.expanduser(output_dir)
+        self.manifest_file = os.path.join(self.output_dir, MANIFEST_FILE)
+        self.manifest = self._load_manifest()
+        self._replaced: List[str] = []
+        if full:
+            # Parts being replaced don't tie the new export to their engine
+            self.reset()
+        requested = resolve_engine(engine)
+        if self.manifest['parts'] and self.manifest['engine'] != requested and engine != 'auto':
+            raise ValueError(f"Export in {self.output_dir} uses the {self.manifest['engine']} engine")
+        self.engine = self.manifest['engine'] if self.manifest['parts'] else requested
+        self.manifest['engine'] = self.engine
+
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('format') != FORMAT_NAME:
+                raise ValueError(f"{self.manifest_file} is not a {FORMAT_NAME} manifest")
+            return manifest
+        return {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'engine': None,
+            'columns': {name: {'type': logical, 'encoding': encoding} for name, (logical, encoding) in COLUMNS.items()},
+            'parts': [],
+            'chats': {}
+        }
+
+    def _save_manifest(self) -> None:
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _remove_part(self, part_name: str) -> None:
+        path = os.path.join(self.output_dir, part_name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def reset(self) -> None:
+        """
+        Start over without the previously exported parts.
+
+        The old parts stay on disk, still listed by the saved manifest,
+        until the next export has written its part and saved the new
+        manifest; an interrupted full export leaves the old one readable.
+        """
+        self._replaced.extend(part['name'] for part in self.manifest['parts'])
+        self.manifest['parts'] = []
+        self.manifest['chats'] = {}
+
+    def _remove_replaced(self) -> None:
+        for part_name in self._replaced:
+            self._remove_part(part_name)
+        self._replaced = []
+
+    async def export(self, chats: AsyncIterator[Chat]) -> ExportResult:
+        """
+        Append the chats that changed since the last export as a new part.
+
+        Args:
+            chats: Async iterator over every chat in the store
+
+        Returns:
+            ExportResult: Summary of the written part
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        # Numbered past every listed part, including those being replaced, which are still on disk
+        names = [part['name'] for part in self.manifest['parts']] + self._replaced
+        part_name = f"part-{max((int(name[5:10]) + 1 for name in names), default=0):05d}"
+        if self.engine == 'arrow':
+            part_name += '.arrow'
+            writer = ArrowPartWriter(os.path.join(self.output_dir, part_name))
+        else:
+            writer = NumpyPartWriter(os.path.join(self.output_dir, part_name))
+
+        exported = self.manifest['chats']
+        seen = set()
+        changed: Dict[str, str] = {}
+        unchanged = 0
+        try:
+            async for chat in chats:
+                seen.add(chat.id)
+                previous = exported.get(chat.id)
+                if previous and previous['update_time'] == chat.update_time:
+                    unchanged += 1
+                    continue
+                writer.add_chat(chat)
+                changed[chat.id] = chat.update_time
+            part_info = writer.close()
+        except BaseException:
+            # Leave no half-written part behind; the manifest is untouched
+            self._remove_part(part_name)
+            raise
+
+        deleted = [chat_id for chat_id in exported if chat_id not in seen]
+        if not changed and not deleted:
+            self._remove_part(part_name)
+            if self._replaced:
+                # A full export of an empty store still drops the old parts
+                self._save_manifest()
+                self._remove_replaced()
+            return ExportResult(part=None, chats=0, rows=0, unchanged=unchanged, deleted=0)
+
+        for chat_id in deleted:
+            del exported[chat_id]
+        for chat_id, update_time in changed.items():
+            exported[chat_id] = {'update_time': update_time, 'part': part_name}
+        self.manifest['parts'].append({
+            'name': part_name,
+            'created_at': get_iso8601_timestamp(),
+            'rows': writer.rows,
+            'chats': len(changed),
+            'deleted_chats': deleted,
+            **part_info
+        })
+        self._save_manifest()
+        self._remove_replaced()
+        return ExportResult(part=part_name, chats=len(changed), rows=writer.rows, unchanged=unchanged, deleted=len(deleted))
@@ -1,11 +1,16 @@
+import asyncio
 import json
 import hashlib
 import os
 from datetime import datetime, timezone, timedelta
 from typing import List, Dict, Optional
-from .cli.models import Chat, Message
-from chat.file_repository import FileRepository
-from .config import DATA_FILE, OPENROUTER_IMPORT_DIR, OPENROUTER_IMPORT_HISTORY
+from chat.models import Chat, Message
+from chat.index import MinHashIndex
+from chat.repository.file import FileRepository
+from config import config
+
+OPENROUTER_IMPORT_DIR = os.path.expanduser(config['openrouter_import_dir'])
+OPENROUTER_IMPORT_HISTORY = os.path.expanduser(config['openrouter_import_history'])
 
 def format_timestamp(ts: str) -> str:
     """Format timestamp to ISO 8601 format with UTC+8 timezone."""
@@ -26,7 +31,7 @@ def generate_short_id(timestamp: str) -> str:
 def calculate_file_md5(filepath: str) -> str:
     """Calculate MD5 hash of a file."""
     md5_hash = hashlib.md5()
-    with open(filepath, "rb", encoding="utf-8") as f:
+    with open(filepath, "rb") as f:
         # Read file in chunks to handle large files
         for chunk in iter(lambda: f.read(4096), b""):
             md5_hash.update(chunk)
@@ -73,10 +78,13 @@ def list_import_files() -> List[str]:
             files.append(entry.path)
     return files
 
-def extract_new_chats(input_file: str) -> List[Chat]:
-    """Convert OpenRouter export JSON to Chat objects."""
-    repo = FileRepository()
-    existing_ids = {chat.id for chat in repo._read_chats()}
+def extract_new_chats(input_file: str, existing_ids: set, dedup_index: Optional[MinHashIndex] = None) -> List[Chat]:
+    """Convert OpenRouter export JSON to Chat objects.
+
+    Threads whose id already exists are skipped. Because thread ids are
+    derived from timestamps, the same conversation exported twice can get a
+    different id; with a dedup_index such near-duplicates are skipped too.
+    """
     output_chats = []
     with open(input_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
@@ -139,13 +147,22 @@ def extract_new_chats(input_file: str) -> List[Chat]:
             id=thread_id,
             create_time=format_timestamp(thread_timestamp),
             update_time=format_timestamp(max(timestamps)),
-            messages=[Message(**msg) for msg in messages]
+            messages=[Message.from_dict(msg) for msg in messages]
         )
 
         # Skip if thread ID already exists
         if chat.id in existing_ids:
             continue
 
+        # Skip near-duplicates stored (or imported earlier) under another ID
+        if dedup_index is not None:
+            matches = dedup_index.find_duplicates(chat)
+            if matches:
+                print(f"Skipping near-duplicate thread {chat.id} ~ {matches[0].chat_id} (similarity {matches[0].similarity:.0%})")
+                continue
+            dedup_index.add(chat)
+
+        existing_ids.add(chat.id)
         output_chats.append(chat)
 
     return output_chats
@@ -153,7 +170,10 @@ def extract_new_chats(input_file: str) -> List[Chat]:
 def process_import_files() -> None:
     """Process all files in import directory."""
     repo = FileRepository()
-    existing_chats = repo._read_chats()
+    existing_chats = asyncio.run(repo._read_chats())
+    existing_ids = {chat.id for chat in existing_chats}
+    dedup_index = MinHashIndex(config['index_dir'])
+    dedup_index.sync(existing_chats)
     processed_count = 0
     skipped_count = 0
 
@@ -165,7 +185,7 @@ def process_import_files() -> None:
             skipped_count += 1
             continue
 
-        new_chats = extract_new_chats(import_file)
+        new_chats = extract_new_chats(import_file, existing_ids, dedup_index)
         existing_chats.extend(new_chats)
         processed_count += len(new_chats)
 
@@ -176,7 +196,8 @@ def process_import_files() -> None:
         # Sort all chats by create_time
         existing_chats.sort(key=lambda x: x.create_time)
         # Write back to data file
-        repo._write_chats(existing_chats)
+        asyncio.run(repo._write_chats(existing_chats))
+        dedup_index.save()
 
     print(f"Import completed. Processed {processed_count} new chats, skipped {skipped_count} files.")
 
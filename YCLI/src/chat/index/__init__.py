@@ -0,0 +1,6 @@
+"""Local search indexes built over the chat store."""
+
+from .semantic import SemanticIndex, SearchHit
+from .minhash import MinHashIndex, DuplicateMatch
+
+__all__ = ['SemanticIndex', 'SearchHit', 'MinHashIndex', 'DuplicateMatch']
@@ -0,0 +1,281 @@
+import json
+import os
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from chat.models import Chat
+from chat.utils.message_utils import get_message_text
+
+# Hash values are reduced to 31 bits so (a * x + b) never overflows uint64
+MERSENNE_PRIME = (1 << 31) - 1
+MAX_HASH = np.uint32(MERSENNE_PRIME)
+SHINGLE_SIZE = 3
+CHUNK_SIZE = 4096
+SEED = 1
+
+@dataclass
+class DuplicateMatch:
+    chat_id: str
+    similarity: float
+
+class MinHashIndex:
+    """
+    MinHash signatures of chats with an LSH band index for near-duplicate lookup.
+
+    Each chat is reduced to word shingles of its message text and summarized
+    by num_perm min-hashes. Signatures are split into bands; chats sharing any
+    band bucket become candidates, so a lookup only compares against a handful
+    of chats instead of the whole store. Signatures are persisted in the index
+    directory together with the update_time they were computed from.
+    """
+    def __init__(self, index_dir: str, num_perm: int = 128, bands: int = 16, threshold: float = 0.8):
+        """
+        Initialize the MinHash index.
+
+        Args:
+            index_dir: Directory holding the index files
+            num_perm: Number of hash permutations per signature
+            bands: Number of LSH bands (must divide num_perm)
+            threshold: Minimum estimated Jaccard similarity to report a duplicate
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.index_dir = os.path.expanduser(index_dir)
+        self.signatures_file = os.path.join(self.index_dir, 'minhash_signatures.npy')
+        self.meta_file = os.path.join(self.index_dir, 'minhash_meta.json')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+
+        rng = np.random.default_rng(SEED)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._ids: List[Optional[str]] = []
+        self._update_times: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        self._loaded = False
+
+    def _load(self) -> None:
+        """Load persisted signatures and rebuild the band buckets"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not (os.path.exists(self.meta_file) and os.path.exists(self.signatures_file)):
+            return
+        with open(self.meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('num_perm') != self.num_perm or meta.get('bands') != self.bands:
+            # Parameters changed, signatures are not comparable anymore
+            return
+        self._signatures = np.load(self.signatures_file)
+        for row, (chat_id, update_time) in enumerate(meta['chats']):
+            self._ids.append(chat_id)
+            self._update_times.append(update_time)
+            self._rows[chat_id] = row
+            for key in self._band_keys(self._signatures[row]):
+                self._buckets[key].append(row)
+
+    def save(self) -> None:
+        """Persist signatures and chat metadata"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        live = [row for row, chat_id in enumerate(self._ids) if chat_id is not None]
+        meta = {
+            'num_perm': self.num_perm,
+            'bands': self.bands,
+            'chats': [[self._ids[row], self._update_times[row]] for row in live]
+        }
+        tmp_file = self.signatures_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.save(f, self._signatures[live])
+        os.replace(tmp_file, self.signatures_file)
+        tmp_file = self.meta_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, self.meta_file)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        """Split a signature into per-band bucket keys"""
+        r = self.rows_per_band
+        return [(band, signature[band * r:(band + 1) * r].tobytes()) for band in range(self.bands)]
+
+    def _set(self, chat_id: str, update_time: str, signature: np.ndarray) -> None:
+        """Insert or replace the signature of a chat"""
+        if chat_id in self._rows:
+            self._remove(chat_id)
+        row = len(self._ids)
+        if row >= len(self._signatures):
+            grown = np.empty((max(64, 2 * len(self._signatures)), self.num_perm), dtype=np.uint32)
+            grown[:row] = self._signatures[:row]
+            self._signatures = grown
+        self._signatures[row] = signature
+        self._ids.append(chat_id)
+        self._update_times.append(update_time)
+        self._rows[chat_id] = row
+        for key in self._band_keys(signature):
+            self._buckets[key].append(row)
+
+    def _remove(self, chat_id: str) -> None:
+        """Remove a chat from the buckets (its row is tombstoned until save)"""
+        row = self._rows.pop(chat_id)
+        for key in self._band_keys(self._signatures[row]):
+            self._buckets[key].remove(row)
+        self._ids[row] = None
+
+    def signature(self, chat: Chat) -> Optional[np.ndarray]:
+        """
+        Compute the MinHash signature of a chat.
+
+        Args:
+            chat: The chat to summarize
+
+        Returns:
+            Optional[np.ndarray]: uint32 signature, or None for chats without text
+        """
+        words = " ".join(get_message_text(m) for m in chat.messages).lower().split()
+        if not words:
+            return None
+        if len(words) < SHINGLE_SIZE:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) & MERSENNE_PRIME for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        for start in range(0, len(hashes), CHUNK_SIZE):
+            chunk = hashes[start:start + CHUNK_SIZE]
+            permuted = (self._a[:, np.newaxis] * chunk[np.newaxis, :] + self._b[:, np.newaxis]) % MERSENNE_PRIME
+            signature = np.minimum(signature, permuted.min(axis=1).astype(np.uint32))
+        return signature
+
+    def sync(self, chats: Iterable[Chat]) -> int:
+        """
+        Bring the index in line with the chat store.
+
+        Signatures are recomputed only for chats that are new or whose
+        update_time changed; chats no longer in the store are dropped.
+
+        Args:
+            chats: All chats currently in storage
+
+        Returns:
+            int: Number of signatures (re)computed
+        """
+        computed = 0
+        seen = set()
+        for chat in chats:
+            seen.add(chat.id)
+            if self.refresh(chat):
+                computed += 1
+        self.prune(seen)
+        return computed
+
+    def refresh(self, chat: Chat) -> bool:
+        """
+        Recompute the signature of a chat if it is new or its update_time changed.
+
+        Args:
+            chat: The chat to refresh
+
+        Returns:
+            bool: True if a signature was computed
+        """
+        self._load()
+        row = self._rows.get(chat.id)
+        if row is not None and self._update_times[row] == chat.update_time:
+            return False
+        return self.add(chat)
+
+    def prune(self, chat_ids: Iterable[str]) -> None:
+        """
+        Drop the chats that are not in chat_ids.
+
+        Args:
+            chat_ids: Ids of all chats currently in storage
+        """
+        self._load()
+        keep = set(chat_ids)
+        for chat_id in [chat_id for chat_id in self._rows if chat_id not in keep]:
+            self._remove(chat_id)
+
+    def add(self, chat: Chat) -> bool:
+        """
+        Add or refresh a single chat in the index.
+
+        Args:
+            chat: The chat to add
+
+        Returns:
+            bool: True if the chat had text to index
+        """
+        self._load()
+        signature = self.signature(chat)
+        if signature is None:
+            if chat.id in self._rows:
+                self._remove(chat.id)
+            return False
+        self._set(chat.id, chat.update_time, signature)
+        return True
+
+    def find_duplicates(self, chat: Chat, signature: Optional[np.ndarray] = None) -> List[DuplicateMatch]:
+        """
+        Find indexed chats that are near-duplicates of a chat.
+
+        Args:
+            chat: The chat to look up (its own id is never reported)
+            signature: Precomputed signature of the chat, if available
+
+        Returns:
+            List[DuplicateMatch]: Matches at or above the threshold, most similar first
+        """
+        self._load()
+        if signature is None:
+            signature = self.signature(chat)
+        if signature is None:
+            return []
+        return self._matches(chat.id, signature)
+
+    def duplicates_of(self, chat_id: str) -> List[DuplicateMatch]:
+        """
+        Find near-duplicates of an indexed chat from its stored signature.
+
+        Args:
+            chat_id: ID of the indexed chat
+
+        Returns:
+            List[DuplicateMatch]: Matches at or above the threshold, most similar first
+        """
+        self._load()
+        row = self._rows.get(chat_id)
+        if row is None:
+            return []
+        return self._matches(chat_id, self._signatures[row])
+
+    def _matches(self, chat_id: str, signature: np.ndarray) -> List[DuplicateMatch]:
+        """Compare a signature against the chats sharing one of its band buckets"""
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        candidates = [row for row in candidates if self._ids[row] not in (None, chat_id)]
+        if not candidates:
+            return []
+
+        similarity = (self._signatures[candidates] == signature).mean(axis=1)
+        matches = [
+            DuplicateMatch(chat_id=self._ids[row], similarity=float(score))
+            for row, score in zip(candidates, similarity)
+            if score >= self.threshold
+        ]
+        matches.sort(key=lambda m: m.similarity, reverse=True)
+        return matches
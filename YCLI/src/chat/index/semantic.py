@@ -0,0 +1,305 @@
+import hashlib
+import json
+import math
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from chat.models import Chat, Message
+from chat.utils.message_utils import get_message_text
+
+# Single CJK characters (paired into bigrams below), or runs of other word characters
+CJK_RANGES = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+TOKEN_PATTERN = re.compile(rf"[{CJK_RANGES}]|(?:(?![{CJK_RANGES}])[^\W_])+")
+CJK_PATTERN = re.compile(rf"[{CJK_RANGES}]")
+
+DEFAULT_DIM = 512
+MIN_CAPACITY = 1024
+
+@dataclass
+class SearchHit:
+    chat_id: str
+    message_index: int
+    role: str
+    score: float
+
+class SemanticIndex:
+    """
+    Offline semantic index over chat messages.
+
+    Every message is embedded into a fixed-size vector with hashed TF-IDF
+    (no network, no model download). Vectors live in a memory-mapped NumPy
+    matrix inside the index directory, so a query is a single top-k dot
+    product over all rows.
+
+    Each chat's progress keeps a digest of the messages indexed so far.
+    When one of them was replaced or removed, the chat's rows are zeroed
+    out of the matrix and the chat is indexed again.
+    """
+    def __init__(self, index_dir: str, dim: int = DEFAULT_DIM):
+        """
+        Initialize the semantic index.
+
+        Args:
+            index_dir: Directory holding the index files
+            dim: Number of hash buckets per vector (only used for a new index)
+        """
+        self.index_dir = os.path.expanduser(index_dir)
+        self.vectors_file = os.path.join(self.index_dir, 'semantic_vectors.npy')
+        self.rows_file = os.path.join(self.index_dir, 'semantic_rows.jsonl')
+        self.state_file = os.path.join(self.index_dir, 'semantic_state.json')
+        self.dim = dim
+        self._state: Optional[Dict] = None
+
+    def _load_state(self) -> Dict:
+        """Load index state (row count, document frequencies, per-chat progress)"""
+        if self._state is None:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    self._state = json.load(f)
+                self.dim = self._state['dim']
+            else:
+                self._state = {
+                    'dim': self.dim,
+                    'rows': 0,
+                    'capacity': 0,
+                    'doc_count': 0,
+                    'doc_freq': [0] * self.dim,
+                    'stale': 0,
+                    'chats': {}
+                }
+        return self._state
+
+    def _save_state(self) -> None:
+        """Atomically write index state"""
+        tmp_file = self.state_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f)
+        os.replace(tmp_file, self.state_file)
+
+    @property
+    def size(self) -> int:
+        """Number of indexed messages"""
+        state = self._load_state()
+        return state['rows'] - state.get('stale', 0)
+
+    def indexed_count(self, chat_id: str) -> int:
+        """Number of messages already indexed for a chat"""
+        return self._progress(chat_id)['count']
+
+    def _progress(self, chat_id: str) -> Dict:
+        """Get how far a chat is indexed: message count, their digest and the rows they occupy"""
+        progress = self._load_state()['chats'].get(chat_id)
+        if isinstance(progress, int):
+            # Index state from before digests; the indexed messages are taken as unchanged
+            return {'count': progress, 'digest': None, 'rows': []}
+        return progress or {'count': 0, 'digest': None, 'rows': []}
+
+    def _digest(self, messages: List[Message]) -> str:
+        """Digest of the roles and text of messages, to tell whether indexed messages changed"""
+        digest = hashlib.blake2b(digest_size=16)
+        for message in messages:
+            digest.update(f"{message.role}\0{get_message_text(message)}\0".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _tokenize(self, text: str) -> List[str]:
+        """Split text into word tokens, using character bigrams for CJK runs"""
+        tokens = []
+        previous_cjk = None
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            if CJK_PATTERN.fullmatch(token):
+                tokens.append(token)
+                if previous_cjk:
+                    tokens.append(previous_cjk + token)
+                previous_cjk = token
+            else:
+                tokens.append(token)
+                previous_cjk = None
+        return tokens
+
+    def _hash_tokens(self, text: str) -> np.ndarray:
+        """Map the tokens of a text to hash buckets"""
+        tokens = self._tokenize(text)
+        return np.fromiter(
+            (zlib.crc32(token.encode('utf-8')) for token in tokens),
+            dtype=np.uint32,
+            count=len(tokens)
+        ) % self.dim
+
+    def _term_vector(self, buckets: np.ndarray) -> np.ndarray:
+        """Build a sublinear, L2-normalized term-frequency vector from hash buckets"""
+        counts = np.bincount(buckets, minlength=self.dim).astype(np.float32)
+        nonzero = counts > 0
+        counts[nonzero] = 1.0 + np.log(counts[nonzero])
+        norm = np.linalg.norm(counts)
+        if norm > 0:
+            counts /= norm
+        return counts
+
+    def _open_vectors(self, min_rows: int) -> np.memmap:
+        """Open the vector matrix for writing, growing it to hold at least min_rows"""
+        state = self._load_state()
+        capacity = state['capacity']
+        if capacity >= min_rows and os.path.exists(self.vectors_file):
+            return np.lib.format.open_memmap(self.vectors_file, mode='r+')
+
+        new_capacity = max(MIN_CAPACITY, capacity * 2, min_rows)
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_file = self.vectors_file + '.tmp'
+        grown = np.lib.format.open_memmap(tmp_file, mode='w+', dtype=np.float32, shape=(new_capacity, self.dim))
+        if state['rows'] and os.path.exists(self.vectors_file):
+            old = np.lib.format.open_memmap(self.vectors_file, mode='r')
+            grown[:state['rows']] = old[:state['rows']]
+            del old
+        grown.flush()
+        del grown
+        os.replace(tmp_file, self.vectors_file)
+        state['capacity'] = new_capacity
+        return np.lib.format.open_memmap(self.vectors_file, mode='r+')
+
+    def add_chat(self, chat: Chat) -> int:
+        """
+        Index the messages of a chat that have not been indexed yet.
+
+        Args:
+            chat: The chat to index
+
+        Returns:
+            int: Number of newly indexed messages
+        """
+        return self.add_chats([chat])
+
+    def add_chats(self, chats: List[Chat]) -> int:
+        """
+        Index the not yet indexed messages of several chats in one pass.
+
+        A chat whose indexed messages changed since, such as a message
+        replaced in place or an edited chat pulled from D1, is indexed again.
+
+        Args:
+            chats: The chats to index
+
+        Returns:
+            int: Number of newly indexed messages
+        """
+        state = self._load_state()
+        pending = []
+        stale_rows = []
+        for chat in chats:
+            progress = self._progress(chat.id)
+            start = progress['count']
+            if start and (start > len(chat.messages) or progress['digest'] not in (None, self._digest(chat.messages[:start]))):
+                # Indexed messages were replaced or removed: index the whole chat again
+                stale_rows.extend(progress['rows'])
+                progress = {'count': 0, 'digest': None, 'rows': []}
+                state['chats'][chat.id] = progress
+                start = 0
+            if len(chat.messages) > start:
+                pending.append((chat, start, progress))
+        total = sum(len(chat.messages) - start for chat, start, _ in pending)
+        if not total and not stale_rows:
+            return 0
+
+        rows = state['rows']
+        vectors = self._open_vectors(rows + total)
+        doc_freq = np.asarray(state['doc_freq'], dtype=np.int64)
+        for first, last in stale_rows:
+            # A stored vector is nonzero exactly in the buckets of its message
+            np.subtract.at(doc_freq, np.nonzero(vectors[first:last])[1], 1)
+            vectors[first:last] = 0
+            state['doc_count'] -= last - first
+            state['stale'] = state.get('stale', 0) + last - first
+        row_entries = []
+        for chat, start, progress in pending:
+            first = rows + len(row_entries)
+            for index in range(start, len(chat.messages)):
+                message = chat.messages[index]
+                buckets = self._hash_tokens(get_message_text(message))
+                vectors[rows + len(row_entries)] = self._term_vector(buckets)
+                doc_freq[np.unique(buckets)] += 1
+                row_entries.append(json.dumps([chat.id, index, message.role], ensure_ascii=False))
+            state['chats'][chat.id] = {
+                'count': len(chat.messages),
+                'digest': self._digest(chat.messages),
+                'rows': progress['rows'] + [[first, rows + len(row_entries)]]
+            }
+        vectors.flush()
+        del vectors
+
+        if row_entries:
+            with open(self.rows_file, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(row_entries) + '\n')
+
+        state['rows'] = rows + total
+        state['doc_count'] += total
+        state['doc_freq'] = doc_freq.tolist()
+        self._save_state()
+        return total
+
+    def rebuild(self, chats: List[Chat]) -> int:
+        """
+        Drop the index and rebuild it from the given chats.
+
+        Args:
+            chats: All chats to index
+
+        Returns:
+            int: Number of indexed messages
+        """
+        for path in [self.vectors_file, self.rows_file, self.state_file]:
+            if os.path.exists(path):
+                os.remove(path)
+        self._state = None
+        return self.add_chats(chats)
+
+    def search(self, query: str, limit: int = 10) -> List[SearchHit]:
+        """
+        Find the messages most similar to a query.
+
+        Args:
+            query: Free text query
+            limit: Maximum number of hits to return
+
+        Returns:
+            List[SearchHit]: Hits ordered by descending score
+        """
+        state = self._load_state()
+        rows = state['rows']
+        if rows == 0 or limit <= 0:
+            return []
+
+        # Weight query terms by idf twice, once for each side of the dot product
+        doc_freq = np.asarray(state['doc_freq'], dtype=np.float32)
+        idf = np.log((1.0 + state['doc_count']) / (1.0 + doc_freq)) + 1.0
+        weights = self._term_vector(self._hash_tokens(query)) * idf * idf
+        if not weights.any():
+            return []
+
+        vectors = np.load(self.vectors_file, mmap_mode='r')
+        scores = vectors[:rows] @ weights
+        k = min(limit, rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = [int(i) for i in top if scores[i] > 0]
+        if not top:
+            return []
+
+        wanted = set(top)
+        entries = {}
+        with open(self.rows_file, 'r', encoding='utf-8') as f:
+            for row, line in enumerate(f):
+                if row in wanted:
+                    entries[row] = json.loads(line)
+                    if len(entries) == len(wanted):
+                        break
+
+        norm = math.sqrt(float(np.dot(weights, weights)))
+        hits = []
+        for row in top:
+            chat_id, message_index, role = entries[row]
+            hits.append(SearchHit(chat_id=chat_id, message_index=message_index, role=role, score=float(scores[row]) / norm))
+        return hits
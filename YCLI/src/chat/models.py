@@ -1,7 +1,9 @@
-from dataclasses import dataclass, asdict
+import hashlib
+import json
+from dataclasses import dataclass, asdict, field
 from typing import List, Dict, Optional, Union, Iterable
 from datetime import datetime
-from util import get_iso8601_timestamp
+from util import get_iso8601_timestamp, generate_id
 
 @dataclass
 class ContentPart:
@@ -96,6 +98,148 @@ class Message:
             result['arguments'] = self.arguments
         return result
 
+class MessageNode:
+    """A message in a chat's message tree"""
+    __slots__ = ('message', 'parent', 'children', 'depth')
+
+    def __init__(self, message: Message, parent: Optional['MessageNode'] = None):
+        self.message = message
+        self.parent = parent
+        self.children: List['MessageNode'] = []
+        self.depth = parent.depth + 1 if parent else 0
+
+class MessageTree:
+    """
+    Index of a chat's messages by id, linked into a tree through parent_id.
+
+    Messages stored without an id or parent_id (chats written before
+    branching existed) get an id and are chained to the message stored
+    before them, so linear histories become a single branch. Those ids
+    are derived from the chat id, the message's position and timestamp,
+    so the same stored chat gets the same ids on every load. A message
+    whose parent is not in the tree, such as the first message of a
+    forked chat, becomes a root.
+    """
+    def __init__(self, messages: Iterable[Message] = (), chat_id: str = ''):
+        self.chat_id = chat_id
+        self.nodes: Dict[str, MessageNode] = {}
+        self.roots: List[MessageNode] = []
+        self.last: Optional[MessageNode] = None
+        for message in messages:
+            self.add(message)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, message_id: Optional[str]) -> bool:
+        return message_id in self.nodes
+
+    def new_id(self) -> str:
+        """Generate a message id that is unique within the tree"""
+        message_id = generate_id()
+        while message_id in self.nodes:
+            message_id = generate_id()
+        return message_id
+
+    def derive_id(self, message: Message) -> str:
+        """Derive a stable id for a stored message added next, unique within the tree"""
+        seed = f"{self.chat_id}:{len(self.nodes)}:{message.unix_timestamp}"
+        message_id = hashlib.blake2b(seed.encode('utf-8'), digest_size=3).hexdigest()
+        while message_id in self.nodes:
+            seed += ':'
+            message_id = hashlib.blake2b(seed.encode('utf-8'), digest_size=3).hexdigest()
+        return message_id
+
+    def add(self, message: Message) -> MessageNode:
+        """
+        Add a message under its parent, or replace the message with the same id.
+
+        Args:
+            message: The message to add
+
+        Returns:
+            MessageNode: The node holding the message
+        """
+        if message.id is None:
+            message.id = self.derive_id(message)
+        node = self.nodes.get(message.id)
+        if node is not None:
+            # Keep the existing link; a root must not be chained to a later message
+            message.parent_id = message.parent_id or node.message.parent_id
+            node.message = message
+            return node
+        if message.parent_id is None and self.last is not None:
+            message.parent_id = self.last.message.id
+
+        parent = self.nodes.get(message.parent_id)
+        node = MessageNode(message, parent)
+        if parent is None:
+            self.roots.append(node)
+        else:
+            parent.children.append(node)
+        self.nodes[message.id] = node
+        self.last = node
+        return node
+
+    def get(self, message_id: str) -> Optional[Message]:
+        """Get a message by id"""
+        node = self.nodes.get(message_id)
+        return node.message if node else None
+
+    def path(self, message_id: str) -> List[Message]:
+        """
+        Get the messages from the root down to a message, in O(depth).
+
+        Raises:
+            ValueError: If the message is not in the tree
+        """
+        node = self.nodes.get(message_id)
+        if node is None:
+            raise ValueError(f"Message with id {message_id} not found")
+        path = [None] * (node.depth + 1)
+        while node is not None:
+            path[node.depth] = node.message
+            node = node.parent
+        return path
+
+    def leaf(self, message_id: str) -> Message:
+        """Follow the most recent reply of each message down from a message"""
+        node = self.nodes.get(message_id)
+        if node is None:
+            raise ValueError(f"Message with id {message_id} not found")
+        while node.children:
+            node = node.children[-1]
+        return node.message
+
+    def branch(self, message_id: Optional[str] = None) -> List[Message]:
+        """
+        Get the branch running through a message, down to its latest leaf.
+
+        Args:
+            message_id: Any message on the branch; defaults to the most
+                recently added message
+
+        Returns:
+            List[Message]: Messages of the branch, root first
+        """
+        if message_id not in self.nodes:
+            if self.last is None:
+                return []
+            message_id = self.last.message.id
+        return self.path(self.leaf(message_id).id)
+
+    def leaves(self) -> List[Message]:
+        """Get the last message of every branch, in insertion order"""
+        return [node.message for node in self.nodes.values() if not node.children]
+
+    def siblings(self, message_id: str) -> List[Message]:
+        """Get the alternative messages sharing a message's parent, itself included"""
+        node = self.nodes.get(message_id)
+        if node is None:
+            raise ValueError(f"Message with id {message_id} not found")
+        nodes = node.parent.children if node.parent else self.roots
+        return [sibling.message for sibling in nodes]
+
 @dataclass
 class Chat:
     id: str
@@ -107,6 +251,10 @@ class Chat:
     origin_chat_id: Optional[str] = None
     origin_message_id: Optional[str] = None
     selected_message_id: Optional[str] = None
+    # Active branch of the origin chat up to origin_message_id; resolved by
+    # ChatService for forked chats and never persisted with the chat
+    prefix_messages: List[Message] = field(default_factory=list, repr=False, compare=False)
+    _tree: Optional[MessageTree] = field(default=None, init=False, repr=False, compare=False)
 
     @classmethod
     def from_dict(cls, data: Dict) -> 'Chat':
@@ -144,10 +292,107 @@ class Chat:
             result['selected_message_id'] = self.selected_message_id
         return result
 
+    def compute_content_hash(self) -> str:
+        """
+        Hash the chat's canonical content, to tell whether two copies differ.
+
+        Covers the messages and chat metadata serialized with sorted keys,
+        but not update_time or the stored hash, so a copy saved again
+        without changes hashes the same. The message tree is built first,
+        so messages stored without ids are hashed with the ids and links
+        they get on load, the same as a copy that stored them.
+        """
+        self.tree
+        content = self.to_dict()
+        content.pop('update_time')
+        content.pop('content_hash', None)
+        data = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+    @property
+    def tree(self) -> MessageTree:
+        """Message tree of the chat's own messages, built on first use"""
+        if self._tree is None:
+            self._tree = MessageTree(self.messages, chat_id=self.id)
+        return self._tree
+
+    def active_messages(self) -> List[Message]:
+        """Get the conversation of the selected branch, including a fork's prefix"""
+        return self.prefix_messages + self.tree.branch(self.selected_message_id)
+
+    def select_message(self, message_id: str) -> None:
+        """
+        Make the branch running through a message the active one.
+
+        Raises:
+            ValueError: If the message does not belong to this chat
+        """
+        if message_id not in self.tree:
+            if any(m.id == message_id for m in self.prefix_messages):
+                raise ValueError(f"Message {message_id} belongs to origin chat {self.origin_chat_id}")
+            raise ValueError(f"Message with id {message_id} not found in chat {self.id}")
+        self.selected_message_id = self.tree.leaf(message_id).id
+
     def update_messages(self, messages: List[Message]) -> None:
-        # Filter out system messages and sort the remaining ones by timestamp
-        self.messages = sorted(
-            [msg for msg in messages if msg.role != 'system'],
-            key=lambda x: (x.unix_timestamp)
-        )
+        """
+        Store a branch of the conversation and make it the active one.
+
+        Messages are merged into the tree by id, so other branches are kept.
+        Each new message without a parent is attached to the message before
+        it in the branch; messages of a fork's prefix are not stored again.
+
+        Args:
+            messages: The conversation of the branch, root first
+        """
+        tree = self.tree
+        prefix_ids = {m.id for m in self.prefix_messages}
+        positions: Optional[Dict[str, int]] = None
+        previous_id = None
+        for msg in messages:
+            if msg.role == 'system':
+                continue
+            if msg.id is None:
+                msg.id = tree.new_id()
+            if msg.parent_id is None and previous_id is not None:
+                msg.parent_id = previous_id
+            previous_id = msg.id
+            if msg.id in prefix_ids:
+                continue
+            stored = tree.get(msg.id)
+            if stored is None:
+                self.messages.append(msg)
+            elif stored is not msg:
+                if positions is None:
+                    positions = {m.id: i for i, m in enumerate(self.messages)}
+                self.messages[positions[msg.id]] = msg
+            tree.add(msg)
+        if previous_id in tree:
+            self.selected_message_id = previous_id
         self.update_time = get_iso8601_timestamp()
+
+# Characters of the first message kept as a chat's title
+TITLE_MAX_CHARS = 200
+
+@dataclass
+class ChatSummary:
+    """Listing metadata of a chat, without its messages"""
+    id: str
+    create_time: str
+    update_time: str
+    title: Optional[str] = None
+    message_count: int = 0
+    models: List[str] = field(default_factory=list)
+    providers: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_chat(cls, chat: Chat) -> 'ChatSummary':
+        from chat.utils.message_utils import get_message_text
+        return cls(
+            id=chat.id,
+            create_time=chat.create_time,
+            update_time=chat.update_time,
+            title=get_message_text(chat.messages[0])[:TITLE_MAX_CHARS] if chat.messages else None,
+            message_count=len(chat.messages),
+            models=sorted({m.model for m in chat.messages if m.model}),
+            providers=sorted({m.provider for m in chat.messages if m.provider})
+        )
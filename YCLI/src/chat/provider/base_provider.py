@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import List, Optional, Tuple
 from chat.models import Message, Chat
+from .http_client import close_clients, prewarm
 
 class BaseProvider(ABC):
     @abstractmethod
@@ -19,3 +20,11 @@ class BaseProvider(ABC):
             Exception: If API call fails
         """
         pass
+
+    async def prewarm(self) -> None:
+        """Open a connection to the provider while the user is typing, so the next request skips connection setup"""
+        await prewarm(self.bot_config.base_url)
+
+    async def close(self) -> None:
+        """Close the pooled HTTP connections shared by providers at the end of a session"""
+        await close_clients()
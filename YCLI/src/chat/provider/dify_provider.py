@@ -7,6 +7,7 @@ import httpx
 from chat.models import Message, Chat
 from bot.models import BotConfig
 from ..utils.message_utils import create_message
+from .http_client import get_client
 
 class DifyProvider(BaseProvider, DisplayManagerMixin):
     def __init__(self, bot_config: BotConfig):
@@ -73,63 +74,61 @@ class DifyProvider(BaseProvider, DisplayManagerMixin):
         body = self._prepare_request_body(messages, chat, system_prompt)
 
         try:
-            async with httpx.AsyncClient(
-                base_url=self.bot_config.base_url,
-            ) as client:
-                async with client.stream(
-                    "POST",
-                    self.chat_endpoint,
-                    headers=headers,
-                    json=body,
-                    timeout=60.0
-                ) as response:
-                    response.raise_for_status()
-
-                    message_id = None
-                    conversation_id = None
-
-                    async def generate_chunks():
-                        nonlocal message_id, conversation_id
-                        async for line in response.aiter_lines():
-                            if line.startswith("data: "):
-                                try:
-                                    data = json.loads(line[6:])
-                                    event = data.get('event')
-
-                                    if event == 'error':
-                                        raise Exception(f"API Error: {data.get('message', 'Unknown error')}")
-
-                                    elif event == 'message':
-                                        content = data.get('answer', '')
-                                        if not message_id:
-                                            message_id = data.get('message_id')
-                                        if not conversation_id:
-                                            conversation_id = data.get('conversation_id')
-
-                                        chunk_data = SimpleNamespace(
-                                            choices=[SimpleNamespace(
-                                                delta=SimpleNamespace(
-                                                    content=content,
-                                                    reasoning_content=None
-                                                )
-                                            )],
-                                            model=self.bot_config.model,
-                                            provider="dify"
-                                        )
-                                        yield chunk_data
-
-                                except json.JSONDecodeError:
-                                    continue
-
-                    content_full, reasoning_content_full = await self.display_manager.stream_response(generate_chunks())
-
-                    return create_message(
-                        "assistant",
-                        content_full,
-                        id=message_id,
-                        provider="dify",
-                        model=self.bot_config.model
-                    ), conversation_id
+            client = get_client(self.bot_config.base_url)
+            async with client.stream(
+                "POST",
+                self.chat_endpoint,
+                headers=headers,
+                json=body,
+                timeout=60.0
+            ) as response:
+                response.raise_for_status()
+
+                message_id = None
+                conversation_id = None
+
+                async def generate_chunks():
+                    nonlocal message_id, conversation_id
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            try:
+                                data = json.loads(line[6:])
+                                event = data.get('event')
+
+                                if event == 'error':
+                                    raise Exception(f"API Error: {data.get('message', 'Unknown error')}")
+
+                                elif event == 'message':
+                                    content = data.get('answer', '')
+                                    if not message_id:
+                                        message_id = data.get('message_id')
+                                    if not conversation_id:
+                                        conversation_id = data.get('conversation_id')
+
+                                    chunk_data = SimpleNamespace(
+                                        choices=[SimpleNamespace(
+                                            delta=SimpleNamespace(
+                                                content=content,
+                                                reasoning_content=None
+                                            )
+                                        )],
+                                        model=self.bot_config.model,
+                                        provider="dify"
+                                    )
+                                    yield chunk_data
+
+                            except json.JSONDecodeError:
+                                continue
+
+                content_full, reasoning_content_full = await self.display_manager.stream_response(generate_chunks())
+
+                return create_message(
+                    "assistant",
+                    content_full,
+                    id=message_id,
+                    provider="dify",
+                    model=self.bot_config.model
+                ), conversation_id
 
         except httpx.HTTPError as e:
             raise Exception(f"HTTP error getting chat response: {str(e)}")
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Dict, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+from config import config
+
+# One client per base_url, with the event loop it was created on
+_clients: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+
+def get_client(base_url: Optional[str] = None) -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client for a provider base URL.
+
+    Clients are created on first use and kept for the session, so the DNS
+    lookup, TCP connection and TLS handshake are paid once per host rather
+    than once per turn and tool call. Pool limits, keep-alive expiry and
+    HTTP/2 come from the provider_http config section. A client is bound
+    to the event loop it was created on and is recreated when used from a
+    new loop. Call close_clients() at the end of the session.
+
+    Args:
+        base_url: Base URL requests are relative to; None for a client
+            taking absolute URLs
+
+    Returns:
+        httpx.AsyncClient: The pooled client
+    """
+    loop = asyncio.get_running_loop()
+    key = base_url or ''
+    entry = _clients.get(key)
+    if entry is not None and not entry[0].is_closed and entry[1] is loop:
+        return entry[0]
+
+    http_config = config.get('provider_http', {})
+    http2 = bool(http_config.get('http2', False))
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 for chat providers needs the h2 package (pip install 'httpx[http2]'); using HTTP/1.1")
+            http2 = False
+    client = httpx.AsyncClient(
+        base_url=base_url or '',
+        limits=httpx.Limits(
+            max_connections=http_config.get('max_connections', 10),
+            max_keepalive_connections=http_config.get('max_keepalive_connections', 10),
+            keepalive_expiry=http_config.get('keepalive_expiry', 120.0)
+        ),
+        timeout=httpx.Timeout(http_config.get('timeout', 60.0), connect=http_config.get('connect_timeout', 10.0)),
+        http2=http2
+    )
+    _clients[key] = (client, loop)
+    return client
+
+async def close_clients() -> None:
+    """Close every shared provider client and its connections"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client, _ in clients:
+        if client.is_closed:
+            continue
+        try:
+            await client.aclose()
+        except RuntimeError:
+            # Created on an event loop that is already closed
+            pass
+
+async def prewarm(base_url: str) -> bool:
+    """
+    Open a kept-alive connection to a provider ahead of its next request.
+
+    A HEAD request to base_url resolves DNS and completes the TCP and TLS
+    handshake; whatever the status, the connection is returned to the
+    shared client's pool, where the next request to base_url picks it up.
+    An idle connection already in the pool is reused instead.
+
+    Returns:
+        bool: True if the provider answered, False if it could not be reached
+    """
+    try:
+        await get_client(base_url).head('')
+        return True
+    except httpx.HTTPError as e:
+        logger.debug(f"Pre-warming {base_url} failed: {str(e)}")
+        return False
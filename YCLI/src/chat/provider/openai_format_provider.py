@@ -7,6 +7,7 @@ import httpx
 from chat.models import Message, Chat
 from bot.models import BotConfig
 from ..utils.message_utils import create_message
+from .http_client import get_client
 
 class OpenAIFormatProvider(BaseProvider, DisplayManagerMixin):
     def __init__(self, bot_config: BotConfig):
@@ -17,10 +18,61 @@ class OpenAIFormatProvider(BaseProvider, DisplayManagerMixin):
         """
         DisplayManagerMixin.__init__(self)
         self.bot_config = bot_config
+        # Request dicts of the history sent last, as (message, signature, dict)
+        self._prepared_messages: List[Tuple[Message, Tuple, Dict]] = []
+        self._prepared_system: Optional[Tuple[str, Dict]] = None
+
+    def _prepare_system_message(self, system_prompt: str) -> Dict:
+        """Build the request dict of the system prompt, cached while the prompt is unchanged"""
+        if self._prepared_system is not None and self._prepared_system[0] == system_prompt:
+            return self._prepared_system[1]
+        system_message = create_message('system', system_prompt)
+        system_message_dict = system_message.to_dict()
+        if isinstance(system_message_dict["content"], str):
+            system_message_dict["content"] = [{"type": "text", "text": system_message_dict["content"]}]
+        # Remove timestamp fields, otherwise likely unsupported_country_region_territory
+        system_message_dict.pop("timestamp", None)
+        system_message_dict.pop("unix_timestamp", None)
+        # add cache_control only to claude-3 series model
+        if "claude-3" in self.bot_config.model:
+            for part in system_message_dict["content"]:
+                if part.get("type") == "text":
+                    part["cache_control"] = {"type": "ephemeral"}
+        self._prepared_system = (system_prompt, system_message_dict)
+        return system_message_dict
+
+    @staticmethod
+    def _message_signature(msg: Message) -> Tuple:
+        """Cheap fingerprint of the fields set on a message after it was first sent"""
+        if isinstance(msg.content, str):
+            content_length = len(msg.content)
+        else:
+            content_length = tuple(len(part.text) for part in msg.content)
+        return (msg.id, msg.parent_id, content_length)
+
+    def _prepare_message(self, msg: Message) -> Dict:
+        """Build the request dict of a history message"""
+        msg_dict = msg.to_dict()
+        if isinstance(msg_dict["content"], list):
+            msg_dict["content"] = [dict(part) for part in msg_dict["content"]]
+        # Remove timestamp fields, otherwise likely unsupported_country_region_territory
+        msg_dict.pop("timestamp", None)
+        msg_dict.pop("unix_timestamp", None)
+        return msg_dict
 
     def prepare_messages_for_completion(self, messages: List[Message], system_prompt: Optional[str] = None) -> List[Dict]:
         """Prepare messages for completion by adding system message and cache_control.
 
+        The request dicts of messages are cached across calls: while the
+        history only grows, as it does turn after turn and through tool
+        loops, only messages added since the last call are converted. The
+        cache is matched by message identity, so a different history (a
+        switched branch, a reloaded chat) rebuilds from where it diverges.
+        Messages persisted since they were cached get an id and parent_id
+        in place, so each entry also checks a signature of those fields and
+        the content length, and a changed message is converted again.
+        The returned dicts are shared with the cache and must not be modified.
+
         Args:
             messages: Original list of Message objects
             system_prompt: Optional system message to add at the start
@@ -28,39 +80,32 @@ class OpenAIFormatProvider(BaseProvider, DisplayManagerMixin):
         Returns:
             List[Dict]: New message list with system message and cache_control added
         """
+        # Keep the cached prefix that is still the start of this history
+        keep = 0
+        limit = min(len(self._prepared_messages), len(messages))
+        while keep < limit:
+            cached_msg, signature, _ = self._prepared_messages[keep]
+            if cached_msg is not messages[keep] or signature != self._message_signature(cached_msg):
+                break
+            keep += 1
+        del self._prepared_messages[keep:]
+        for msg in messages[keep:]:
+            self._prepared_messages.append((msg, self._message_signature(msg), self._prepare_message(msg)))
+
         # Create new list starting with system message if provided
-        prepared_messages = []
-        if system_prompt:
-            system_message = create_message('system', system_prompt)
-            system_message_dict = system_message.to_dict()
-            if isinstance(system_message_dict["content"], str):
-                system_message_dict["content"] = [{"type": "text", "text": system_message_dict["content"]}]
-            # Remove timestamp fields, otherwise likely unsupported_country_region_territory
-            system_message_dict.pop("timestamp", None)
-            system_message_dict.pop("unix_timestamp", None)
-            # add cache_control only to claude-3 series model
-            if "claude-3" in self.bot_config.model:
-                for part in system_message_dict["content"]:
-                    if part.get("type") == "text":
-                        part["cache_control"] = {"type": "ephemeral"}
-            prepared_messages.append(system_message_dict)
-
-        # Add original messages
-        for msg in messages:
-            msg_dict = msg.to_dict()
-            if isinstance(msg_dict["content"], list):
-                msg_dict["content"] = [dict(part) for part in msg_dict["content"]]
-            # Remove timestamp fields, otherwise likely unsupported_country_region_territory
-            msg_dict.pop("timestamp", None)
-            msg_dict.pop("unix_timestamp", None)
-            prepared_messages.append(msg_dict)
+        prepared_messages = [self._prepare_system_message(system_prompt)] if system_prompt else []
+        prepared_messages.extend(msg_dict for _, _, msg_dict in self._prepared_messages)
 
         # Find last user message
         if "claude-3" in self.bot_config.model:
-            for msg in reversed(prepared_messages):
-                if msg["role"] == "user":
+            for index in range(len(prepared_messages) - 1, -1, -1):
+                if prepared_messages[index]["role"] == "user":
+                    # Mark a copy, the cached dict stays as the message was sent before
+                    msg = dict(prepared_messages[index])
                     if isinstance(msg["content"], str):
                         msg["content"] = [{"type": "text", "text": msg["content"]}]
+                    else:
+                        msg["content"] = [dict(part) for part in msg["content"]]
                     # Add cache_control to last text part
                     text_parts = [part for part in msg["content"] if part.get("type") == "text"]
                     if text_parts:
@@ -69,6 +114,7 @@ class OpenAIFormatProvider(BaseProvider, DisplayManagerMixin):
                         last_text_part = {"type": "text", "text": "..."}
                         msg["content"].append(last_text_part)
                     last_text_part["cache_control"] = {"type": "ephemeral"}
+                    prepared_messages[index] = msg
                     break
 
         return prepared_messages
@@ -102,79 +148,77 @@ class OpenAIFormatProvider(BaseProvider, DisplayManagerMixin):
         if self.bot_config.reasoning_effort:
             body["reasoning_effort"] = self.bot_config.reasoning_effort
         try:
-            async with httpx.AsyncClient(
-                base_url=self.bot_config.base_url,
-            ) as client:
-                async with client.stream(
-                    "POST",
-                    self.bot_config.custom_api_path if self.bot_config.custom_api_path else "/chat/completions",
-                    headers={
-                        "HTTP-Referer": "https://luohy15.com",
-                        'X-Title': 'y-cli',
-                        "Authorization": f"Bearer {self.bot_config.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json=body,
-                    timeout=60.0
-                ) as response:
-                    response.raise_for_status()
-
-                    if not self.display_manager:
-                        raise Exception("Display manager not set for streaming response")
-
-                    # Store provider and model info from first response chunk
-                    provider = None
-                    model = None
-                    links = None
-
-                    async def generate_chunks():
-                        nonlocal provider, model, links
-                        async for chunk in response.aiter_lines():
-                            if chunk.startswith("data: "):
-                                try:
-                                    data = json.loads(chunk[6:])
-                                    # Extract provider and model from first chunk that has them
-                                    if provider is None and data.get("provider"):
-                                        provider = data["provider"]
-                                    if model is None and data.get("model"):
-                                        model = data["model"]
+            client = get_client(self.bot_config.base_url)
+            async with client.stream(
+                "POST",
+                self.bot_config.custom_api_path if self.bot_config.custom_api_path else "/chat/completions",
+                headers={
+                    "HTTP-Referer": "https://luohy15.com",
+                    'X-Title': 'y-cli',
+                    "Authorization": f"Bearer {self.bot_config.api_key}",
+                    "Content-Type": "application/json",
+                },
+                json=body,
+                timeout=60.0
+            ) as response:
+                response.raise_for_status()
+
+                if not self.display_manager:
+                    raise Exception("Display manager not set for streaming response")
+
+                # Store provider and model info from first response chunk
+                provider = None
+                model = None
+                links = None
+
+                async def generate_chunks():
+                    nonlocal provider, model, links
+                    async for chunk in response.aiter_lines():
+                        if chunk.startswith("data: "):
+                            try:
+                                data = json.loads(chunk[6:])
+                                # Extract provider and model from first chunk that has them
+                                if provider is None and data.get("provider"):
+                                    provider = data["provider"]
+                                if model is None and data.get("model"):
+                                    model = data["model"]
                                     
-                                    # Extract Perplexity-specific links from response
-                                    if links is None and provider and "perplexity" in provider.lower():
-                                        if data.get("links"):
-                                            links = data["links"]
-                                        elif data.get("citations"):
-                                            links = data["citations"]
-                                        elif data.get("references"):
-                                            links = data["references"]
-
-                                    if data.get("choices"):
-                                        delta = data["choices"][0].get("delta", {})
-                                        content = delta.get("content")
-                                        reasoning_content = delta.get("reasoning_content") if delta.get("reasoning_content") else delta.get("reasoning")
-                                        if content is not None or reasoning_content is not None:
-                                            chunk_data = SimpleNamespace(
-                                                choices=[SimpleNamespace(
-                                                    delta=SimpleNamespace(content=content, reasoning_content=reasoning_content)
-                                                )],
-                                                model=model,
-                                                provider=provider
-                                            )
-                                            yield chunk_data
-                                except json.JSONDecodeError:
-                                    continue
-                    content_full, reasoning_content_full = await self.display_manager.stream_response(generate_chunks())
-                    # build assistant message
-                    assistant_message = create_message(
-                        "assistant",
-                        content_full,
-                        reasoning_content=reasoning_content_full,
-                        provider=provider if provider is not None else self.bot_config.name,
-                        model=model,
-                        reasoning_effort=self.bot_config.reasoning_effort if self.bot_config.reasoning_effort else None,
-                        links=links
-                    )
-                    return assistant_message, None
+                                # Extract Perplexity-specific links from response
+                                if links is None and provider and "perplexity" in provider.lower():
+                                    if data.get("links"):
+                                        links = data["links"]
+                                    elif data.get("citations"):
+                                        links = data["citations"]
+                                    elif data.get("references"):
+                                        links = data["references"]
+
+                                if data.get("choices"):
+                                    delta = data["choices"][0].get("delta", {})
+                                    content = delta.get("content")
+                                    reasoning_content = delta.get("reasoning_content") if delta.get("reasoning_content") else delta.get("reasoning")
+                                    if content is not None or reasoning_content is not None:
+                                        chunk_data = SimpleNamespace(
+                                            choices=[SimpleNamespace(
+                                                delta=SimpleNamespace(content=content, reasoning_content=reasoning_content)
+                                            )],
+                                            model=model,
+                                            provider=provider
+                                        )
+                                        yield chunk_data
+                            except json.JSONDecodeError:
+                                continue
+                content_full, reasoning_content_full = await self.display_manager.stream_response(generate_chunks())
+                # build assistant message
+                assistant_message = create_message(
+                    "assistant",
+                    content_full,
+                    reasoning_content=reasoning_content_full,
+                    provider=provider if provider is not None else self.bot_config.name,
+                    model=model,
+                    reasoning_effort=self.bot_config.reasoning_effort if self.bot_config.reasoning_effort else None,
+                    links=links
+                )
+                return assistant_message, None
 
         except httpx.HTTPError as e:
             raise Exception(f"HTTP error getting chat response: {str(e)}")
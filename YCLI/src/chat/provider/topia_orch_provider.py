@@ -9,8 +9,12 @@ import httpx
 from chat.models import Message, Chat
 from bot.models import BotConfig
 from ..utils.message_utils import create_message
+from .http_client import get_client
 from config import config
 
+# Tokens expiring within this many seconds are refreshed by prewarm()
+TOKEN_REFRESH_MARGIN = 300
+
 class TopiaOrchProvider(BaseProvider, DisplayManagerMixin):
     def __init__(self, bot_config: BotConfig):
         """Initialize Topia settings.
@@ -32,13 +36,13 @@ class TopiaOrchProvider(BaseProvider, DisplayManagerMixin):
         """Get path to token cache file"""
         return os.path.join(config.get("tmp_dir"), '.topia_token')
 
-    async def _get_cached_token(self):
-        """Get token from cache file if valid"""
+    async def _get_cached_token(self, min_ttl: float = 0):
+        """Get token from cache file if valid for at least min_ttl more seconds"""
         try:
             if os.path.exists(self._get_token_file_path()):
                 with open(self._get_token_file_path(), 'r') as f:
                     data = json.load(f)
-                    if data['expires_at'] > time.time():
+                    if data['expires_at'] > time.time() + min_ttl:
                         return data['access_token']
         except:
             pass
@@ -47,22 +51,23 @@ class TopiaOrchProvider(BaseProvider, DisplayManagerMixin):
     async def _refresh_and_cache_token(self):
         """Get new token and save to cache"""
         app_id, app_secret = self._parse_credentials()
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/login",
-                json={"appId": app_id, "appSecret": app_secret}
-            )
-            data = response.json()['data']
-
-            # Save to cache file
-            cache_data = {
-                'access_token': data['access_token'],
-                'expires_at': time.time() + data['expires_in']
-            }
-            with open(self._get_token_file_path(), 'w') as f:
-                json.dump(cache_data, f)
-
-            return data['access_token']
+        # The chat request that follows reuses this connection
+        client = get_client(self.base_url)
+        response = await client.post(
+            f"{self.base_url}/login",
+            json={"appId": app_id, "appSecret": app_secret}
+        )
+        data = response.json()['data']
+
+        # Save to cache file
+        cache_data = {
+            'access_token': data['access_token'],
+            'expires_at': time.time() + data['expires_in']
+        }
+        with open(self._get_token_file_path(), 'w') as f:
+            json.dump(cache_data, f)
+
+        return data['access_token']
 
     async def _get_valid_token(self):
         """Get a valid token, refresh if needed"""
@@ -71,6 +76,14 @@ class TopiaOrchProvider(BaseProvider, DisplayManagerMixin):
             token = await self._refresh_and_cache_token()
         return token
 
+    async def prewarm(self) -> None:
+        """Refresh a token near expiry and open a connection while the user is typing"""
+        if not await self._get_cached_token(min_ttl=TOKEN_REFRESH_MARGIN):
+            # The login request opens the connection the chat request reuses
+            await self._refresh_and_cache_token()
+            return
+        await super().prewarm()
+
     async def _prepare_headers(self) -> Dict[str, str]:
         """Prepare headers for API request."""
         token = await self._get_valid_token()
@@ -123,70 +136,68 @@ class TopiaOrchProvider(BaseProvider, DisplayManagerMixin):
             headers = await self._prepare_headers()
             body = self._prepare_request_body(messages, chat)
 
-            async with httpx.AsyncClient(
-                base_url=self.base_url,
-            ) as client:
-                async with client.stream(
-                    "POST",
-                    self.chat_endpoint,
-                    headers=headers,
-                    json=body,
-                    timeout=60.0
-                ) as response:
-                    response.raise_for_status()
-
-                    message_id = None
-                    content_full = ""
-
-                    async def generate_chunks():
-                        nonlocal message_id, content_full
-                        current_content = ""  # Track current content
-
-                        async for line in response.aiter_lines():
-                            if line.startswith("data:"):
-                                try:
-                                    data = json.loads(line[5:])
-
-                                    # Handle final message with full details
-                                    if "id" in data:
-                                        message_id = data.get("id")
-                                        # Skip yielding as this is the final message
-                                        continue
-
-                                    # Handle streaming content
-                                    content = data.get("content", "")
-                                    if not content:
-                                        current_content = ""  # Reset if empty
-                                    else:
-                                        # Use difference as delta
-                                        delta = content[len(current_content):]
-                                        current_content = content  # Update tracking
-
-                                        if delta:  # Only yield if there's new content
-                                            chunk_data = SimpleNamespace(
-                                                choices=[SimpleNamespace(
-                                                    delta=SimpleNamespace(
-                                                        content=delta,
-                                                        reasoning_content=None
-                                                    )
-                                                )],
-                                                model=self.bot_config.model,
-                                                provider="topia"
-                                            )
-                                            yield chunk_data
-
-                                except json.JSONDecodeError:
+            client = get_client(self.base_url)
+            async with client.stream(
+                "POST",
+                self.chat_endpoint,
+                headers=headers,
+                json=body,
+                timeout=60.0
+            ) as response:
+                response.raise_for_status()
+
+                message_id = None
+                content_full = ""
+
+                async def generate_chunks():
+                    nonlocal message_id, content_full
+                    current_content = ""  # Track current content
+
+                    async for line in response.aiter_lines():
+                        if line.startswith("data:"):
+                            try:
+                                data = json.loads(line[5:])
+
+                                # Handle final message with full details
+                                if "id" in data:
+                                    message_id = data.get("id")
+                                    # Skip yielding as this is the final message
                                     continue
 
-                    content_full, _ = await self.display_manager.stream_response(generate_chunks())
-
-                    return create_message(
-                        "assistant",
-                        content_full,
-                        id=message_id,
-                        provider="topia",
-                        model=self.bot_config.model
-                    ), None  # Topia doesn't use external_id
+                                # Handle streaming content
+                                content = data.get("content", "")
+                                if not content:
+                                    current_content = ""  # Reset if empty
+                                else:
+                                    # Use difference as delta
+                                    delta = content[len(current_content):]
+                                    current_content = content  # Update tracking
+
+                                    if delta:  # Only yield if there's new content
+                                        chunk_data = SimpleNamespace(
+                                            choices=[SimpleNamespace(
+                                                delta=SimpleNamespace(
+                                                    content=delta,
+                                                    reasoning_content=None
+                                                )
+                                            )],
+                                            model=self.bot_config.model,
+                                            provider="topia"
+                                        )
+                                        yield chunk_data
+
+                            except json.JSONDecodeError:
+                                continue
+
+                content_full, _ = await self.display_manager.stream_response(generate_chunks())
+
+                return create_message(
+                    "assistant",
+                    content_full,
+                    id=message_id,
+                    provider="topia",
+                    model=self.bot_config.model
+                ), None  # Topia doesn't use external_id
 
         except httpx.HTTPError as e:
             raise Exception(f"HTTP error getting chat response: {str(e)}")
@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from chat.models import Chat
+from typing import AsyncIterator, List, Optional
+from chat.models import Chat, ChatSummary
+
+class ChatConflictError(ValueError):
+    """Raised when a chat was changed elsewhere since it was read"""
 
 class ChatRepository(ABC):
     """
@@ -27,6 +30,28 @@ class ChatRepository(ABC):
         """
         pass
     
+    async def list_chat_summaries(self, keyword: Optional[str] = None,
+                                  model: Optional[str] = None,
+                                  provider: Optional[str] = None,
+                                  limit: int = 10) -> List[ChatSummary]:
+        """
+        List the metadata of chats, filtered and ordered like list_chats
+        
+        Backends that store chat metadata separately override this to
+        avoid reading messages.
+        
+        Args:
+            keyword: Optional text to filter messages by content
+            model: Optional model name to filter by
+            provider: Optional provider name to filter by
+            limit: Maximum number of chats to return (default: 10)
+            
+        Returns:
+            List[ChatSummary]: Summaries of the matching chats
+        """
+        chats = await self.list_chats(keyword=keyword, model=model, provider=provider, limit=limit)
+        return [ChatSummary.from_chat(chat) for chat in chats]
+    
     @abstractmethod
     async def get_chat(self, chat_id: str) -> Optional[Chat]:
         """
@@ -92,6 +117,28 @@ class ChatRepository(ABC):
         """
         pass
     
+    async def iter_chats(self) -> AsyncIterator[Chat]:
+        """
+        Iterate over all chats in storage.
+
+        Implementations override this to stream chats instead of
+        materializing the whole store at once.
+
+        Yields:
+            Chat: Each chat in storage
+        """
+        for chat in await self._read_chats():
+            yield chat
+    
+    async def close(self) -> None:
+        """
+        Release connections or other resources held by the repository.
+
+        The repository may still be used afterwards; resources are
+        reacquired on demand.
+        """
+        pass
+    
     @abstractmethod
     async def _write_chats(self, chats: List[Chat]) -> None:
         """
@@ -1,26 +1,228 @@
 import json
 import os
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Dict, Any
 from datetime import datetime
 
-from chat.models import Chat, Message
+from loguru import logger
+
+from chat.models import Chat, ChatSummary, Message, TITLE_MAX_CHARS
 from config import config
-from . import ChatRepository
+from chat.utils.message_utils import get_message_text
+from util import get_iso8601_timestamp
+from . import ChatRepository, ChatConflictError
+from .cloudflare_d1_compression import ContentCodec
+from .cloudflare_d1_util import D1Error, D1PayloadTooLargeError, D1UnavailableError, PreparedStatement
+from .metrics import phase, add_count
+
+# Version 1 stored every chat as one json_content blob in the chat table
+SCHEMA_VERSION = 6
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS chat (
+        user_prefix TEXT NOT NULL,
+        chat_id TEXT NOT NULL,
+        create_time TEXT,
+        update_time TEXT,
+        header_json TEXT NOT NULL,
+        title TEXT,
+        message_count INTEGER NOT NULL DEFAULT 0,
+        models TEXT NOT NULL DEFAULT '[]',
+        providers TEXT NOT NULL DEFAULT '[]',
+        version INTEGER NOT NULL DEFAULT 0,
+        content_hash TEXT,
+        PRIMARY KEY (user_prefix, chat_id)
+    );
+    CREATE INDEX IF NOT EXISTS chat_update_time ON chat (user_prefix, update_time);
+    CREATE INDEX IF NOT EXISTS chat_create_time ON chat (user_prefix, create_time);
+    CREATE TABLE IF NOT EXISTS message (
+        user_prefix TEXT NOT NULL,
+        chat_id TEXT NOT NULL,
+        message_id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        json_content TEXT NOT NULL,
+        PRIMARY KEY (user_prefix, chat_id, message_id)
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(text, tokenize = 'trigram');
+"""
+
+def message_text_sql(column: str) -> str:
+    """SQL expression for the plain text of a message JSON column, like get_message_text"""
+    return f"""
+        CASE json_type({column}, '$.content')
+            WHEN 'array' THEN (
+                SELECT group_concat(json_extract(part.value, '$.text'), char(10))
+                FROM json_each({column}, '$.content') AS part
+            )
+            ELSE json_extract({column}, '$.content')
+        END
+    """
+
+# Statements upgrading the schema to each version; every list runs as one transaction
+MIGRATIONS = {
+    3: [
+        "ALTER TABLE chat ADD COLUMN title TEXT",
+        "ALTER TABLE chat ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE chat ADD COLUMN models TEXT NOT NULL DEFAULT '[]'",
+        "ALTER TABLE chat ADD COLUMN providers TEXT NOT NULL DEFAULT '[]'",
+        "CREATE INDEX IF NOT EXISTS chat_create_time ON chat (user_prefix, create_time)",
+        # Backfill from the message rows, matching ChatSummary.from_chat
+        f"""
+        UPDATE chat SET
+            message_count = (
+                SELECT COUNT(*) FROM message m
+                WHERE m.user_prefix = chat.user_prefix AND m.chat_id = chat.chat_id
+            ),
+            models = (
+                SELECT json_group_array(model) FROM (
+                    SELECT DISTINCT json_extract(m.json_content, '$.model') AS model FROM message m
+                    WHERE m.user_prefix = chat.user_prefix AND m.chat_id = chat.chat_id AND json_extract(m.json_content, '$.model') IS NOT NULL
+                    ORDER BY model
+                )
+            ),
+            providers = (
+                SELECT json_group_array(provider) FROM (
+                    SELECT DISTINCT json_extract(m.json_content, '$.provider') AS provider FROM message m
+                    WHERE m.user_prefix = chat.user_prefix AND m.chat_id = chat.chat_id AND json_extract(m.json_content, '$.provider') IS NOT NULL
+                    ORDER BY provider
+                )
+            ),
+            title = (
+                SELECT substr({message_text_sql('m.json_content')}, 1, {TITLE_MAX_CHARS})
+                FROM message m
+                WHERE m.user_prefix = chat.user_prefix AND m.chat_id = chat.chat_id
+                ORDER BY m.position
+                LIMIT 1
+            )
+        """,
+    ],
+    4: [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(text, tokenize = 'trigram')",
+        f"INSERT INTO message_fts (rowid, text) SELECT rowid, {message_text_sql('json_content')} FROM message",
+    ],
+    5: [
+        "ALTER TABLE chat ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+    ],
+    # Rows written before stay NULL and count as changed until written again
+    6: [
+        "ALTER TABLE chat ADD COLUMN content_hash TEXT",
+    ],
+}
+
+# Every write of a chat row bumps its version
+UPSERT_CHAT_SQL = """
+    INSERT INTO chat (
+        user_prefix, chat_id, create_time, update_time, header_json,
+        title, message_count, models, providers, content_hash
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_prefix, chat_id) DO UPDATE SET
+        create_time = excluded.create_time,
+        update_time = excluded.update_time,
+        header_json = excluded.header_json,
+        title = excluded.title,
+        message_count = excluded.message_count,
+        models = excluded.models,
+        providers = excluded.providers,
+        content_hash = excluded.content_hash,
+        version = chat.version + 1
+"""
+# Updates an existing chat row, only at the expected version unless that is NULL
+UPDATE_CHAT_SQL = """
+    UPDATE chat SET
+        update_time = ?, header_json = ?, title = ?, message_count = ?, models = ?, providers = ?,
+        content_hash = ?, version = version + 1
+    WHERE user_prefix = ? AND chat_id = ? AND (? IS NULL OR version = ?)
+"""
+# Violates NOT NULL when the statement before it changed nothing, which aborts
+# the batch and rolls back its other statements
+REQUIRE_CHANGE_SQL = """
+    INSERT INTO chat (user_prefix, chat_id, header_json)
+    SELECT ?, ?, NULL WHERE changes() = 0
+"""
+CHAT_VERSION_SQL = "SELECT version FROM chat WHERE user_prefix = ? AND chat_id = ?"
+SUMMARY_COLUMNS = """
+    chat.chat_id, chat.create_time, chat.update_time, chat.title,
+    chat.message_count, chat.models, chat.providers
+"""
+UPSERT_MESSAGE_SQL = """
+    INSERT OR REPLACE INTO message (user_prefix, chat_id, message_id, position, json_content)
+    VALUES (?, ?, ?, ?, ?)
+"""
+# Message ids are bound as one JSON array to stay clear of D1's bound parameter limit
+DELETE_MESSAGES_SQL = """
+    DELETE FROM message
+    WHERE user_prefix = ? AND chat_id = ? AND message_id IN (SELECT value FROM json_each(?))
+"""
+PRUNE_MESSAGES_SQL = """
+    DELETE FROM message
+    WHERE user_prefix = ? AND chat_id = ? AND message_id NOT IN (SELECT value FROM json_each(?))
+"""
+# message_fts rows share the rowid of the message row they index
+FTS_DELETE_SQL = """
+    DELETE FROM message_fts WHERE rowid IN (
+        SELECT rowid FROM message
+        WHERE user_prefix = ? AND chat_id = ? AND message_id IN (SELECT value FROM json_each(?))
+    )
+"""
+FTS_DELETE_CHAT_SQL = """
+    DELETE FROM message_fts WHERE rowid IN (
+        SELECT rowid FROM message WHERE user_prefix = ? AND chat_id = ?
+    )
+"""
+# Texts are bound as one JSON object of message id -> text
+FTS_INSERT_SQL = """
+    INSERT INTO message_fts (rowid, text)
+    SELECT message.rowid, texts.value
+    FROM json_each(?) AS texts
+    JOIN message ON message.user_prefix = ? AND message.chat_id = ? AND message.message_id = texts.key
+"""
+# The trigram tokenizer cannot match shorter search terms
+FTS_MIN_TERM_CHARS = 3
+# Fixed per-statement cost of a batch entry on top of its bound JSON content
+STATEMENT_OVERHEAD_BYTES = len(UPSERT_MESSAGE_SQL) + 128
+MIN_BATCH_BYTES = 64 * 1024
+MIGRATION_PAGE_SIZE = 100
+# Chats per request when streaming the whole store; bounds memory and response size
+ITER_PAGE_SIZE = 50
+
+@dataclass
+class ChatWrite:
+    """Statements persisting one chat, with the message signatures they leave in D1"""
+    chat: Chat
+    user_prefix: str
+    statements: List[PreparedStatement]
+    size: int
+    signatures: Dict[str, int]
 
 class CloudflareD1Repository(ChatRepository):
     """
     Repository implementation for Cloudflare D1 database storage.
     """
-    def __init__(self, user_prefix: Optional[str] = None):
+    def __init__(self, user_prefix: Optional[str] = None, db=None, compression: Optional[str] = None):
         """
         Initialize the Cloudflare D1 repository.
         
         Args:
             user_prefix: Optional user prefix for isolating data (default: from config or 'default')
+            db: Optional D1 database client to use instead of the configured one
+            compression: Codec for new message rows: none, zlib or zstd (default: from config)
         """
         self.d1_config = config.get('cloudflare_d1', {})
         self.user_prefix = user_prefix or self.d1_config.get('user_prefix', 'default')
-        self.db = self._get_d1_database()
+        self.db = db if db is not None else self._get_d1_database()
+        self.codec = ContentCodec(
+            compression or self.d1_config.get('compression', 'none'),
+            min_bytes=self.d1_config.get('compression_min_bytes', 1024)
+        )
+        self.batch_max_statements = self.d1_config.get('batch_max_statements', 50)
+        # Lowered for the rest of the session whenever D1 refuses a payload as too large
+        self.batch_max_bytes = self.d1_config.get('batch_max_bytes', 900 * 1024)
+        self._schema_ready = False
+        # Chat id -> {message id: signature} of the message rows known to be in D1
+        self._stored: Dict[str, Dict[str, int]] = {}
+        # Chat id -> version of the chat row as last read or written by this repository
+        self._versions: Dict[str, int] = {}
 
     def _get_d1_database(self):
         """
@@ -47,73 +249,314 @@ class CloudflareD1Repository(ChatRepository):
             from unittest.mock import MagicMock
             return MagicMock()
 
+    async def close(self) -> None:
+        """Close the pooled HTTP client of the D1 database"""
+        aclose = getattr(self.db, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
     async def _ensure_schema_exists(self) -> None:
         """
-        Initialize the database schema if it doesn't exist.
+        Create the schema, or migrate an older one, once per repository.
+        
+        Raises:
+            ValueError: If the database uses a newer schema than this version supports
+        """
+        if self._schema_ready:
+            return
+        results = await self.db.batch([
+            self.db.prepare("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"),
+            self.db.prepare("""
+                SELECT
+                    (SELECT MAX(version) FROM schema_version) AS version,
+                    EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat') AS has_chat,
+                    EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_v1') AS has_chat_v1,
+                    EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_fts') AS has_message_fts,
+                    (SELECT json_group_array(name) FROM pragma_table_info('chat')) AS chat_columns
+            """)
+        ], idempotent=True)
+        state = self._result_rows(results)[0]
+        version = state['version']
+        chat_columns = set(json.loads(state['chat_columns'] or '[]'))
+        if version is None:
+            if state['has_chat_v1'] or 'json_content' in chat_columns:
+                # Tables from before versioning: the single-blob chat table
+                await self._migrate_blob_table(renamed=bool(state['has_chat_v1']))
+                version = SCHEMA_VERSION
+            elif state['has_chat']:
+                # Normalized tables whose version row was lost, by a migration
+                # that stopped between dropping chat_v1 and recording its version
+                version = self._infer_schema_version(chat_columns, bool(state['has_message_fts']))
+                await self._set_schema_version(version)
+                logger.warning(f"Recorded missing D1 schema version {version}")
+            else:
+                # One transaction, so a failed request cannot leave new tables
+                # without a version, which would be taken for the blob table
+                await self.db.batch(
+                    [self.db.prepare(sql) for sql in SCHEMA_SQL.split(';') if sql.strip()]
+                    + [self._schema_version_statement(SCHEMA_VERSION)]
+                )
+                version = SCHEMA_VERSION
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"D1 schema version {version} is newer than the supported version {SCHEMA_VERSION}")
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            await self.db.batch(
+                [self.db.prepare(sql) for sql in MIGRATIONS[target]]
+                + [self._schema_version_statement(target)]
+            )
+            logger.info(f"Migrated D1 schema to version {target}")
+        self._schema_ready = True
+
+    def _schema_version_statement(self, version: int) -> PreparedStatement:
+        return self.db.prepare("INSERT INTO schema_version (version) VALUES (?)").bind(version)
+
+    async def _set_schema_version(self, version: int) -> None:
+        await self._schema_version_statement(version).run()
+
+    @staticmethod
+    def _infer_schema_version(chat_columns: set, has_message_fts: bool) -> int:
+        """Get the version of normalized tables from the columns and tables each migration added"""
+        if 'content_hash' in chat_columns:
+            return 6
+        if 'version' in chat_columns:
+            return 5
+        if has_message_fts:
+            return 4
+        if 'title' in chat_columns:
+            return 3
+        return 2
+
+    async def _migrate_blob_table(self, renamed: bool = False) -> None:
+        """
+        Move chats from the version 1 blob table into the chat and message tables.
+        
+        The blob table is renamed to chat_v1 and only dropped once every chat
+        was copied, so an interrupted migration resumes on the next start.
+        The drop and the new schema version go in one batch, so the
+        normalized tables are never left without a version.
+        
+        Args:
+            renamed: Whether the blob table was already renamed by an earlier attempt
+        """
+        if not renamed:
+            await self.db.exec("ALTER TABLE chat RENAME TO chat_v1")
+        await self.db.exec(SCHEMA_SQL)
+
+        stats = {'total': 0, 'success': 0, 'failed': 0, 'requests': 0, 'failed_chats': {}}
+        last_id = 0
+        while True:
+            stmt = self.db.prepare("""
+                SELECT id, user_prefix, json_content FROM chat_v1
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            """).bind(last_id, MIGRATION_PAGE_SIZE)
+            rows = self._result_rows(await stmt.all())
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            writes = []
+            for row in rows:
+                try:
+                    chat = Chat.from_dict(json.loads(row['json_content']))
+                except Exception as e:
+                    print(f'Error parsing chat JSON: {e}')
+                    continue
+                writes.append(self._chat_write(chat, user_prefix=row['user_prefix'], prune=False))
+            stats['total'] += len(writes)
+            await self._write_all(writes, stats)
+
+        if stats['failed']:
+            raise ValueError(f"Failed to migrate {stats['failed']} chat(s) to the D1 message table; chat_v1 was kept")
+        await self.db.batch([
+            self.db.prepare("DROP TABLE chat_v1"),
+            self._schema_version_statement(SCHEMA_VERSION)
+        ])
+        logger.info(f"Migrated {stats['success']} chat(s) to D1 schema version {SCHEMA_VERSION}")
+
+    def _select_chats(self, where: str, order_by: str = "chat.update_time DESC", limit: bool = False,
+                      source: str = "chat") -> str:
+        """
+        Build the query reading whole chats: matching headers joined with their messages.
+        
+        Headers are filtered, ordered and limited on the chat table (joined
+        with `source`) alone, so messages are only read for the chats
+        returned. Bind the parameters of `source` and `where` first, then
+        the limit if requested, then the user prefix.
+        """
+        return f"""
+            SELECT c.chat_id, c.header_json, c.version, m.message_id, m.json_content
+            FROM (
+                SELECT chat.chat_id, chat.header_json, chat.version, ROW_NUMBER() OVER (ORDER BY {order_by}) AS row_order
+                FROM {source}
+                WHERE {where}
+                ORDER BY {order_by}
+                {"LIMIT ?" if limit else ""}
+            ) AS c
+            LEFT JOIN message AS m ON m.user_prefix = ? AND m.chat_id = c.chat_id
+            ORDER BY c.row_order, m.position
         """
-        # CREATE TABLE IF NOT EXISTS would typically be used here
-        await self.db.exec("""
-            CREATE TABLE IF NOT EXISTS chat (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                user_prefix TEXT NOT NULL, 
-                chat_id TEXT NOT NULL, 
-                json_content TEXT NOT NULL, 
-                update_time TEXT,
-                UNIQUE(user_prefix, chat_id)
-            );
-        """)
 
     async def _read_chats(self) -> List[Chat]:
         """
         Read all chats from the D1 database for the current user prefix.
         
+        Chats are fetched page by page, so no single response has to hold
+        the whole store.
+        
         Returns:
-            List[Chat]: All chats in storage
+            List[Chat]: All chats in storage, most recently updated first
         """
-        # In a real implementation, this would use the D1 API to query the database
-        stmt = self.db.prepare("""
-            SELECT json_content FROM chat 
-            WHERE user_prefix = ?
-            ORDER BY update_time DESC
-        """).bind(self.user_prefix)
-        results = await stmt.all()
+        chats = [chat async for chat in self.iter_chats()]
+        chats.sort(key=lambda chat: chat.update_time or "", reverse=True)
+        return chats
 
-        print(results)
+    async def iter_chats(self, page_size: int = ITER_PAGE_SIZE) -> AsyncIterator[Chat]:
+        """
+        Stream all chats of the current user prefix, one page per request.
+        
+        Pages are keyset-paginated on chat_id, the primary key, so each page
+        is a range scan from where the last one ended and a chat updated
+        while streaming is neither skipped nor yielded twice. Memory is
+        bounded by the page size.
         
+        Args:
+            page_size: Chats per request (default: ITER_PAGE_SIZE)
+            
+        Yields:
+            Chat: Each chat, in chat_id order
+        """
+        await self._ensure_schema_exists()
+        last_id = ""
+        while True:
+            stmt = self.db.prepare(self._select_chats(
+                "chat.user_prefix = ? AND chat.chat_id > ?",
+                order_by="chat.chat_id",
+                limit=True
+            )).bind(self.user_prefix, last_id, page_size, self.user_prefix)
+            rows = self._result_rows(await stmt.all())
+            if not rows:
+                return
+            # Taken from the rows, so a page of unparseable chats still advances
+            last_id = rows[-1]['chat_id']
+            page_chats = len({row['chat_id'] for row in rows})
+            for chat in self._parse_chats(rows):
+                yield chat
+            if page_chats < page_size:
+                return
+
+    def _result_rows(self, results: Any) -> List[Dict[str, Any]]:
+        """Get the rows of the last statement from a D1 query response"""
+        # The query endpoint returns one result object per statement
+        if isinstance(results, list):
+            results = results[-1] if results else {}
+        if isinstance(results, dict):
+            return results.get('results') or []
+        return []
+
+    def _parse_chats(self, rows: List[Dict[str, Any]]) -> List[Chat]:
+        """Reassemble chats from joined header and message rows, skipping broken chats"""
+        chat_dicts = []
+        with phase('decode'):
+            chat_id = None
+            chat_dict = None
+            for row in rows:
+                try:
+                    if row['chat_id'] != chat_id:
+                        chat_id = row['chat_id']
+                        chat_dict = None
+                        chat_dict = json.loads(row['header_json'])
+                        chat_dict['messages'] = []
+                        chat_dicts.append(chat_dict)
+                    if chat_dict is not None and row['json_content'] is not None:
+                        # Decoded in place, so callers see the JSON the signatures are taken over
+                        row['json_content'] = self.codec.decode(row['json_content'])
+                        chat_dict['messages'].append(json.loads(row['json_content']))
+                except Exception as e:
+                    print(f'Error parsing chat JSON: {e}')
         chats = []
-        # Handle different result formats - could be a dict with 'results' key or a list directly
-        if results:
-            result_rows = []
-            if isinstance(results, dict) and 'results' in results:
-                result_rows = results['results']
-            elif isinstance(results, list):
-                result_rows = results
-                
-            for row in result_rows:
+        with phase('parse'):
+            for chat_dict in chat_dicts:
                 try:
-                    chat_dict = json.loads(row['json_content'])
                     chats.append(Chat.from_dict(chat_dict))
                 except Exception as e:
                     print(f'Error parsing chat JSON: {e}')
-        
+        add_count('chats_read', len(chats))
         return chats
 
     async def _write_chats(self, chats: List[Chat]) -> None:
         """
-        This method is not directly used in the D1 implementation since
-        each chat is saved individually using saveChat.
+        Write chats in batched requests, keeping their update_time.
+        
+        Chats whose content hash matches the stored one are not sent again.
         
         Args:
             chats: The chats to write
+            
+        Raises:
+            ValueError: If any chat could not be written
         """
-        # D1 implementation uses individual operations instead of batch writes
-        for chat in chats:
-            await self.save_chat(chat)
+        stats = await self.save_chats(chats, skip_unchanged=True)
+        if stats['failed']:
+            failed = ', '.join(f"{chat_id} ({error})" for chat_id, error in stats['failed_chats'].items())
+            raise ValueError(f"Failed to save {stats['failed']} chat(s): {failed}")
+
+    def _list_filter(self, keyword: Optional[str] = None, model: Optional[str] = None,
+                     provider: Optional[str] = None):
+        """
+        Build the source, WHERE clause and order selecting chats for list_chats
+        
+        Keyword terms are looked up in the message_fts index and chats are
+        ranked by their best message containing every term. Terms too short
+        for the trigram index are looked for in the indexed text with instr,
+        as FTS5 answers LIKE patterns that short with no rows.
+        
+        Returns:
+            Tuple[str, str, List[Any], str]: FROM source, condition, bind
+            parameters in query order, and ORDER BY expression
+        """
+        source = "chat"
+        order_by = "chat.create_time DESC"
+        source_params = []
+        bind_params = [self.user_prefix]
+        where_clause = "chat.user_prefix = ?"
+        
+        # Process keyword search if provided
+        terms = keyword.strip().split() if keyword else []
+        if terms:
+            conditions = []
+            fts_terms = [term for term in terms if len(term) >= FTS_MIN_TERM_CHARS]
+            if fts_terms:
+                conditions.append("message_fts MATCH ?")
+                # Quoted, so terms are matched as literal substrings rather than query syntax
+                source_params.append(" ".join('"' + term.replace('"', '""') + '"' for term in fts_terms))
+            for term in terms:
+                if len(term) < FTS_MIN_TERM_CHARS:
+                    conditions.append("instr(lower(message_fts.text), ?) > 0")
+                    source_params.append(term.lower())
+            source_params.append(self.user_prefix)
+            source = f"""chat JOIN (
+                SELECT message.chat_id AS chat_id, {"MIN(message_fts.rank)" if fts_terms else "0"} AS rank
+                -- CROSS JOIN keeps the index lookup outermost instead of one MATCH per message
+                FROM message_fts CROSS JOIN message ON message.rowid = message_fts.rowid
+                WHERE {" AND ".join(conditions)} AND message.user_prefix = ?
+                GROUP BY message.chat_id
+            ) AS hits ON hits.chat_id = chat.chat_id"""
+            order_by = "hits.rank, chat.create_time DESC"
+        
+        # Model and provider filters match part of a name in the chat's sets
+        if model:
+            where_clause += " AND EXISTS (SELECT 1 FROM json_each(chat.models) WHERE value LIKE ?)"
+            bind_params.append(f"%{model}%")
+        if provider:
+            where_clause += " AND EXISTS (SELECT 1 FROM json_each(chat.providers) WHERE value LIKE ?)"
+            bind_params.append(f"%{provider}%")
+        return source, where_clause, source_params + bind_params, order_by
 
     async def list_chats(self, keyword: Optional[str] = None, 
                         model: Optional[str] = None,
                         provider: Optional[str] = None, 
-                        limit: int = 10) -> Dict[str, Any]:
+                        limit: int = 10) -> List[Chat]:
         """
         List chats with optional filtering using SQL queries
         
@@ -124,69 +567,56 @@ class CloudflareD1Repository(ChatRepository):
             limit: Maximum number of chats to return (default: 10)
             
         Returns:
-            Dict[str, Any]: Dictionary containing chats and total count
-                {
-                    'chats': List[Chat],  # The filtered chats
-                    'total': int,         # Total number of matching chats
-                    'limit': int          # Number of items per page
-                }
-        """
-        # Setup basic query parameters
-        bind_params = [self.user_prefix]
-        where_clause = "WHERE user_prefix = ?"
-        
-        # Process keyword search if provided
-        if keyword and keyword.strip():
-            # Split search by spaces to handle multiple search terms
-            search_terms = keyword.strip().split()
-            
-            if search_terms:
-                # Add a LIKE condition for each search term
-                search_clauses = " AND ".join(["json_content LIKE ?" for _ in search_terms])
-                where_clause += f" AND ({search_clauses})"
-                
-                # Add each search term as a parameter with wildcards
-                for term in search_terms:
-                    bind_params.append(f"%{term}%")
-        
-        # Add model filter if provided
-        if model:
-            where_clause += " AND json_content LIKE ?"
-            bind_params.append(f"%\"model\":\"%{model}%\"%")
-            
-        # Add provider filter if provided
-        if provider:
-            where_clause += " AND json_content LIKE ?"
-            bind_params.append(f"%\"provider\":\"%{provider}%\"%")
-        
-        # Get results with limit
-        query = f"""
-            SELECT json_content FROM chat 
-            {where_clause}
-            ORDER BY update_time DESC
-            LIMIT ?
+            List[Chat]: The filtered chats, best keyword match or else most recently created first
         """
-        
-        # Add limit parameter
-        bind_params.append(limit)
+        await self._ensure_schema_exists()
+        source, where_clause, bind_params, order_by = self._list_filter(keyword, model, provider)
+        query = self._select_chats(where_clause, order_by=order_by, limit=True, source=source)
+        bind_params.extend([limit, self.user_prefix])
         
         stmt = self.db.prepare(query).bind(*bind_params)
         results = await stmt.all()
-        results = results[-1]
-        
-        chats = []
-        if results:
-            result_rows = []
-            if isinstance(results, dict) and 'results' in results:
-                result_rows = results['results']
-                for row in result_rows:
-                    try:
-                        chat_dict = json.loads(row['json_content'])
-                        chats.append(Chat.from_dict(chat_dict))
-                    except Exception as e:
-                        print(f'Error parsing chat JSON: {e}')
+        return self._parse_chats(self._result_rows(results))
+
+    async def list_chat_summaries(self, keyword: Optional[str] = None,
+                                  model: Optional[str] = None,
+                                  provider: Optional[str] = None,
+                                  limit: int = 10) -> List[ChatSummary]:
+        """
+        List chat metadata from the summary columns of the chat table
         
-        return chats
+        Args:
+            keyword: Optional text to filter messages by content
+            model: Optional model name to filter by
+            provider: Optional provider name to filter by
+            limit: Maximum number of chats to return (default: 10)
+            
+        Returns:
+            List[ChatSummary]: Summaries of the matching chats, ordered like list_chats
+        """
+        await self._ensure_schema_exists()
+        source, where_clause, bind_params, order_by = self._list_filter(keyword, model, provider)
+        stmt = self.db.prepare(f"""
+            SELECT {SUMMARY_COLUMNS} FROM {source}
+            WHERE {where_clause}
+            ORDER BY {order_by}
+            LIMIT ?
+        """).bind(*bind_params, limit)
+        rows = self._result_rows(await stmt.all())
+        with phase('parse'):
+            summaries = [
+                ChatSummary(
+                    id=row['chat_id'],
+                    create_time=row['create_time'],
+                    update_time=row['update_time'],
+                    title=row['title'],
+                    message_count=row['message_count'],
+                    models=json.loads(row['models']),
+                    providers=json.loads(row['providers'])
+                )
+                for row in rows
+            ]
+        return summaries
 
     async def get_chat(self, chat_id: str) -> Optional[Chat]:
         """
@@ -198,22 +628,102 @@ class CloudflareD1Repository(ChatRepository):
         Returns:
             Optional[Chat]: The chat if found, None otherwise
         """
-        stmt = self.db.prepare("""
-            SELECT json_content FROM chat 
-            WHERE user_prefix = ? AND chat_id = ?
-        """).bind(self.user_prefix, chat_id)
-        result = await stmt.first()
-        
-        if not result:
+        await self._ensure_schema_exists()
+        stmt = self.db.prepare(self._select_chats("chat.user_prefix = ? AND chat.chat_id = ?")).bind(
+            self.user_prefix, chat_id, self.user_prefix
+        )
+        rows = self._result_rows(await stmt.all())
+        chats = self._parse_chats(rows)
+        if not chats:
             return None
+        # Remember the stored rows so the next save only sends what changed
+        self._versions[chat_id] = rows[0]['version']
+        self._stored[chat_id] = {
+            row['message_id']: hash((position, row['json_content']))
+            for position, row in enumerate(rows) if row['message_id'] is not None
+        }
+        return chats[-1]
+
+    async def get_chats(self, chat_ids: List[str]) -> List[Chat]:
+        """
+        Get several chats by ID in one query
         
-        result = result['results'][-1]
+        Args:
+            chat_ids: The IDs of the chats to retrieve
+            
+        Returns:
+            List[Chat]: The chats found, most recently updated first
+        """
+        await self._ensure_schema_exists()
+        stmt = self.db.prepare(self._select_chats(
+            "chat.user_prefix = ? AND chat.chat_id IN (SELECT value FROM json_each(?))"
+        )).bind(self.user_prefix, json.dumps(chat_ids), self.user_prefix)
+        return self._parse_chats(self._result_rows(await stmt.all()))
+
+    async def chats_updated_since(self, update_time: str, chat_id: str = "", limit: int = 100) -> List[Chat]:
+        """
+        Get chats updated after a point, oldest first, for incremental sync
         
-        try:
-            return Chat.from_dict(json.loads(result['json_content']))
-        except Exception as e:
-            print(f'Error parsing chat JSON: {e}')
-            return None
+        Chats are ordered by (update_time, chat_id), so passing the last chat
+        of a page as the next point pages through chats sharing an update_time.
+        
+        Args:
+            update_time: Return chats updated after this time
+            chat_id: Among chats updated exactly at update_time, only return
+                those with a greater ID
+            limit: Maximum number of chats to return (default: 100)
+            
+        Returns:
+            List[Chat]: The chats in (update_time, chat_id) order
+        """
+        await self._ensure_schema_exists()
+        stmt = self.db.prepare(self._select_chats(
+            "chat.user_prefix = ? AND (chat.update_time > ? OR (chat.update_time = ? AND chat.chat_id > ?))",
+            order_by="chat.update_time, chat.chat_id",
+            limit=True
+        )).bind(self.user_prefix, update_time, update_time, chat_id, limit, self.user_prefix)
+        return self._parse_chats(self._result_rows(await stmt.all()))
+
+    async def chat_ids(self) -> List[str]:
+        """Get the IDs of all chats without reading them"""
+        await self._ensure_schema_exists()
+        stmt = self.db.prepare("SELECT chat_id FROM chat WHERE user_prefix = ?").bind(self.user_prefix)
+        return [row['chat_id'] for row in self._result_rows(await stmt.all())]
+
+    async def content_hashes(self, chat_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Get the stored content hashes of chats without reading their messages
+        
+        Args:
+            chat_ids: The IDs of the chats
+            
+        Returns:
+            Dict[str, Optional[str]]: Chat id -> content hash, for the chats
+            found; None for rows written before hashes were stored
+        """
+        await self._ensure_schema_exists()
+        stmt = self.db.prepare("""
+            SELECT chat_id, content_hash FROM chat
+            WHERE user_prefix = ? AND chat_id IN (SELECT value FROM json_each(?))
+        """).bind(self.user_prefix, json.dumps(chat_ids))
+        return {row['chat_id']: row['content_hash'] for row in self._result_rows(await stmt.all())}
+
+    async def chat_hashes_updated_since(self, update_time: str, chat_id: str = "", limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Like chats_updated_since, but only the header of each chat
+        
+        Returns:
+            List[Dict]: chat_id, update_time and content_hash of each chat,
+            in (update_time, chat_id) order
+        """
+        await self._ensure_schema_exists()
+        stmt = self.db.prepare("""
+            SELECT chat_id, update_time, content_hash FROM chat
+            WHERE user_prefix = ? AND (update_time > ? OR (update_time = ? AND chat_id > ?))
+            ORDER BY update_time, chat_id
+            LIMIT ?
+        """).bind(self.user_prefix, update_time, update_time, chat_id, limit)
+        return self._result_rows(await stmt.all())
 
     async def add_chat(self, chat: Chat) -> Chat:
         """
@@ -232,6 +742,11 @@ class CloudflareD1Repository(ChatRepository):
         """
         Update an existing chat
         
+        The header row is updated only if it still has the version this
+        repository last read or wrote, in the same batch request as the
+        changed message rows, so a turn is persisted in one round trip.
+        Chats this repository has not read are updated unconditionally.
+        
         Args:
             chat: The chat with updated data
             
@@ -240,14 +755,42 @@ class CloudflareD1Repository(ChatRepository):
             
         Raises:
             ValueError: If the chat with the given ID doesn't exist
+            ChatConflictError: If the chat was changed elsewhere since it was read
         """
-        # Check if the chat exists first
-        existing_chat = await self.get_chat(chat.id)
-        if not existing_chat:
-            raise ValueError(f"Chat with id {chat.id} not found")
+        await self._ensure_schema_exists()
+        chat.update_time = get_iso8601_timestamp()
+        expected_version = self._versions.get(chat.id)
+        write = self._chat_write(chat, expected_version=expected_version, update=True)
+        add_count('chats_written')
         
-        # For D1, we use save_chat for both adding and updating
-        return await self.save_chat(chat)
+        try:
+            results = await self.db.batch(write.statements + [self._version_statement(chat.id)])
+        except D1Error as e:
+            self._stored.pop(chat.id, None)
+            self._versions.pop(chat.id, None)
+            # The batch was rolled back; find out whether the row was missing or moved on
+            try:
+                rows = self._result_rows(await self._version_statement(chat.id).all())
+            except Exception:
+                # D1 is unreachable or the circuit is open: the save failed either way
+                print(f'Error saving chat to D1: {e}')
+                raise ValueError(f"Failed to save chat: {e}")
+            if not rows:
+                raise ValueError(f"Chat with id {chat.id} not found")
+            if expected_version is not None and rows[0]['version'] != expected_version:
+                raise ChatConflictError(
+                    f"Chat {chat.id} was changed elsewhere (version {rows[0]['version']}, expected {expected_version})"
+                )
+            print(f'Error saving chat to D1: {e}')
+            raise ValueError(f"Failed to save chat: {e}")
+        except Exception as e:
+            self._stored.pop(chat.id, None)
+            self._versions.pop(chat.id, None)
+            print(f'Error saving chat to D1: {e}')
+            raise ValueError(f"Failed to save chat: {e}")
+        self._written(write)
+        self._versions[chat.id] = self._result_rows(results)[0]['version']
+        return chat
 
     async def delete_chat(self, chat_id: str) -> bool:
         """
@@ -260,76 +803,250 @@ class CloudflareD1Repository(ChatRepository):
             bool: True if the chat was deleted, False if it wasn't found
         """
         try:
-            stmt = self.db.prepare("""
-                DELETE FROM chat
-                WHERE user_prefix = ? AND chat_id = ?
-            """).bind(self.user_prefix, chat_id)
-            result = await stmt.run()
+            await self._ensure_schema_exists()
+            results = await self.db.batch(self._delete_statements(chat_id))
+            result = results[-1] if results else {}
             
             # Check if any rows were affected
-            return result.get('changes', 0) > 0
+            return result.get('meta', {}).get('changes', 0) > 0
         except Exception as e:
             print(f'Error deleting chat: {e}')
             return False
 
+    def _delete_statements(self, chat_id: str) -> List[PreparedStatement]:
+        """Build the statements deleting a chat, its messages and their index entries"""
+        self._stored.pop(chat_id, None)
+        self._versions.pop(chat_id, None)
+        return [
+            self.db.prepare(FTS_DELETE_CHAT_SQL).bind(self.user_prefix, chat_id),
+            self.db.prepare("DELETE FROM message WHERE user_prefix = ? AND chat_id = ?").bind(self.user_prefix, chat_id),
+            self.db.prepare("DELETE FROM chat WHERE user_prefix = ? AND chat_id = ?").bind(self.user_prefix, chat_id)
+        ]
+
+    def _version_statement(self, chat_id: str) -> PreparedStatement:
+        return self.db.prepare(CHAT_VERSION_SQL).bind(self.user_prefix, chat_id)
+
+    def _chat_write(self, chat: Chat, user_prefix: Optional[str] = None, prune: bool = True,
+                    update: bool = False, expected_version: Optional[int] = None) -> ChatWrite:
+        """
+        Build the statements persisting a chat.
+        
+        The header row is always written. Message rows are only written when
+        they are new or changed since the chat was last read or saved by this
+        repository; without that knowledge every message is written and, if
+        prune is set, rows of messages no longer in the chat are deleted.
+        The message_fts entries of written and deleted rows follow along.
+        With update set, the header row must already exist at
+        expected_version (any version if None), or the batch fails and
+        nothing is written.
+        
+        Args:
+            chat: The chat to persist
+            user_prefix: Prefix to store the chat under (default: the repository's)
+            prune: Delete message rows missing from the chat when nothing is known about them
+            update: Update the existing header row instead of upserting it
+            expected_version: Version the header row must have for an update
+            
+        Returns:
+            ChatWrite: Statements and approximate payload size
+        """
+        user_prefix = user_prefix or self.user_prefix
+        # Building the tree gives every message an id to key its row by
+        chat.tree
+        with phase('serialize'):
+            chat.content_hash = chat.compute_content_hash()
+            header = chat.to_dict()
+            rows = {
+                message['id']: (position, json.dumps(message))
+                for position, message in enumerate(header.pop('messages'))
+            }
+            header_json = json.dumps(header)
+            summary = ChatSummary.from_chat(chat)
+            texts = {message.id: get_message_text(message) for message in chat.messages}
+
+        if update:
+            statements = [
+                self.db.prepare(UPDATE_CHAT_SQL).bind(
+                    chat.update_time, header_json, summary.title, summary.message_count,
+                    json.dumps(summary.models), json.dumps(summary.providers), chat.content_hash,
+                    user_prefix, chat.id, expected_version, expected_version
+                ),
+                self.db.prepare(REQUIRE_CHANGE_SQL).bind(user_prefix, chat.id)
+            ]
+        else:
+            statements = [self.db.prepare(UPSERT_CHAT_SQL).bind(
+                user_prefix, chat.id, chat.create_time, chat.update_time, header_json,
+                summary.title, summary.message_count, json.dumps(summary.models), json.dumps(summary.providers),
+                chat.content_hash
+            )]
+        size = len(header_json) + STATEMENT_OVERHEAD_BYTES
+        known = self._stored.get(chat.id) if user_prefix == self.user_prefix else None
+        signatures = {}
+        upserts = []
+        # Message id -> text of every row written, for the full-text index
+        changed = {}
+        for message_id, (position, json_content) in rows.items():
+            signatures[message_id] = hash((position, json_content))
+            if known is not None and known.get(message_id) == signatures[message_id]:
+                continue
+            with phase('serialize'):
+                stored = self.codec.encode(json_content)
+            upserts.append(self.db.prepare(UPSERT_MESSAGE_SQL).bind(
+                user_prefix, chat.id, message_id, position, stored
+            ))
+            changed[message_id] = texts[message_id]
+            size += len(stored) + len(texts[message_id]) + STATEMENT_OVERHEAD_BYTES
+
+        # Index entries of replaced or removed rows go first, while their rowids still resolve
+        if known is not None:
+            removed = [message_id for message_id in known if message_id not in rows]
+            if changed or removed:
+                statements.append(self.db.prepare(FTS_DELETE_SQL).bind(
+                    user_prefix, chat.id, json.dumps(list(changed) + removed)
+                ))
+            statements.extend(upserts)
+            if removed:
+                statements.append(self.db.prepare(DELETE_MESSAGES_SQL).bind(user_prefix, chat.id, json.dumps(removed)))
+        else:
+            statements.append(self.db.prepare(FTS_DELETE_CHAT_SQL).bind(user_prefix, chat.id))
+            statements.extend(upserts)
+            if prune:
+                statements.append(self.db.prepare(PRUNE_MESSAGES_SQL).bind(user_prefix, chat.id, json.dumps(list(rows))))
+        if changed:
+            statements.append(self.db.prepare(FTS_INSERT_SQL).bind(json.dumps(changed), user_prefix, chat.id))
+        return ChatWrite(chat=chat, user_prefix=user_prefix, statements=statements, size=size, signatures=signatures)
+
+    def _written(self, write: ChatWrite) -> None:
+        """Record the message rows a successful write left in D1"""
+        if write.user_prefix == self.user_prefix:
+            self._stored[write.chat.id] = write.signatures
+
     async def save_chat(self, chat: Chat) -> Chat:
         """
         Save a chat (insert or update)
         
+        Only the header row and new or changed message rows are sent, in one
+        batch request.
+        
         Args:
             chat: The chat to save
             
         Returns:
             Chat: The saved chat
         """
+        await self._ensure_schema_exists()
         # Update the chat's update_time
-        from util import get_iso8601_timestamp
-        update_time = get_iso8601_timestamp()
-        chat.update_time = update_time
+        chat.update_time = get_iso8601_timestamp()
+        write = self._chat_write(chat)
+        add_count('chats_written')
         
         try:
-            # Insert or replace the chat in the database
-            stmt = self.db.prepare("""
-                INSERT OR REPLACE INTO chat (user_prefix, chat_id, json_content, update_time)
-                VALUES (?, ?, ?, ?)
-            """).bind(
-                self.user_prefix,
-                chat.id,
-                json.dumps(chat.to_dict()),
-                update_time
-            )
-            await stmt.run()
-            
+            results = await self.db.batch(write.statements + [self._version_statement(chat.id)])
+            self._written(write)
+            self._versions[chat.id] = self._result_rows(results)[0]['version']
             return chat
         except Exception as e:
+            self._stored.pop(chat.id, None)
+            self._versions.pop(chat.id, None)
             print(f'Error saving chat to D1: {e}')
             raise ValueError(f"Failed to save chat: {e}")
 
-    async def save_chats(self, chats: List[Chat]) -> Dict[str, int]:
+    async def save_chats(self, chats: List[Chat], skip_unchanged: bool = False) -> Dict[str, Any]:
         """
-        Save multiple chats in batch
+        Save multiple chats in batched requests
+        
+        The statements of each chat are packed into D1 batch requests of at
+        most batch_max_statements statements and batch_max_bytes bytes,
+        never splitting a chat. A batch runs as one transaction, so a failing
+        batch is split in half and retried until the failing chats are
+        isolated; a batch refused as too large also lowers batch_max_bytes
+        for the following batches. Chats keep their update_time, so migrated
+        history stays in order.
         
         Args:
             chats: Array of chats to save
+            skip_unchanged: Look up the stored content hashes first, in one
+                query, and leave out chats whose content is already stored
             
         Returns:
             Dict: Object with operation statistics
+                {
+                    'total': int,          # Number of chats given
+                    'success': int,        # Chats written
+                    'skipped': int,        # Chats left out as unchanged
+                    'failed': int,         # Chats not written
+                    'requests': int,       # Batch requests sent
+                    'failed_chats': Dict[str, str]  # Chat id -> error
+                }
         """
-        success = 0
-        failed = 0
-        
-        # In a real implementation, this would be a batch operation
-        # but for now, we'll use individual operations
+        await self._ensure_schema_exists()
+        stats = {'total': len(chats), 'success': 0, 'skipped': 0, 'failed': 0, 'requests': 0, 'failed_chats': {}}
+        if skip_unchanged and chats:
+            stored = await self.content_hashes([chat.id for chat in chats])
+            with phase('filter'):
+                changed = [chat for chat in chats if stored.get(chat.id) != chat.compute_content_hash()]
+            stats['skipped'] = len(chats) - len(changed)
+            add_count('chats_skipped', stats['skipped'])
+            chats = changed
+        writes = []
         for chat in chats:
-            try:
-                await self.save_chat(chat)
-                success += 1
-            except Exception as e:
-                print(f'Error migrating chat {chat.id}: {e}')
-                failed += 1
-        
-        return {
-            'total': len(chats),
-            'success': success,
-            'failed': failed
-        }
+            if not chat.update_time:
+                chat.update_time = get_iso8601_timestamp()
+            writes.append(self._chat_write(chat))
+        await self._write_all(writes, stats)
+        return stats
+
+    async def _write_all(self, writes: List[ChatWrite], stats: Dict[str, Any]) -> None:
+        """Pack chat writes into batches within the size limits and send them"""
+        failed = stats['failed']
+        start = 0
+        while start < len(writes):
+            end, statements, size = start, 0, 0
+            while end < len(writes):
+                write = writes[end]
+                if end > start and (statements + len(write.statements) > self.batch_max_statements
+                                    or size + write.size > self.batch_max_bytes):
+                    break
+                statements += len(write.statements)
+                size += write.size
+                end += 1
+            await self._write_batch(writes[start:end], stats)
+            start = end
+        failed = stats['failed'] - failed
+        if failed:
+            error = next(reversed(stats['failed_chats'].values()))
+            logger.warning(f"Failed to write {failed} of {len(writes)} chat(s) to D1: {error}")
+
+    async def _write_batch(self, batch: List[ChatWrite], stats: Dict[str, Any]) -> None:
+        """Send the writes of several chats as one batch, bisecting on failure"""
+        stats['requests'] += 1
+        try:
+            await self.db.batch([stmt for write in batch for stmt in write.statements])
+        except D1Error as e:
+            # With the circuit open nothing was sent, so splitting would not isolate anything
+            if len(batch) == 1 or isinstance(e, D1UnavailableError):
+                self._record_failure(batch, e, stats)
+                return
+            if isinstance(e, D1PayloadTooLargeError):
+                self.batch_max_bytes = max(MIN_BATCH_BYTES, sum(write.size for write in batch) // 2)
+            middle = len(batch) // 2
+            await self._write_batch(batch[:middle], stats)
+            await self._write_batch(batch[middle:], stats)
+            return
+        except Exception as e:
+            # Transport errors say nothing about individual chats
+            self._record_failure(batch, e, stats)
+            return
+        for write in batch:
+            self._written(write)
+            # The upsert bumped the version; the next update_chat must not expect the old one
+            if write.user_prefix == self.user_prefix:
+                self._versions.pop(write.chat.id, None)
+        stats['success'] += len(batch)
+        add_count('chats_written', len(batch))
+
+    def _record_failure(self, batch: List[ChatWrite], error: Exception, stats: Dict[str, Any]) -> None:
+        for write in batch:
+            self._stored.pop(write.chat.id, None)
+            stats['failed'] += 1
+            stats['failed_chats'][write.chat.id] = str(error)
@@ -0,0 +1,76 @@
+import base64
+import zlib
+from typing import List, Optional
+
+from loguru import logger
+
+CODECS = ['none', 'zlib', 'zstd']
+# Stored message JSON always starts with '{'; compressed content starts with its codec's marker
+MARKERS = {'zlib': 'zlib:', 'zstd': 'zstd:'}
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+class ContentCodec:
+    """
+    Transparent compression of the json_content column of D1 message rows.
+
+    Content of at least min_bytes is compressed and stored as base64 text
+    behind a format marker (`zlib:` or `zstd:`), so it stays a plain TEXT
+    parameter of the D1 API. Content that does not shrink is stored as is.
+    decode() reads every format whatever codec is configured, so rows
+    written before compression was enabled, or with another codec, stay
+    readable. zstd needs the zstandard package and falls back to zlib.
+    """
+    def __init__(self, codec: str = 'none', min_bytes: int = 1024):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown compression {codec!r}; expected one of {', '.join(CODECS)}")
+        if codec == 'zstd' and _zstandard() is None:
+            logger.warning("zstd compression for Cloudflare D1 needs the zstandard package (pip install zstandard); using zlib")
+            codec = 'zlib'
+        self.codec = codec
+        self.min_bytes = min_bytes
+        self._compressor = None
+        self._decompressor = None
+
+    def encode(self, json_content: str) -> str:
+        """Get the stored form of a message's JSON"""
+        if self.codec == 'none' or len(json_content) < self.min_bytes:
+            return json_content
+        data = json_content.encode('utf-8')
+        if self.codec == 'zstd':
+            if self._compressor is None:
+                self._compressor = _zstandard().ZstdCompressor(level=ZSTD_LEVEL)
+            compressed = self._compressor.compress(data)
+        else:
+            compressed = zlib.compress(data, ZLIB_LEVEL)
+        stored = MARKERS[self.codec] + base64.b64encode(compressed).decode('ascii')
+        return stored if len(stored) < len(json_content) else json_content
+
+    def decode(self, stored: str) -> str:
+        """
+        Get a message's JSON back from its stored form
+
+        Raises:
+            ValueError: If the content is zstd-compressed and zstandard is not installed
+        """
+        if stored.startswith(MARKERS['zlib']):
+            return zlib.decompress(base64.b64decode(stored[len(MARKERS['zlib']):])).decode('utf-8')
+        if stored.startswith(MARKERS['zstd']):
+            if self._decompressor is None:
+                zstandard = _zstandard()
+                if zstandard is None:
+                    raise ValueError("Message is zstd-compressed; reading it needs the zstandard package")
+                self._decompressor = zstandard.ZstdDecompressor()
+            return self._decompressor.decompress(base64.b64decode(stored[len(MARKERS['zstd']):])).decode('utf-8')
+        return stored
+
+def available_codecs() -> List[str]:
+    """Codecs that can run here; zstd needs the zstandard package"""
+    return [codec for codec in CODECS if codec != 'zstd' or _zstandard() is not None]
+
+def _zstandard() -> Optional[object]:
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .cloudflare_d1_util import D1Database, D1Error, PreparedStatement
+from .metrics import phase, add_count
+
+class SqliteD1Engine:
+    """
+    Execute D1 statements on SQLite and shape results like the D1 /query API.
+
+    Results are a list with one {results, success, meta} object per
+    statement. Access is serialized, so one engine can back several threads.
+    """
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    def execute(self, sql: str, params: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """Execute one statement, or a parameterless multi-statement script"""
+        start = time.perf_counter()
+        with self.lock:
+            changes_before = self.connection.total_changes
+            if not params and sqlite3.complete_statement(sql) and sql.strip().rstrip(';').count(';'):
+                self.connection.executescript(sql)
+                rows, last_row_id = [], None
+            else:
+                cursor = self.connection.execute(sql, params or [])
+                rows = [dict(row) for row in cursor.fetchall()]
+                last_row_id = cursor.lastrowid
+            self.connection.commit()
+            changes = self.connection.total_changes - changes_before
+        return [self._result(rows, changes, last_row_id, start)]
+
+    def execute_batch(self, statements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Execute {sql, params} statements in one transaction, rolling back if any fails"""
+        results = []
+        with self.lock:
+            try:
+                # Explicit, so schema changes roll back too
+                self.connection.execute("BEGIN")
+                for statement in statements:
+                    start = time.perf_counter()
+                    changes_before = self.connection.total_changes
+                    cursor = self.connection.execute(statement['sql'], statement.get('params') or [])
+                    rows = [dict(row) for row in cursor.fetchall()]
+                    changes = self.connection.total_changes - changes_before
+                    results.append(self._result(rows, changes, cursor.lastrowid, start))
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+        return results
+
+    def _result(self, rows: List[Dict[str, Any]], changes: int, last_row_id: Optional[int], start: float) -> Dict[str, Any]:
+        return {
+            'results': rows,
+            'success': True,
+            'meta': {
+                'changes': changes,
+                'last_row_id': last_row_id,
+                'rows_read': len(rows),
+                'rows_written': changes,
+                'duration': (time.perf_counter() - start) * 1000,
+            }
+        }
+
+class LocalD1Database(D1Database):
+    """
+    In-process stand-in for the Cloudflare D1 HTTP API backed by SQLite.
+
+    Statements run against a local SQLite file through SqliteD1Engine. No
+    network is involved: it backs the local mirror of a D1 store, and in
+    benchmarks timings measure the repository code and SQL rather than
+    Cloudflare.
+    """
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.base_url = f"sqlite://{path}"
+        self.headers = {}
+        self.engine = SqliteD1Engine(path)
+
+    async def aclose(self) -> None:
+        self.engine.close()
+
+    async def exec(self, sql: str) -> List[Dict[str, Any]]:
+        """Execute one or more SQL statements without parameters"""
+        return self.engine.execute(sql)
+
+    def prepare(self, sql: str) -> PreparedStatement:
+        return PreparedStatement(self, sql)
+
+    async def _execute_prepared(self, sql: str, params: List[Any], mode: str = 'query') -> List[Dict[str, Any]]:
+        with phase('request'):
+            result = self.engine.execute(sql, params)
+        add_count('requests')
+        return result
+
+    async def batch(self, statements: List[PreparedStatement], idempotent: bool = False) -> List[Dict[str, Any]]:
+        with phase('request'):
+            try:
+                result = self.engine.execute_batch([stmt.to_payload() for stmt in statements])
+            except sqlite3.Error as e:
+                raise D1Error(f"D1 execution failed: {e}")
+        add_count('requests')
+        return result
@@ -1,7 +1,69 @@
+import asyncio
 import json
+import random
+import time
+from collections import deque
 from typing import Any, Dict, List, Optional, Union
 import httpx
+from loguru import logger
 from config import config
+from .metrics import phase, add_bytes, add_count
+
+class D1Error(RuntimeError):
+    """A D1 request or statement failed"""
+
+class D1PayloadTooLargeError(D1Error):
+    """The request body exceeded what the D1 API accepts"""
+
+class D1UnavailableError(D1Error):
+    """The circuit breaker is open after repeated failures; no request was sent"""
+
+# Responses worth another attempt: rate limiting and server-side failures
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Read latencies kept for the hedging delay, and how many are needed to trust their p95
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+def is_read(sql: str) -> bool:
+    """Whether a statement only reads, so sending it twice is harmless"""
+    return sql.lstrip().upper().startswith('SELECT')
+
+class CircuitBreaker:
+    """
+    Fail fast after consecutive request failures.
+
+    After `threshold` failures in a row the circuit opens and requests are
+    refused for `cooldown` seconds. The next request after that is let
+    through as a probe: a success closes the circuit, a failure opens it
+    again. A threshold of 0 disables the breaker.
+    """
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def check(self) -> None:
+        """Raise D1UnavailableError while the circuit is open"""
+        if self.is_open:
+            add_count('circuit_rejected')
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            raise D1UnavailableError(f"D1 unavailable after {self.failures} failed requests; retrying in {remaining:.0f}s")
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.threshold and self.failures >= self.threshold and not self.is_open:
+            self.opened_at = time.monotonic()
+            add_count('circuit_opened')
+            logger.warning(f"Cloudflare D1 failed {self.failures} times in a row; pausing requests for {self.cooldown:.0f}s")
 
 class PreparedStatement:
     """A prepared SQL statement that can be executed with bound parameters"""
@@ -40,23 +102,209 @@ class PreparedStatement:
         """Execute the statement as a non-query operation"""
         return await self.d1_client._execute_prepared(self.sql, self.params, 'query')
 
+    def to_payload(self) -> Dict[str, Any]:
+        """Get the statement as a {sql, params} entry of a batch request"""
+        return {"sql": self.sql, "params": self.d1_client._process_params(self.params)}
+
 
 class D1Database:
-    """Client for interacting with Cloudflare D1 database"""
+    """
+    Client for interacting with Cloudflare D1 database
+
+    All statements go through one long-lived httpx.AsyncClient, so the TCP
+    and TLS handshake to the API is paid once per session rather than once
+    per statement. Connection limits, keep-alive expiry, timeout and HTTP/2
+    come from the cloudflare_d1 config section, as does base_url, which
+    replaces the Cloudflare endpoint (e.g. with a local D1 stand-in).
+
+    Requests failing with 429, 5xx or a timeout are retried with jittered
+    exponential backoff. Only reads (batches of SELECT statements) are
+    retried after the request may have reached D1; writes are retried only
+    when rate limited or when no connection could be made. A circuit
+    breaker fails requests fast while D1 keeps failing, and reads may be
+    hedged: a duplicate is sent once the first is slower than the p95 of
+    recent reads, and whichever answers first wins. Retries and hedges are
+    counted in the metrics of the running operation. The client is bound to the
+    event loop it was created on and is recreated when used from a new loop,
+    since commands may call asyncio.run more than once. Call aclose() (or
+    use the database as an async context manager) to release connections.
+    """
     
-    def __init__(self, account_id: Optional[str] = None, database_id: Optional[str] = None, api_token: Optional[str] = None):
-        self.account_id = account_id or config.get('cloudflare_d1', {}).get('account_id')
-        self.api_token = api_token or config.get('cloudflare_d1', {}).get('api_token')
-        self.database_id = database_id or config.get('cloudflare_d1', {}).get('database_id')
+    def __init__(self, account_id: Optional[str] = None, database_id: Optional[str] = None, api_token: Optional[str] = None,
+                 base_url: Optional[str] = None):
+        d1_config = config.get('cloudflare_d1', {})
+        self.account_id = account_id or d1_config.get('account_id')
+        self.api_token = api_token or d1_config.get('api_token')
+        self.database_id = database_id or d1_config.get('database_id')
         
         if not all([self.account_id, self.api_token, self.database_id]):
             raise ValueError("Cloudflare D1 configuration is incomplete. Please check your config.")
         
-        self.base_url = f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/d1/database/{self.database_id}"
+        self.base_url = base_url or d1_config.get('base_url') or f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/d1/database/{self.database_id}"
         self.headers = {
             "Authorization": f"Bearer {self.api_token}",
             "Content-Type": "application/json"
         }
+        self.limits = httpx.Limits(
+            max_connections=d1_config.get('max_connections', 10),
+            max_keepalive_connections=d1_config.get('max_keepalive_connections', 10),
+            keepalive_expiry=d1_config.get('keepalive_expiry', 60.0)
+        )
+        self.timeout = httpx.Timeout(d1_config.get('timeout', 30.0), connect=10.0)
+        self.http2 = bool(d1_config.get('http2', False))
+        self.retries = d1_config.get('retries', 3)
+        self.retry_backoff = d1_config.get('retry_backoff', 0.2)
+        self.retry_max_backoff = d1_config.get('retry_max_backoff', 5.0)
+        self.circuit = CircuitBreaker(
+            threshold=d1_config.get('circuit_breaker_threshold', 5),
+            cooldown=d1_config.get('circuit_breaker_cooldown', 30.0)
+        )
+        self.hedge_reads = bool(d1_config.get('hedge_reads', False))
+        self.hedge_delay_ms = d1_config.get('hedge_delay_ms', 0)
+        self.read_latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the pooled client for the running event loop, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # A client from a previous (closed) loop cannot be reused or awaited; drop it
+            http2 = self.http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning("HTTP/2 for Cloudflare D1 needs the h2 package (pip install 'httpx[http2]'); using HTTP/1.1")
+                    http2 = False
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=http2
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the pooled client and its connections"""
+        client, self._client = self._client, None
+        if client is not None and not client.is_closed:
+            try:
+                await client.aclose()
+            except RuntimeError:
+                # Created on an event loop that is already closed
+                pass
+
+    async def __aenter__(self) -> 'D1Database':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def _post(self, url: str, payload: Dict[str, Any], read: bool = False) -> httpx.Response:
+        """Send a JSON payload over the pooled client, recording request metrics"""
+        body = json.dumps(payload).encode('utf-8')
+        client = self._get_client()
+        start = time.perf_counter()
+        with phase('request'):
+            response = await client.post(url, content=body)
+        if read and response.status_code == 200:
+            self.read_latencies.append(time.perf_counter() - start)
+        add_bytes(read=len(response.content), written=len(body))
+        add_count('requests')
+        return response
+
+    async def _send(self, url: str, payload: Dict[str, Any], read: bool = False) -> Any:
+        """
+        Send a request with retries, backoff, the circuit breaker and hedging, and parse the response
+
+        Args:
+            url: Endpoint to post to
+            payload: JSON request body
+            read: Whether the request only reads, so it is safe to send again
+
+        Raises:
+            D1UnavailableError: If the circuit breaker is open
+            D1Error: If D1 answered with an error
+            httpx.TransportError: If D1 could not be reached
+        """
+        self.circuit.check()
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                if read and self.hedge_reads:
+                    response = await self._hedged_post(url, payload)
+                else:
+                    response = await self._post(url, payload, read=read)
+            except httpx.TransportError as e:
+                # A write may have been applied unless no connection was made
+                retryable = read or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUS:
+                    self.circuit.record_success()
+                    return self._parse_response(response)
+                # A rate-limited request was not run
+                retryable = read or response.status_code == 429
+                retry_after = response.headers.get('Retry-After')
+                error = None
+            self.circuit.record_failure()
+            if not retryable or attempt >= self.retries or self.circuit.is_open:
+                if error is not None:
+                    raise error
+                return self._parse_response(response)
+            delay = self._backoff(attempt, retry_after)
+            attempt += 1
+            add_count('retries')
+            logger.debug(f"Retrying D1 request in {delay:.2f}s ({attempt}/{self.retries}): "
+                         f"{error or response.status_code}")
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before a retry: Retry-After if given, else full-jitter exponential backoff"""
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.retry_max_backoff)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.retry_max_backoff, self.retry_backoff * 2 ** attempt))
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds after which a read is hedged, or None while too few reads were timed"""
+        if self.hedge_delay_ms:
+            return self.hedge_delay_ms / 1000
+        if len(self.read_latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self.read_latencies)
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    async def _hedged_post(self, url: str, payload: Dict[str, Any]) -> httpx.Response:
+        """Post a read, sending a duplicate if it is slower than the hedge delay; the first response wins"""
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._post(url, payload, read=True)
+        first = asyncio.ensure_future(self._post(url, payload, read=True))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        add_count('hedged_requests')
+        hedge = asyncio.ensure_future(self._post(url, payload, read=True))
+        pending = {first, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            add_count('hedge_wins')
+                        return task.result()
+            # Both failed
+            raise first.exception()
+        finally:
+            for task in pending:
+                task.cancel()
     
     async def exec(self, sql: str) -> Dict[str, Any]:
         """
@@ -69,25 +317,7 @@ class D1Database:
             Dict containing execution result
         """
         url = f"{self.base_url}/query"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                headers=self.headers,
-                json={
-                    "sql": sql
-                }
-            )
-            
-            response.raise_for_status()
-            result = response.json()
-            
-            if not result.get('success', False):
-                errors = result.get('errors', [])
-                error_msg = '; '.join([err.get('message', 'Unknown error') for err in errors]) if errors else 'Unknown error'
-                raise RuntimeError(f"D1 execution failed: {error_msg}")
-            
-            return result.get('result', {})
+        return await self._send(url, {"sql": sql})
     
     def prepare(self, sql: str) -> PreparedStatement:
         """
@@ -114,42 +344,65 @@ class D1Database:
             Dict containing execution result
         """
         url = f"{self.base_url}/{mode}"
+        return await self._send(url, {"sql": sql, "params": self._process_params(params)}, read=is_read(sql))
+
+    async def batch(self, statements: List[PreparedStatement], idempotent: bool = False) -> List[Dict[str, Any]]:
+        """
+        Execute several prepared statements in one request
         
-        # Convert any complex types to JSON strings
+        D1 runs a batch as a single transaction: either every statement is
+        applied or, if one fails, none is.
+        
+        Args:
+            statements: Bound prepared statements
+            idempotent: Whether the batch is safe to send again even if it may
+                have run, as reads are (e.g. CREATE TABLE IF NOT EXISTS)
+            
+        Returns:
+            List with one result object per statement
+            
+        Raises:
+            D1PayloadTooLargeError: If the request body was too large
+            D1Error: If the batch failed
+        """
+        url = f"{self.base_url}/query"
+        return await self._send(
+            url,
+            {"batch": [stmt.to_payload() for stmt in statements]},
+            read=idempotent or all(is_read(stmt.sql) for stmt in statements)
+        )
+
+    def _process_params(self, params: List[Any]) -> List[Any]:
+        """Convert any complex types to JSON strings"""
         processed_params = []
         for param in params:
             if isinstance(param, (dict, list)):
                 processed_params.append(json.dumps(param))
             else:
                 processed_params.append(param)
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                headers=self.headers,
-                json={
-                    "sql": sql,
-                    "params": processed_params
-                }
-            )
+        return processed_params
+
+    def _parse_response(self, response: httpx.Response) -> Any:
+        """Get the result of a D1 API response, raising on API and HTTP errors"""
+        try:
+            response.raise_for_status()
+            result = response.json()
+            
+            if not result.get('success', False):
+                errors = result.get('errors', [])
+                error_msg = '; '.join([err.get('message', 'Unknown error') for err in errors]) if errors else 'Unknown error'
+                raise D1Error(f"D1 execution failed: {error_msg}")
             
+            return result.get('result', {})
+        except httpx.HTTPStatusError as e:
+            error_detail = e.response.text
             try:
-                response.raise_for_status()
-                result = response.json()
-                
-                if not result.get('success', False):
-                    errors = result.get('errors', [])
-                    error_msg = '; '.join([err.get('message', 'Unknown error') for err in errors]) if errors else 'Unknown error'
-                    raise RuntimeError(f"D1 execution failed: {error_msg}")
-                
-                return result.get('result', {})
-            except httpx.HTTPStatusError as e:
-                error_detail = e.response.text
-                try:
-                    error_json = e.response.json()
-                    if 'errors' in error_json:
-                        error_detail = '; '.join([err.get('message', 'Unknown error') for err in error_json['errors']])
-                except:
-                    pass
-                
-                raise RuntimeError(f"D1 API error: {e.response.status_code}, {error_detail}")
+                error_json = e.response.json()
+                if 'errors' in error_json:
+                    error_detail = '; '.join([err.get('message', 'Unknown error') for err in error_json['errors']])
+            except:
+                pass
+            
+            if e.response.status_code == 413:
+                raise D1PayloadTooLargeError(f"D1 API error: 413, {error_detail}")
+            raise D1Error(f"D1 API error: {e.response.status_code}, {error_detail}")
@@ -1,17 +1,36 @@
-from typing import Optional
+import os
+from typing import List, Optional
 from config import config
 from . import ChatRepository
 from .file import FileRepository
 from .cloudflare_d1 import CloudflareD1Repository
+from .mirror import MirroredRepository
+from .instrumented import InstrumentedRepository, JsonlMetricsLog, MetricsSink
 
-def get_chat_repository() -> ChatRepository:
+def get_chat_repository(instrument: bool = False, sinks: Optional[List[MetricsSink]] = None) -> ChatRepository:
     """
     Factory function to get the appropriate chat repository implementation
     based on configuration.
     
+    Args:
+        instrument: Wrap the repository in an InstrumentedRepository that
+            records per-operation metrics (always done when metrics_log is set)
+        sinks: Extra callables receiving the metrics of each operation
+
     Returns:
         ChatRepository: An instance of the configured repository implementation
     """
+    repository = _create_repository()
+    metrics_log = config.get('metrics_log')
+    if instrument or sinks or metrics_log:
+        all_sinks = list(sinks or [])
+        if metrics_log:
+            all_sinks.append(JsonlMetricsLog(metrics_log))
+        return InstrumentedRepository(repository, all_sinks)
+    return repository
+
+def _create_repository() -> ChatRepository:
+    """Create the backend repository selected by storage_type"""
     # Check storage type configuration
     storage_type = config.get('storage_type', 'file')
     
@@ -20,6 +39,10 @@ def get_chat_repository() -> ChatRepository:
         required_keys = ['database_id', 'api_token']
         
         if all(key in d1_config for key in required_keys):
+            if d1_config.get('mirror'):
+                # Configs written before the mirror existed lack mirror_file
+                mirror_file = d1_config.get('mirror_file') or os.path.join(os.path.dirname(config['chat_file']), 'd1_mirror.sqlite3')
+                return MirroredRepository(CloudflareD1Repository(), mirror_file)
             return CloudflareD1Repository()
         else:
             missing = [key for key in required_keys if key not in d1_config]
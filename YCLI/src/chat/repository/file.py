@@ -1,15 +1,16 @@
 import json
 import os
 import aiofiles
-from typing import List, Optional, Dict
+from typing import AsyncIterator, List, Optional, Dict
 from datetime import datetime
 from chat.models import Chat, Message
 from config import config
 from . import ChatRepository
+from .metrics import phase, add_bytes, add_count
 
 class FileRepository(ChatRepository):
-    def __init__(self):
-        self.data_file = os.path.expanduser(config['chat_file'])
+    def __init__(self, data_file: Optional[str] = None):
+        self.data_file = os.path.expanduser(data_file or config['chat_file'])
         # Note: We don't call _ensure_file_exists() in __init__ anymore
         # since it's async and can't be called from a synchronous __init__
 
@@ -23,21 +24,40 @@ class FileRepository(ChatRepository):
     async def _read_chats(self) -> List[Chat]:
         """Read all chats from the JSONL file"""
         await self._ensure_file_exists()
-        chats = []
-        if os.path.getsize(self.data_file) > 0:
-            async with aiofiles.open(self.data_file, 'r', encoding="utf-8") as f:
-                async for line in f:
-                    if line.strip():
-                        chat_dict = json.loads(line)
-                        chats.append(Chat.from_dict(chat_dict))
+        if os.path.getsize(self.data_file) == 0:
+            return []
+        with phase('read'):
+            async with aiofiles.open(self.data_file, 'rb') as f:
+                data = await f.read()
+        add_bytes(read=len(data))
+        with phase('decode'):
+            chat_dicts = [json.loads(line) for line in data.splitlines() if line.strip()]
+        with phase('parse'):
+            chats = [Chat.from_dict(chat_dict) for chat_dict in chat_dicts]
+        add_count('chats_read', len(chats))
         return chats
 
+    async def iter_chats(self) -> AsyncIterator[Chat]:
+        """Stream chats from the JSONL file one line at a time"""
+        await self._ensure_file_exists()
+        async with aiofiles.open(self.data_file, 'r', encoding="utf-8") as f:
+            async for line in f:
+                if line.strip():
+                    yield Chat.from_dict(json.loads(line))
+
     async def _write_chats(self, chats: List[Chat]) -> None:
-        """Write all chats to the JSONL file"""
+        """Write all chats to the JSONL file, hashing chats stored without a content hash"""
         await self._ensure_file_exists()
-        async with aiofiles.open(self.data_file, 'w', encoding="utf-8") as f:
+        with phase('serialize'):
             for chat in chats:
-                await f.write(json.dumps(chat.to_dict(), ensure_ascii=False) + '\n')
+                if chat.content_hash is None:
+                    chat.content_hash = chat.compute_content_hash()
+            data = "".join(json.dumps(chat.to_dict(), ensure_ascii=False) + '\n' for chat in chats).encode('utf-8')
+        with phase('write'):
+            async with aiofiles.open(self.data_file, 'wb') as f:
+                await f.write(data)
+        add_bytes(written=len(data))
+        add_count('chats_written', len(chats))
 
     async def list_chats(self, keyword: Optional[str] = None, model: Optional[str] = None,
                    provider: Optional[str] = None, limit: int = 10) -> List[Chat]:
@@ -50,7 +70,12 @@ class FileRepository(ChatRepository):
             limit: Maximum number of chats to return (default: 10)
         """
         chats = await self._read_chats()
+        with phase('filter'):
+            return self._filter_chats(chats, keyword, model, provider, limit)
 
+    def _filter_chats(self, chats: List[Chat], keyword: Optional[str], model: Optional[str],
+                      provider: Optional[str], limit: int) -> List[Chat]:
+        """Sort chats newest first and keep those matching the filters"""
         # Sort by create_time in descending order
         chats.sort(key=lambda x: x.create_time, reverse=True)
 
@@ -104,10 +129,12 @@ class FileRepository(ChatRepository):
     async def get_chat(self, chat_id: str) -> Optional[Chat]:
         """Get a specific chat by ID"""
         chats = await self._read_chats()
-        return next((chat for chat in chats if chat.id == chat_id), None)
+        with phase('filter'):
+            return next((chat for chat in chats if chat.id == chat_id), None)
 
     async def add_chat(self, chat: Chat) -> Chat:
         """Add a new chat"""
+        chat.content_hash = chat.compute_content_hash()
         chats = await self._read_chats()
         chats.append(chat)
         await self._write_chats(chats)
@@ -115,6 +142,7 @@ class FileRepository(ChatRepository):
 
     async def update_chat(self, chat: Chat) -> Chat:
         """Update an existing chat"""
+        chat.content_hash = chat.compute_content_hash()
         chats = await self._read_chats()
         for i, existing_chat in enumerate(chats):
             if existing_chat.id == chat.id:
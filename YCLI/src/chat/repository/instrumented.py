@@ -0,0 +1,156 @@
+import json
+import os
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from chat.models import Chat, ChatSummary
+from . import ChatRepository
+from .metrics import OperationMetrics, collect
+
+MetricsSink = Callable[[OperationMetrics], None]
+
+class JsonlMetricsLog:
+    """Append each operation's metrics as one JSON line"""
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+    def __call__(self, metrics: OperationMetrics) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(metrics.to_dict(), ensure_ascii=False) + '\n')
+
+class InstrumentedRepository(ChatRepository):
+    """
+    ChatRepository wrapper that measures every operation of another repository.
+
+    Each call records its total time and result counts, plus whatever the
+    backend reports through the hooks in chat.repository.metrics: per-phase
+    timings (read, decode, parse, filter, serialize, write, request) and
+    bytes read and written. Finished metrics are kept in `history` and passed
+    to every sink, e.g. a JsonlMetricsLog or a verbose logger.
+    """
+    def __init__(self, inner: ChatRepository, sinks: Optional[List[MetricsSink]] = None):
+        """
+        Wrap a repository.
+
+        Args:
+            inner: The repository to measure
+            sinks: Callables receiving the metrics of each finished operation
+        """
+        self.inner = inner
+        self.backend = type(inner).__name__
+        self.sinks = list(sinks or [])
+        self.history: List[OperationMetrics] = []
+
+    def __getattr__(self, name):
+        # Backend-specific helpers (data_file, save_chats, db, ...) pass through
+        return getattr(self.inner, name)
+
+    def _finish(self, metrics: OperationMetrics, start: float) -> None:
+        metrics.total_ms = (time.perf_counter() - start) * 1000
+        self.history.append(metrics)
+        for sink in self.sinks:
+            sink(metrics)
+
+    async def _measure(self, operation: str, call, *args, **kwargs):
+        metrics = OperationMetrics(operation=operation, backend=self.backend)
+        start = time.perf_counter()
+        try:
+            with collect(metrics):
+                result = await call(*args, **kwargs)
+        except Exception as e:
+            metrics.error = f"{type(e).__name__}: {e}"
+            self._finish(metrics, start)
+            raise
+        if isinstance(result, list):
+            metrics.counts['chats_returned'] = len(result)
+            metrics.counts['messages_returned'] = sum(len(chat.messages) for chat in result if isinstance(chat, Chat))
+        elif isinstance(result, Chat):
+            metrics.counts['chats_returned'] = 1
+            metrics.counts['messages_returned'] = len(result.messages)
+        self._finish(metrics, start)
+        return result
+
+    async def list_chats(self, keyword: Optional[str] = None, model: Optional[str] = None,
+                         provider: Optional[str] = None, limit: int = 10) -> List[Chat]:
+        return await self._measure('list_chats', self.inner.list_chats,
+                                   keyword=keyword, model=model, provider=provider, limit=limit)
+
+    async def list_chat_summaries(self, keyword: Optional[str] = None, model: Optional[str] = None,
+                                  provider: Optional[str] = None, limit: int = 10) -> List[ChatSummary]:
+        return await self._measure('list_chat_summaries', self.inner.list_chat_summaries,
+                                   keyword=keyword, model=model, provider=provider, limit=limit)
+
+    async def get_chat(self, chat_id: str) -> Optional[Chat]:
+        return await self._measure('get_chat', self.inner.get_chat, chat_id)
+
+    async def add_chat(self, chat: Chat) -> Chat:
+        return await self._measure('add_chat', self.inner.add_chat, chat)
+
+    async def update_chat(self, chat: Chat) -> Chat:
+        return await self._measure('update_chat', self.inner.update_chat, chat)
+
+    async def delete_chat(self, chat_id: str) -> bool:
+        return await self._measure('delete_chat', self.inner.delete_chat, chat_id)
+
+    async def _read_chats(self) -> List[Chat]:
+        return await self._measure('read_chats', self.inner._read_chats)
+
+    async def _write_chats(self, chats: List[Chat]) -> None:
+        return await self._measure('write_chats', self.inner._write_chats, chats)
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+    async def iter_chats(self) -> AsyncIterator[Chat]:
+        # Phases are not collected here: the consumer runs between yields
+        metrics = OperationMetrics(operation='iter_chats', backend=self.backend)
+        start = time.perf_counter()
+        chats = messages = 0
+        try:
+            async for chat in self.inner.iter_chats():
+                chats += 1
+                messages += len(chat.messages)
+                yield chat
+        finally:
+            metrics.counts = {'chats_returned': chats, 'messages_returned': messages}
+            self._finish(metrics, start)
+
+def unwrap_repository(repository: ChatRepository) -> ChatRepository:
+    """Get the backend repository behind any instrumentation wrapper"""
+    while isinstance(repository, InstrumentedRepository):
+        repository = repository.inner
+    return repository
+
+def profile_table(history: List[OperationMetrics]) -> List[List]:
+    """
+    Aggregate operation metrics per backend operation for --profile output.
+
+    Returns:
+        List[List]: Rows of operation, calls, total ms, mean ms, phase totals,
+        bytes read and bytes written
+    """
+    groups: Dict[str, List[OperationMetrics]] = defaultdict(list)
+    for metrics in history:
+        groups[f"{metrics.backend}.{metrics.operation}"].append(metrics)
+
+    rows = []
+    for name, items in groups.items():
+        total = sum(m.total_ms for m in items)
+        phases: Dict[str, float] = defaultdict(float)
+        for m in items:
+            for phase_name, ms in m.phases.items():
+                phases[phase_name] += ms
+        rows.append([
+            name,
+            len(items),
+            f"{total:.1f}",
+            f"{total / len(items):.1f}",
+            ", ".join(f"{phase_name} {ms:.1f}" for phase_name, ms in phases.items()),
+            sum(m.bytes_read for m in items),
+            sum(m.bytes_written for m in items)
+        ])
+    return rows
+
+PROFILE_HEADERS = ["Operation", "Calls", "Total ms", "Mean ms", "Phases (ms)", "Bytes read", "Bytes written"]
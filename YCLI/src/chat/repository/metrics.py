@@ -0,0 +1,95 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from util import get_iso8601_timestamp
+
+@dataclass
+class OperationMetrics:
+    """Timings, byte counts and object counts of one repository operation"""
+    operation: str
+    backend: str
+    started_at: str = field(default_factory=get_iso8601_timestamp)
+    total_ms: float = 0.0
+    phases: Dict[str, float] = field(default_factory=dict)
+    bytes_read: int = 0
+    bytes_written: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        result = {
+            'operation': self.operation,
+            'backend': self.backend,
+            'started_at': self.started_at,
+            'total_ms': round(self.total_ms, 3),
+            'phases': {name: round(ms, 3) for name, ms in self.phases.items()},
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'counts': self.counts
+        }
+        if self.error is not None:
+            result['error'] = self.error
+        return result
+
+    def summary(self) -> str:
+        """One-line description for verbose output"""
+        phases = ", ".join(f"{name} {ms:.1f}ms" for name, ms in self.phases.items())
+        counts = ", ".join(f"{name}={value}" for name, value in self.counts.items())
+        text = f"{self.backend}.{self.operation} {self.total_ms:.1f}ms"
+        if phases:
+            text += f" ({phases})"
+        if self.bytes_read or self.bytes_written:
+            text += f" read={self.bytes_read}B written={self.bytes_written}B"
+        if counts:
+            text += f" {counts}"
+        return text
+
+# Metrics of the repository operation running in the current task, if it is instrumented
+_current: ContextVar[Optional[OperationMetrics]] = ContextVar('repository_metrics', default=None)
+
+def current_metrics() -> Optional[OperationMetrics]:
+    """Get the metrics being collected for the running operation, if any"""
+    return _current.get()
+
+@contextmanager
+def collect(metrics: OperationMetrics):
+    """Collect hook calls made while the block runs into metrics"""
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def phase(name: str):
+    """
+    Time a phase of the running operation (read, decode, parse, filter, ...).
+
+    Backends wrap their I/O and processing steps in this; it does nothing
+    unless the operation is instrumented. Repeated phases accumulate.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.phases[name] = metrics.phases.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+def add_bytes(read: int = 0, written: int = 0) -> None:
+    """Record bytes read from or written to the underlying store"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.bytes_read += read
+        metrics.bytes_written += written
+
+def add_count(name: str, value: int = 1) -> None:
+    """Increase a named object counter of the running operation"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.counts[name] = metrics.counts.get(name, 0) + value
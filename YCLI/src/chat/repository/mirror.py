@@ -0,0 +1,398 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from loguru import logger
+
+from chat.models import Chat, ChatSummary
+from util import get_iso8601_timestamp
+from . import ChatRepository
+from .cloudflare_d1 import CloudflareD1Repository
+from .cloudflare_d1_local import LocalD1Database
+
+# Bookkeeping tables kept next to the mirrored chat and message tables
+SYNC_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        user_prefix TEXT PRIMARY KEY,
+        high_water_time TEXT NOT NULL,
+        high_water_id TEXT NOT NULL,
+        synced_at TEXT
+    );
+    CREATE TABLE IF NOT EXISTS sync_pending (
+        user_prefix TEXT NOT NULL,
+        chat_id TEXT NOT NULL,
+        deleted INTEGER NOT NULL DEFAULT 0,
+        queued_at REAL NOT NULL,
+        PRIMARY KEY (user_prefix, chat_id)
+    );
+"""
+MARK_PENDING_SQL = """
+    INSERT OR REPLACE INTO sync_pending (user_prefix, chat_id, deleted, queued_at)
+    SELECT ?, value, ?, ? FROM json_each(?)
+"""
+# Only entries queued before the push started are cleared; later writes stay pending
+CLEAR_PENDING_SQL = """
+    DELETE FROM sync_pending
+    WHERE user_prefix = ? AND chat_id IN (SELECT value FROM json_each(?)) AND queued_at <= ?
+"""
+# Oldest queued changes first, in (queued_at, chat_id) order, up to the start of the push
+NEXT_PENDING_SQL = """
+    SELECT chat_id, deleted, queued_at FROM sync_pending
+    WHERE user_prefix = ? AND queued_at <= ? AND (queued_at > ? OR (queued_at = ? AND chat_id > ?))
+    ORDER BY queued_at, chat_id
+    LIMIT ?
+"""
+SYNC_PAGE_SIZE = 100
+# Queued chats pushed per round of batched requests
+PUSH_PAGE_SIZE = 50
+
+class MirroredRepository(ChatRepository):
+    """
+    Cloudflare D1 repository served from a local SQLite mirror.
+
+    The mirror has the same schema as D1, so every read runs locally with
+    the same SQL. Writes go to the mirror and queue the chat in
+    sync_pending. sync() pulls the chats updated in D1 since the last
+    high-water mark, drops chats deleted from D1 and pushes the queued
+    changes; chats with queued changes are not overwritten by a pull. A
+    mirror that was never synced is synced on first use. Both directions
+    compare content hashes first: a pull lists only the headers of updated
+    chats and fetches those whose content differs from the mirror's, so
+    chats this mirror pushed itself are not downloaded again, and a push
+    leaves out chats D1 already holds.
+
+    sync_pending is a durable outbox: a chat is queued once however often
+    it is saved, and a push uploads its latest local version, so writes
+    never wait on D1 and survive being offline. push_in_background()
+    drains the outbox without blocking the caller.
+    """
+    def __init__(self, remote: CloudflareD1Repository, mirror_file: str):
+        """
+        Mirror a D1 repository.
+
+        Args:
+            remote: The D1 repository to sync with
+            mirror_file: Path of the local SQLite mirror
+        """
+        self.remote = remote
+        self.user_prefix = remote.user_prefix
+        self.mirror_file = os.path.expanduser(mirror_file)
+        os.makedirs(os.path.dirname(self.mirror_file) or '.', exist_ok=True)
+        self.local = CloudflareD1Repository(
+            user_prefix=self.user_prefix, db=LocalD1Database(self.mirror_file), compression='none'
+        )
+        self.db = self.local.db
+        self._state_ready = False
+        self._seeded = False
+        self._push_task: Optional[asyncio.Task] = None
+        self._push_again = False
+        # Last error of the running push, reported once per drain
+        self._push_error: Optional[str] = None
+
+    async def close(self) -> None:
+        await self.remote.close()
+        await self.local.close()
+
+    async def _ensure_state(self) -> None:
+        if self._state_ready:
+            return
+        await self.local._ensure_schema_exists()
+        await self.db.exec(SYNC_SCHEMA_SQL)
+        self._state_ready = True
+
+    async def _ready(self) -> None:
+        """Prepare the mirror for reading, seeding it from D1 the first time"""
+        if self._seeded:
+            return
+        await self._ensure_state()
+        if await self.sync_state() is None:
+            try:
+                await self.sync()
+            except Exception as e:
+                # Offline: serve what the mirror has and seed on the next sync
+                logger.warning(f"Failed to sync the D1 mirror: {e}")
+                return
+        self._seeded = True
+
+    async def sync_state(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the sync state of the mirror
+
+        Returns:
+            Optional[Dict]: high_water_time, high_water_id and synced_at of
+            the last sync, or None if the mirror was never synced
+        """
+        await self._ensure_state()
+        stmt = self.db.prepare(
+            "SELECT high_water_time, high_water_id, synced_at FROM sync_state WHERE user_prefix = ?"
+        ).bind(self.user_prefix)
+        rows = self.local._result_rows(await stmt.all())
+        return rows[0] if rows else None
+
+    async def _set_sync_state(self, high_water_time: str, high_water_id: str, synced_at: Optional[str]) -> None:
+        await self.db.prepare("""
+            INSERT OR REPLACE INTO sync_state (user_prefix, high_water_time, high_water_id, synced_at)
+            VALUES (?, ?, ?, ?)
+        """).bind(self.user_prefix, high_water_time, high_water_id, synced_at).run()
+
+    async def pending(self) -> Dict[str, bool]:
+        """
+        Get the chats with local changes not yet pushed to D1
+
+        Returns:
+            Dict[str, bool]: Chat id -> whether the change is a deletion
+        """
+        await self._ensure_state()
+        stmt = self.db.prepare("SELECT chat_id, deleted FROM sync_pending WHERE user_prefix = ?").bind(self.user_prefix)
+        return {row['chat_id']: bool(row['deleted']) for row in self.local._result_rows(await stmt.all())}
+
+    @property
+    def last_push_error(self) -> Optional[str]:
+        """Error that kept changes queued in the last push, if any"""
+        return self._push_error
+
+    async def outbox_status(self) -> Dict[str, Any]:
+        """
+        Describe the queued local changes and the last sync
+
+        Returns:
+            Dict: queued_saves, queued_deletes, oldest_queued_at (ISO time or
+            None), plus high_water_time and synced_at of the last sync
+        """
+        await self._ensure_state()
+        stmt = self.db.prepare("""
+            SELECT
+                COALESCE(SUM(deleted = 0), 0) AS queued_saves,
+                COALESCE(SUM(deleted = 1), 0) AS queued_deletes,
+                MIN(queued_at) AS oldest_queued_at
+            FROM sync_pending WHERE user_prefix = ?
+        """).bind(self.user_prefix)
+        status = self.local._result_rows(await stmt.all())[0]
+        if status['oldest_queued_at'] is not None:
+            status['oldest_queued_at'] = datetime.fromtimestamp(status['oldest_queued_at']).astimezone().isoformat(timespec='seconds')
+        state = await self.sync_state() or {}
+        status['high_water_time'] = state.get('high_water_time')
+        status['synced_at'] = state.get('synced_at')
+        return status
+
+    async def _mark_pending(self, chat_ids: List[str], deleted: bool = False) -> None:
+        await self._ensure_state()
+        await self.db.prepare(MARK_PENDING_SQL).bind(
+            self.user_prefix, int(deleted), time.time(), json.dumps(chat_ids)
+        ).run()
+
+    async def sync(self) -> Dict[str, int]:
+        """
+        Pull changes from D1, then push local changes
+
+        Returns:
+            Dict: Object with operation statistics
+                {
+                    'pulled': int,     # Chats copied from D1
+                    'deleted': int,    # Chats removed because they were deleted from D1
+                    'pushed': int,     # Local changes written to D1
+                    'unchanged': int,  # Chats skipped as identical on both sides
+                    'failed': int      # Local changes that stay queued
+                }
+        """
+        await self._ensure_state()
+        stats = {'pulled': 0, 'deleted': 0, 'pushed': 0, 'unchanged': 0, 'failed': 0}
+        await self._pull(stats)
+        await self.push(stats)
+        return stats
+
+    async def _pull(self, stats: Dict[str, int]) -> None:
+        """Copy chats updated in D1 since the high-water mark and drop chats deleted there"""
+        state = await self.sync_state() or {'high_water_time': '', 'high_water_id': ''}
+        high_water_time, high_water_id = state['high_water_time'], state['high_water_id']
+        while True:
+            headers = await self.remote.chat_hashes_updated_since(high_water_time, high_water_id, SYNC_PAGE_SIZE)
+            if not headers:
+                break
+            # Read after every request, as the chat session keeps writing while a sync runs
+            pending = await self.pending()
+            local_hashes = await self.local.content_hashes([header['chat_id'] for header in headers])
+            changed = []
+            for header in headers:
+                if header['chat_id'] in pending:
+                    continue
+                if header['content_hash'] is not None and header['content_hash'] == local_hashes.get(header['chat_id']):
+                    stats['unchanged'] += 1
+                else:
+                    changed.append(header['chat_id'])
+            if changed:
+                chats = await self.remote.get_chats(changed)
+                await self.local._write_chats(chats)
+                stats['pulled'] += len(chats)
+            high_water_time, high_water_id = headers[-1]['update_time'], headers[-1]['chat_id']
+            # Saved per page, so an interrupted pull resumes where it stopped
+            await self._set_sync_state(high_water_time, high_water_id, state.get('synced_at'))
+
+        remote_ids = set(await self.remote.chat_ids())
+        pending = await self.pending()
+        for chat_id in await self.local.chat_ids():
+            if chat_id not in remote_ids and chat_id not in pending:
+                await self.local.delete_chat(chat_id)
+                stats['deleted'] += 1
+        await self._set_sync_state(high_water_time, high_water_id, get_iso8601_timestamp())
+
+    def push_in_background(self) -> None:
+        """Start draining the outbox in a background task, or make the running drain go round again"""
+        loop = asyncio.get_running_loop()
+        task = self._push_task
+        if task is not None and not task.done() and task.get_loop() is loop:
+            self._push_again = True
+            return
+        self._push_again = False
+        self._push_task = loop.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        # Runs while the prompt waits for input, so failures are logged once
+        # and otherwise left to 'sync status'
+        while True:
+            try:
+                stats = await self._push()
+            except Exception as e:
+                logger.warning(f"Failed to push chats to D1; they stay queued: {e}")
+                return
+            if stats['failed']:
+                if self._push_error:
+                    logger.warning(f"Failed to push {stats['failed']} chat(s) to D1; they stay queued: {self._push_error}")
+                return
+            if not self._push_again:
+                return
+            self._push_again = False
+
+    async def push(self, stats: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Write the queued local changes to D1
+
+        A background drain still running is waited for first, so chats are
+        not uploaded twice.
+
+        Args:
+            stats: Statistics to add to, as returned by sync()
+
+        Returns:
+            Dict: The updated statistics
+        """
+        task = self._push_task
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            await task
+        return await self._push(stats)
+
+    async def _push(self, stats: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """Push the changes queued before the call, oldest first, PUSH_PAGE_SIZE chats per round"""
+        stats = stats if stats is not None else {'pulled': 0, 'deleted': 0, 'pushed': 0, 'unchanged': 0, 'failed': 0}
+        await self._ensure_state()
+        self._push_error = None
+        started = time.time()
+        after_time, after_id = -1.0, ''
+        while True:
+            stmt = self.db.prepare(NEXT_PENDING_SQL).bind(
+                self.user_prefix, started, after_time, after_time, after_id, PUSH_PAGE_SIZE
+            )
+            rows = self.local._result_rows(await stmt.all())
+            if not rows:
+                return stats
+            after_time, after_id = rows[-1]['queued_at'], rows[-1]['chat_id']
+            await self._push_round({row['chat_id']: bool(row['deleted']) for row in rows}, started, stats)
+
+    async def _push_round(self, pending: Dict[str, bool], started: float, stats: Dict[str, int]) -> None:
+        done = []
+        saved_ids = [chat_id for chat_id, deleted in pending.items() if not deleted]
+        if saved_ids:
+            chats = await self.local.get_chats(saved_ids)
+            found = {chat.id for chat in chats}
+            # Saved and then lost locally; nothing left to push
+            done.extend(chat_id for chat_id in saved_ids if chat_id not in found)
+            # Upserts of the whole chat, so pushing a chat again after a lost response is harmless
+            try:
+                result = await self.remote.save_chats(chats, skip_unchanged=True)
+            except Exception as e:
+                # The content hash lookup failed, so nothing was written
+                self._push_error = str(e)
+                result = {'success': 0, 'skipped': 0, 'failed': len(chats),
+                          'failed_chats': {chat.id: str(e) for chat in chats}}
+            done.extend(chat.id for chat in chats if chat.id not in result['failed_chats'])
+            stats['pushed'] += result['success']
+            stats['unchanged'] += result['skipped']
+            stats['failed'] += result['failed']
+
+        deleted_ids = [chat_id for chat_id, deleted in pending.items() if deleted]
+        if deleted_ids:
+            try:
+                await self.remote._ensure_schema_exists()
+                await self.remote.db.batch([
+                    stmt for chat_id in deleted_ids for stmt in self.remote._delete_statements(chat_id)
+                ])
+                done.extend(deleted_ids)
+                stats['pushed'] += len(deleted_ids)
+            except Exception as e:
+                self._push_error = str(e)
+                stats['failed'] += len(deleted_ids)
+
+        if done:
+            # Chats queued again since the push started stay queued for the next one
+            await self.db.prepare(CLEAR_PENDING_SQL).bind(self.user_prefix, json.dumps(done), started).run()
+
+    async def list_chats(self, keyword: Optional[str] = None,
+                        model: Optional[str] = None,
+                        provider: Optional[str] = None,
+                        limit: int = 10) -> List[Chat]:
+        await self._ready()
+        return await self.local.list_chats(keyword=keyword, model=model, provider=provider, limit=limit)
+
+    async def list_chat_summaries(self, keyword: Optional[str] = None,
+                                  model: Optional[str] = None,
+                                  provider: Optional[str] = None,
+                                  limit: int = 10) -> List[ChatSummary]:
+        await self._ready()
+        return await self.local.list_chat_summaries(keyword=keyword, model=model, provider=provider, limit=limit)
+
+    async def get_chat(self, chat_id: str) -> Optional[Chat]:
+        await self._ready()
+        return await self.local.get_chat(chat_id)
+
+    async def _read_chats(self) -> List[Chat]:
+        await self._ready()
+        return await self.local._read_chats()
+
+    async def iter_chats(self) -> AsyncIterator[Chat]:
+        await self._ready()
+        async for chat in self.local.iter_chats():
+            yield chat
+
+    # Chats are queued before they are written, so a crash in between only costs a redundant push
+    async def add_chat(self, chat: Chat) -> Chat:
+        await self._mark_pending([chat.id])
+        return await self.local.add_chat(chat)
+
+    async def update_chat(self, chat: Chat) -> Chat:
+        await self._ready()
+        await self._mark_pending([chat.id])
+        return await self.local.update_chat(chat)
+
+    async def save_chat(self, chat: Chat) -> Chat:
+        await self._mark_pending([chat.id])
+        return await self.local.save_chat(chat)
+
+    async def save_chats(self, chats: List[Chat], skip_unchanged: bool = False) -> Dict[str, Any]:
+        await self._mark_pending([chat.id for chat in chats])
+        return await self.local.save_chats(chats, skip_unchanged=skip_unchanged)
+
+    async def delete_chat(self, chat_id: str) -> bool:
+        await self._ready()
+        await self._mark_pending([chat_id], deleted=True)
+        return await self.local.delete_chat(chat_id)
+
+    async def _write_chats(self, chats: List[Chat]) -> None:
+        # Chats the mirror already holds unchanged are neither queued nor written
+        stored = await self.local.content_hashes([chat.id for chat in chats])
+        changed = [chat for chat in chats if stored.get(chat.id) != chat.compute_content_hash()]
+        if changed:
+            await self._mark_pending([chat.id for chat in changed])
+            await self.local._write_chats(changed)
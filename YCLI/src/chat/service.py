@@ -2,8 +2,8 @@ from datetime import datetime
 import sys
 import os
 from typing import List, Optional, Dict
-from chat.models import Chat, Message
-from .repository import ChatRepository
+from chat.models import Chat, ChatSummary, Message
+from .repository import ChatRepository, ChatConflictError
 import time
 
 from util import get_iso8601_timestamp, get_unix_timestamp, generate_id
@@ -15,6 +15,25 @@ class ChatService:
     def __init__(self, repository: ChatRepository):
         self.repository = repository
 
+    @classmethod
+    def read_only(cls, verbose: bool = False, profile: bool = False) -> 'ChatService':
+        """Create a service over the configured chat store for commands that only read chats
+
+        Only the repository is initialized: no display, input, MCP or provider
+        code is imported, unlike going through ChatApp.
+
+        Args:
+            verbose: Log each repository operation with its timings
+            profile: Record repository metrics for a profile report
+
+        Returns:
+            A service over the configured repository
+        """
+        from .repository.factory import get_chat_repository
+        from loguru import logger
+        sinks = [lambda metrics: logger.info(metrics.summary())] if verbose else None
+        return cls(get_chat_repository(instrument=profile, sinks=sinks))
+
     def _create_timestamp(self) -> str:
         """Create an ISO format timestamp"""
         return get_iso8601_timestamp()
@@ -34,9 +53,55 @@ class ChatService:
         """
         return await self.repository.list_chats(keyword=keyword, model=model, provider=provider, limit=limit)
 
+    async def list_chat_summaries(self, keyword: Optional[str] = None, model: Optional[str] = None,
+                                  provider: Optional[str] = None, limit: int = 10) -> List[ChatSummary]:
+        """List chat metadata filtered like list_chats, without loading messages where the store allows"""
+        return await self.repository.list_chat_summaries(keyword=keyword, model=model, provider=provider, limit=limit)
+
     async def get_chat(self, chat_id: str) -> Optional[Chat]:
-        """Get a specific chat by ID"""
-        return await self.repository.get_chat(chat_id)
+        """Get a specific chat by ID, resolving the shared prefix of a forked chat
+
+        A fork whose origin chat or message is gone, deleted here or by a
+        mirror sync, is returned with its own messages only.
+        """
+        chat = await self.repository.get_chat(chat_id)
+        if chat and chat.origin_chat_id:
+            try:
+                chat.prefix_messages = await self._resolve_branch(chat.origin_chat_id, chat.origin_message_id, {chat.id})
+            except ValueError as e:
+                from loguru import logger
+                logger.warning(f"Chat {chat_id} is missing the conversation it was forked from: {str(e)}")
+        return chat
+
+    async def _resolve_branch(self, chat_id: str, message_id: str, seen: set) -> List[Message]:
+        """Get the conversation from the root down to a message, following forks upwards
+
+        Args:
+            chat_id: ID of the chat that holds the message, or one forked from it
+            message_id: ID of the last message of the conversation
+            seen: IDs of chats already visited, to stop on cyclic origins
+
+        Returns:
+            List of messages, root first
+
+        Raises:
+            ValueError: If an origin chat or message no longer exists
+        """
+        if chat_id in seen:
+            raise ValueError(f"Chat {chat_id} is its own origin")
+        seen.add(chat_id)
+        chat = await self.repository.get_chat(chat_id)
+        if not chat:
+            raise ValueError(f"Origin chat with id {chat_id} not found")
+        if message_id in chat.tree:
+            prefix = []
+            if chat.origin_chat_id:
+                prefix = await self._resolve_branch(chat.origin_chat_id, chat.origin_message_id, seen)
+            return prefix + chat.tree.path(message_id)
+        if chat.origin_chat_id:
+            # The message belongs to the prefix this chat shares with its origin
+            return await self._resolve_branch(chat.origin_chat_id, message_id, seen)
+        raise ValueError(f"Message with id {message_id} not found in chat {chat_id}")
 
     async def create_chat(self, messages: List[Message], external_id: Optional[str] = None, chat_id: Optional[str] = None) -> Chat:
         """Create a new chat with messages and optional external ID
@@ -54,25 +119,133 @@ class ChatService:
             id=chat_id if chat_id else generate_id(),
             create_time=timestamp,
             update_time=timestamp,
-            messages=[msg for msg in messages if msg.role != 'system'],
+            messages=[],
             external_id=external_id
         )
+        chat.update_messages(messages)
         return await self.repository.add_chat(chat)
 
-    async def update_chat(self, chat_id: str, messages: List[Message], external_id: Optional[str] = None) -> Chat:
-        """Update an existing chat's messages"""
-        chat = await self.get_chat(chat_id)
+    async def update_chat(self, chat_id: str, messages: List[Message], external_id: Optional[str] = None,
+                          chat: Optional[Chat] = None) -> Chat:
+        """Update an existing chat's messages
+
+        Args:
+            chat_id: ID of the chat to update
+            messages: The conversation of the branch to store
+            external_id: Optional external identifier for the chat
+            chat: The chat as last returned by this service; read again if not given
+
+        Returns:
+            The updated chat object
+        """
+        if chat is None:
+            chat = await self.get_chat(chat_id)
         if not chat:
             raise ValueError(f"Chat with id {chat_id} not found")
 
         chat.update_messages(messages)
         chat.external_id = external_id
+        try:
+            return await self.repository.update_chat(chat)
+        except ChatConflictError:
+            # Changed elsewhere since it was read: merge the branch into the latest version
+            chat = await self.get_chat(chat_id)
+            if not chat:
+                raise ValueError(f"Chat with id {chat_id} not found")
+            chat.update_messages(messages)
+            chat.external_id = external_id
+            return await self.repository.update_chat(chat)
+
+    async def fork_chat(self, chat_id: str, message_id: Optional[str] = None) -> Chat:
+        """Fork a chat at a message into a new chat
+
+        The fork only references the conversation up to the message through
+        origin_chat_id and origin_message_id; the shared prefix is not copied.
+
+        Args:
+            chat_id: ID of the chat to fork
+            message_id: ID of the last message to keep (default: last message of the active branch)
+
+        Returns:
+            The new chat, with its prefix resolved
+
+        Raises:
+            ValueError: If the chat or message is not found
+        """
+        chat = await self.get_chat(chat_id)
+        if not chat:
+            raise ValueError(f"Chat with id {chat_id} not found")
+        if message_id is None:
+            branch = chat.active_messages()
+            if not branch:
+                raise ValueError(f"Chat with id {chat_id} has no messages to fork")
+            message_id = branch[-1].id
+
+        timestamp = self._create_timestamp()
+        fork = Chat(
+            id=generate_id(),
+            create_time=timestamp,
+            update_time=timestamp,
+            messages=[],
+            origin_chat_id=chat.id,
+            origin_message_id=message_id,
+            prefix_messages=await self._resolve_branch(chat.id, message_id, set())
+        )
+        return await self.repository.add_chat(fork)
+
+    async def switch_branch(self, chat_id: str, message_id: str) -> Chat:
+        """Make the branch running through a message the active branch of a chat
+
+        Args:
+            chat_id: ID of the chat
+            message_id: ID of any message on the branch
+
+        Returns:
+            The updated chat
+
+        Raises:
+            ValueError: If the chat or message is not found
+        """
+        chat = await self.get_chat(chat_id)
+        if not chat:
+            raise ValueError(f"Chat with id {chat_id} not found")
+        chat.select_message(message_id)
         return await self.repository.update_chat(chat)
 
     async def delete_chat(self, chat_id: str) -> bool:
         """Delete a chat by ID"""
         return await self.repository.delete_chat(chat_id)
 
+    def mirror(self) -> Optional[ChatRepository]:
+        """Get the local mirror behind the repository, if reads are mirrored"""
+        from .repository.instrumented import unwrap_repository
+        from .repository.mirror import MirroredRepository
+        repository = unwrap_repository(self.repository)
+        return repository if isinstance(repository, MirroredRepository) else None
+
+    async def sync(self, pull: bool = True) -> Optional[Dict[str, int]]:
+        """Sync the local mirror with D1, or only push its local changes
+
+        Returns:
+            Sync statistics, or None if the repository is not mirrored
+        """
+        mirror = self.mirror()
+        if mirror is None:
+            return None
+        return await mirror.sync() if pull else await mirror.push()
+
+    def writes_unqueued(self) -> bool:
+        """Whether saves are requests to D1 with no local outbox to hold them while D1 is unreachable"""
+        from .repository.instrumented import unwrap_repository
+        from .repository.cloudflare_d1 import CloudflareD1Repository
+        return isinstance(unwrap_repository(self.repository), CloudflareD1Repository)
+
+    def push_in_background(self) -> None:
+        """Start pushing the mirror's queued writes to D1 without waiting for them"""
+        mirror = self.mirror()
+        if mirror is not None:
+            mirror.push_in_background()
+
     async def generate_share_html(self, chat_id: str) -> str:
         """Generate HTML file for sharing a chat using pandoc
 
@@ -96,7 +269,7 @@ class ChatService:
         md_content = f'<div class="content-wrapper">\n\n# Chat {chat_id}\n\n'
         
         msg_index = 0
-        for msg in chat.messages:
+        for msg in chat.active_messages():
             if msg.role == 'system':
                 continue
                 
@@ -60,3 +60,23 @@ def create_message(role: str, content: str, reasoning_content: Optional[str] = N
         message_data["links"] = links
 
     return Message.from_dict(message_data)
+
+def get_message_text(message: Message) -> str:
+    """Get the plain text of a message, joining structured content parts.
+
+    Args:
+        message: Message whose content may be a string or a list of content parts
+
+    Returns:
+        str: The message text
+    """
+    content = message.content
+    if isinstance(content, str):
+        return content
+    texts = []
+    for part in content:
+        if isinstance(part, dict):
+            texts.append(part.get('text', ''))
+        else:
+            texts.append(part.text)
+    return "\n".join(texts)
@@ -4,11 +4,17 @@ from cli.commands.init import init
 from cli.commands.chat.chat import chat
 from cli.commands.chat.list import list_chats
 from cli.commands.chat.share import share
+from cli.commands.chat.branches import branches
+from cli.commands.chat.search import search
+from cli.commands.chat.stats import stats
 from cli.commands.chat.import_chat import import_chats
+from cli.commands.chat.export import export
 from cli.commands.bot import bot_group
 from cli.commands.mcp import mcp_group
 from cli.commands.prompt import prompt_group
 from cli.commands.daemon import daemon_group
+from cli.commands.storage import storage_group
+from cli.commands.sync import sync_group
 from config import bot_service
 
 @click.group()
@@ -29,11 +35,17 @@ cli.add_command(init)
 cli.add_command(chat)
 cli.add_command(list_chats)
 cli.add_command(share)
+cli.add_command(branches)
+cli.add_command(search)
+cli.add_command(stats)
 cli.add_command(import_chats)
+cli.add_command(export)
 cli.add_command(bot_group)
 cli.add_command(mcp_group)
 cli.add_command(prompt_group)
 cli.add_command(daemon_group)
+cli.add_command(storage_group)
+cli.add_command(sync_group)
 
 if __name__ == "__main__":
     cli()
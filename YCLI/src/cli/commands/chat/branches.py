@@ -0,0 +1,55 @@
+import asyncio
+import click
+from tabulate import tabulate
+
+from chat.service import ChatService
+from chat.utils.message_utils import get_message_text
+from cli.commands.chat.search import make_snippet
+from cli.commands.chat.list import get_column_widths
+
+@click.command('branches')
+@click.argument('chat_id')
+def branches(chat_id: str):
+    """List the branches of a chat.
+
+    Each row is the last message of a branch and the message it branched
+    off from. Continue a branch with `y-cli chat -c CHAT_ID --branch ID`,
+    or fork the chat at any message with `y-cli chat -c CHAT_ID --fork ID`.
+    """
+    service = ChatService.read_only()
+    chat = asyncio.run(service.get_chat(chat_id))
+    if not chat:
+        click.echo(f"Error: Chat with id {chat_id} not found")
+        raise click.Abort()
+
+    if chat.origin_chat_id:
+        click.echo(f"Forked from chat {chat.origin_chat_id} at message {chat.origin_message_id} "
+                   f"({len(chat.prefix_messages)} shared message(s))")
+    if not chat.messages:
+        click.echo("No messages")
+        return
+
+    active = chat.active_messages()[-1].id
+    widths = get_column_widths()
+    table_data = []
+    for leaf in chat.tree.leaves():
+        node = chat.tree.nodes[leaf.id]
+        # Walk up to the nearest message with more than one reply
+        branch_point = node.parent
+        while branch_point is not None and len(branch_point.children) < 2:
+            branch_point = branch_point.parent
+        table_data.append([
+            "*" if leaf.id == active else "",
+            leaf.id,
+            branch_point.message.id if branch_point else "",
+            len(chat.prefix_messages) + node.depth + 1,
+            leaf.timestamp.replace('T', ' ')[:16],
+            make_snippet(f"{leaf.role}: {get_message_text(leaf)}", widths[2] + widths[3])
+        ])
+    click.echo(tabulate(
+        table_data,
+        headers=["", "ID", "Branched at", "Messages", "Updated", "Last message"],
+        tablefmt="simple",
+        numalign='left',
+        stralign='left'
+    ))
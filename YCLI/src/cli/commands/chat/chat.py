@@ -2,10 +2,8 @@ import os
 import asyncio
 import click
 from typing import Optional
-from rich.console import Console
 
-from chat.app import ChatApp
-from cli.display_manager import custom_theme
+from cli.commands.chat.profile import echo_profile
 from config import bot_service
 from loguru import logger
 
@@ -15,14 +13,27 @@ from loguru import logger
 @click.option('--model', '-m', help='OpenRouter model to use')
 @click.option('--verbose', '-v', is_flag=True, help='Show detailed usage instructions')
 @click.option('--bot', '-b', help='Use specific bot name')
-def chat(chat_id: Optional[str], latest: bool, model: Optional[str], verbose: bool = False, bot: Optional[str] = None):
+@click.option('--branch', help='Continue the branch running through this message ID')
+@click.option('--profile', is_flag=True, help='Print repository timings, bytes and counts per operation on exit')
+@click.option('--fork', 'fork_at', is_flag=False, flag_value='', default=None,
+              help='Continue in a new chat forked at this message ID (default: last message)')
+def chat(chat_id: Optional[str], latest: bool, model: Optional[str], verbose: bool = False, bot: Optional[str] = None,
+         branch: Optional[str] = None, fork_at: Optional[str] = None, profile: bool = False):
     """Start a new chat conversation or continue an existing one.
 
     Use --latest/-l to continue from your most recent chat.
     Use --chat-id/-c to continue from a specific chat ID.
     If neither option is provided, starts a new chat.
     Use --bot/-b to use a specific bot name.
+    Use --branch to switch the continued chat to another branch
+    (see `y-cli branches CHAT_ID`), or --fork to continue in a new chat
+    that shares the conversation up to a message without copying it.
+    Use --profile to see where storage time goes (read, decode, parse,
+    filter, serialize, write); --verbose logs each storage operation.
     """
+    # Imported here so read-only commands don't load provider and MCP code
+    from chat.app import ChatApp
+
     if verbose:
         logger.info("Starting chat command")
 
@@ -33,22 +44,38 @@ def chat(chat_id: Optional[str], latest: bool, model: Optional[str], verbose: bo
     bot_config.model = model or bot_config.model
 
     # Create a single ChatApp instance for all operations
-    chat_app = ChatApp(bot_config=bot_config, verbose=verbose)
+    chat_app = ChatApp(bot_config=bot_config, verbose=verbose, profile=profile)
+
+    if (branch or fork_at is not None) and not (latest or chat_id):
+        click.echo("Error: --branch and --fork require --chat-id or --latest")
+        raise click.Abort()
 
     # Handle --latest flag
     if latest:
-        chats = asyncio.run(chat_app.chat_manager.service.list_chats(limit=1))
+        chats = asyncio.run(chat_app.chat_manager.service.list_chat_summaries(limit=1))
         if not chats:
             click.echo("Error: No existing chats found")
             raise click.Abort()
         chat_id = chats[0].id
-        # Reinitialize ChatApp with the found chat_id
-        chat_app = ChatApp(bot_config=bot_config, chat_id=chat_id, verbose=verbose)
 
-    # Handle --chat-id flag
-    elif chat_id:
+    if branch or fork_at is not None:
+        service = chat_app.chat_manager.service
+        try:
+            if branch:
+                asyncio.run(service.switch_branch(chat_id, branch))
+            if fork_at is not None:
+                fork = asyncio.run(service.fork_chat(chat_id, fork_at or None))
+                if verbose:
+                    logger.info(f"Forked chat {chat_id} at message {fork.origin_message_id} into {fork.id}")
+                chat_id = fork.id
+        except ValueError as e:
+            click.echo(f"Error: {str(e)}")
+            raise click.Abort()
+
+    # Handle --chat-id flag, or the chat found by --latest / created by --fork
+    if chat_id:
         # Reinitialize ChatApp with the specified chat_id
-        chat_app = ChatApp(bot_config=bot_config, chat_id=chat_id, verbose=verbose)
+        chat_app = ChatApp(bot_config=bot_config, chat_id=chat_id, verbose=verbose, profile=profile)
 
     if verbose:
         logger.info(f"Using OpenRouter API Base URL: {bot_config.base_url}")
@@ -60,3 +87,5 @@ def chat(chat_id: Optional[str], latest: bool, model: Optional[str], verbose: bo
             logger.info("Starting new chat")
 
     asyncio.run(chat_app.chat())
+    if profile:
+        echo_profile(chat_app.repository)
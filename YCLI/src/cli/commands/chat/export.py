@@ -0,0 +1,61 @@
+import asyncio
+import json
+import os
+import time
+import click
+
+from chat.exporter.columnar_exporter import ColumnarExporter, ENGINES
+from chat.repository.factory import get_chat_repository
+
+async def export_jsonl(repository, output: str) -> int:
+    """Stream every chat into a JSONL file readable by `y-cli import`."""
+    count = 0
+    tmp_file = output + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        async for chat in repository.iter_chats():
+            f.write(json.dumps(chat.to_dict(), ensure_ascii=False) + '\n')
+            count += 1
+    os.replace(tmp_file, output)
+    return count
+
+@click.command('export')
+@click.option('--format', '-f', 'export_format', type=click.Choice(['columnar', 'jsonl']), default='columnar', help='Output format (default: columnar)')
+@click.option('--output', '-o', required=True, type=click.Path(), help='Output directory (columnar) or file (jsonl)')
+@click.option('--engine', type=click.Choice(ENGINES), default='auto', help='Columnar engine: NumPy .npy files or Arrow IPC (default: arrow if pyarrow is installed)')
+@click.option('--full', is_flag=True, help='Discard earlier columnar parts and export everything again')
+@click.option('--verbose', '-v', is_flag=True, help='Show detailed information')
+def export(export_format: str, output: str, engine: str, full: bool, verbose: bool = False):
+    """Export chat history for offline analysis.
+
+    The columnar format writes typed column files plus a manifest.json that
+    can be memory-mapped instead of parsing JSONL. Re-running the export into
+    the same directory only appends the chats changed since the last run as
+    a new part; the manifest records which part holds each chat's latest rows.
+
+    The jsonl format writes a plain chat file that `y-cli import` can read.
+    """
+    repository = get_chat_repository()
+    start = time.perf_counter()
+
+    if export_format == 'jsonl':
+        count = asyncio.run(export_jsonl(repository, os.path.expanduser(output)))
+        click.echo(f"Exported {count} chat(s) to {output}")
+        return
+
+    try:
+        exporter = ColumnarExporter(output, engine=engine, full=full)
+    except ValueError as e:
+        click.echo(f"Error: {str(e)}")
+        raise click.Abort()
+    if verbose:
+        click.echo(f"Exporting to {exporter.output_dir} with the {exporter.engine} engine")
+
+    result = asyncio.run(exporter.export(repository.iter_chats()))
+    elapsed = time.perf_counter() - start
+    if result.part is None:
+        click.echo(f"Nothing to export: {result.unchanged} chat(s) unchanged since the last export")
+        return
+    click.echo(f"Exported {result.chats} chat(s), {result.rows} message(s) to {result.part} in {elapsed:.2f}s")
+    if verbose:
+        click.echo(f"  Unchanged chats: {result.unchanged}")
+        click.echo(f"  Deleted chats: {result.deleted}")
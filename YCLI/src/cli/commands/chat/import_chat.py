@@ -6,19 +6,25 @@ from typing import Optional, Dict, List
 import click
 
 from chat.models import Chat
+from chat.index import MinHashIndex
 from chat.repository.file import FileRepository
 from config import config
 
 @click.command('import')
 @click.argument('file_path', type=click.Path(exists=True, readable=True))
+@click.option('--skip-duplicates', '-s', is_flag=True, help='Skip new chats that are near-duplicates of stored chats')
+@click.option('--threshold', '-t', default=0.8, type=click.FloatRange(0, 1), help='Similarity above which chats are near-duplicates (default: 0.8)')
 @click.option('--verbose', '-v', is_flag=True, help='Show detailed information')
-def import_chats(file_path: str, verbose: bool = False):
+def import_chats(file_path: str, skip_duplicates: bool = False, threshold: float = 0.8, verbose: bool = False):
     """Import chats from an external file.
     
     The import follows these rules:
     1. If chat ID doesn't exist, import it
-    2. If chat ID exists, compare update times and use the more recent one
-    3. Prints summary of new, existing, and replaced chats
+    2. If chat ID exists, compare update times and use the more recent one,
+       unless both copies have the same content hash
+    3. New chats that are near-duplicates of stored chats under another ID
+       are flagged, and skipped with --skip-duplicates
+    4. Prints summary of new, existing, replaced and duplicate chats
     """
     if verbose:
         click.echo(f"Importing chats from: {file_path}")
@@ -43,6 +49,12 @@ def import_chats(file_path: str, verbose: bool = False):
     new_count = 0
     existing_count = 0
     replaced_count = 0
+    duplicate_count = 0
+    skipped_count = 0
+
+    # Near-duplicate lookup, refreshed only for chats changed since the last run
+    dedup_index = MinHashIndex(config['index_dir'], threshold=threshold)
+    dedup_index.sync(current_chats)
     
     # Create a map of current chats by ID for efficient lookup and update
     current_chats_map: Dict[str, Chat] = {chat.id: chat for chat in current_chats}
@@ -50,8 +62,16 @@ def import_chats(file_path: str, verbose: bool = False):
     # Process each source chat
     for source_chat in source_chats:
         if source_chat.id not in current_chats_map:
+            matches = dedup_index.find_duplicates(source_chat)
+            if matches:
+                duplicate_count += 1
+                click.echo(f"Near-duplicate chat: {source_chat.id} ~ {matches[0].chat_id} (similarity {matches[0].similarity:.0%})")
+                if skip_duplicates:
+                    skipped_count += 1
+                    continue
             # New chat - add it to the map
             current_chats_map[source_chat.id] = source_chat
+            dedup_index.add(source_chat)
             new_count += 1
             if verbose:
                 click.echo(f"Importing new chat: {source_chat.id}")
@@ -59,6 +79,10 @@ def import_chats(file_path: str, verbose: bool = False):
             # Existing chat - check timestamps
             existing_count += 1
             current_chat = current_chats_map[source_chat.id]
+            if source_chat.compute_content_hash() == current_chat.compute_content_hash():
+                if verbose:
+                    click.echo(f"Keeping identical chat: {current_chat.id}")
+                continue
             
             # Parse timestamps to datetime for comparison
             source_time = datetime.fromisoformat(source_chat.update_time.replace('Z', '+00:00'))
@@ -77,11 +101,16 @@ def import_chats(file_path: str, verbose: bool = False):
     # Convert the map back to a list for writing
     updated_chats = list(current_chats_map.values())
     
-    # Write updated chats back to current file
-    asyncio.run(current_repo._write_chats(updated_chats))
+    # Write updated chats back to current file, unless nothing changed
+    if new_count or replaced_count:
+        asyncio.run(current_repo._write_chats(updated_chats))
+    dedup_index.save()
     
     # Print statistics
     click.echo(f"Import completed:")
     click.echo(f"  New chats: {new_count}")
     click.echo(f"  Existing chats: {existing_count}")
     click.echo(f"  Replaced chats: {replaced_count}")
+    click.echo(f"  Near-duplicate chats: {duplicate_count}")
+    if skip_duplicates:
+        click.echo(f"  Skipped duplicates: {skipped_count}")
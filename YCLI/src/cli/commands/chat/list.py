@@ -3,8 +3,8 @@ import click
 import shutil
 from tabulate import tabulate
 
-from chat.app import ChatApp
-from config import bot_service
+from chat.service import ChatService
+from cli.commands.chat.profile import echo_profile
 
 def get_column_widths():
     # Column weights (higher number = wider column)
@@ -34,7 +34,9 @@ def get_column_widths():
 @click.option('--provider', '-p', help='Filter chats by provider name')
 @click.option('--limit', '-l', default=10, help='Maximum number of chats to show (default: 10)')
 @click.option('--verbose', '-v', is_flag=True, help='Show detailed information')
-def list_chats(keyword: Optional[str], model: Optional[str], provider: Optional[str], limit: int, verbose: bool = False):
+@click.option('--profile', is_flag=True, help='Print repository timings, bytes and counts')
+def list_chats(keyword: Optional[str], model: Optional[str], provider: Optional[str], limit: int, verbose: bool = False,
+               profile: bool = False):
     """List chat conversations with optional filtering.
 
     Shows chats sorted by creation time (newest first).
@@ -58,8 +60,8 @@ def list_chats(keyword: Optional[str], model: Optional[str], provider: Optional[
         click.echo(f"Result limit: {limit}")
     import asyncio
     
-    chat_app = ChatApp(bot_config=bot_service.get_config())
-    chats = asyncio.run(chat_app.chat_manager.service.list_chats(
+    service = ChatService.read_only(verbose=verbose, profile=profile)
+    chats = asyncio.run(service.list_chats(
         keyword=keyword,
         model=model,
         provider=provider,
@@ -88,19 +90,21 @@ def list_chats(keyword: Optional[str], model: Optional[str], provider: Optional[
     # Prepare table data
     table_data = []
     for chat in chats:
+        # Messages of the active branch, not of every branch
+        chat_messages = chat.active_messages()
         # Get title from first message if available
-        if chat.messages:
-            title = chat.messages[0].content[:widths[2]]  # Use Title column width
-            if len(chat.messages[0].content) > widths[2]:
+        if chat_messages:
+            title = chat_messages[0].content[:widths[2]]  # Use Title column width
+            if len(chat_messages[0].content) > widths[2]:
                 title += "..."
         else:
             title = "No messages"
 
         # Get full context by joining all message contents
         # Limit each message content based on available width
-        msg_width = widths[3] // len(chat.messages) if chat.messages else widths[3]
+        msg_width = widths[3] // len(chat_messages) if chat_messages else widths[3]
         messages = []
-        for m in chat.messages:
+        for m in chat_messages:
             content = m.content[:msg_width]
             if len(m.content) > msg_width:
                 content += "..."
@@ -113,7 +117,7 @@ def list_chats(keyword: Optional[str], model: Optional[str], provider: Optional[
         model = "N/A"
         provider = "N/A"
         # Search messages in reverse to find the last assistant message
-        for msg in reversed(chat.messages):
+        for msg in reversed(chat_messages):
             if msg.role == "assistant":
                 if msg.model:
                     model = msg.model[:widths[4]]  # Use Model column width
@@ -140,3 +144,5 @@ def list_chats(keyword: Optional[str], model: Optional[str], provider: Optional[
         numalign='left',
         stralign='left'
     ))
+    if profile:
+        echo_profile(service.repository)
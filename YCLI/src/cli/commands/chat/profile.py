@@ -0,0 +1,18 @@
+import click
+from tabulate import tabulate
+
+from chat.repository import ChatRepository
+from chat.repository.instrumented import InstrumentedRepository, profile_table, PROFILE_HEADERS
+
+def echo_profile(repository: ChatRepository) -> None:
+    """Print the aggregated metrics of an instrumented repository (for --profile)"""
+    if not isinstance(repository, InstrumentedRepository) or not repository.history:
+        return
+    click.echo(click.style("\nRepository profile:", fg='green'))
+    click.echo(tabulate(
+        profile_table(repository.history),
+        headers=PROFILE_HEADERS,
+        tablefmt="simple",
+        numalign='left',
+        stralign='left'
+    ))
@@ -0,0 +1,107 @@
+import asyncio
+from typing import Dict, Optional
+import click
+from tabulate import tabulate
+
+from chat.index import SemanticIndex
+from chat.models import Chat
+from chat.service import ChatService
+from chat.utils.message_utils import get_message_text
+from cli.commands.chat.list import get_column_widths
+from config import config
+
+# Chats indexed per pass while streaming the store into a rebuilt index
+REBUILD_BATCH_SIZE = 200
+
+def make_snippet(text: str, width: int) -> str:
+    """Collapse whitespace and truncate text to fit a table column."""
+    text = " ".join(text.split())
+    if len(text) > width:
+        text = text[:max(0, width - 3)] + "..."
+    return text
+
+async def semantic_search(service: ChatService, index: SemanticIndex, query: str, limit: int, rebuild: bool, verbose: bool):
+    """Run a semantic search, (re)building the index first if needed."""
+    if rebuild or index.size == 0:
+        indexed = index.rebuild([])
+        chat_count = 0
+        batch = []
+        async for chat in service.repository.iter_chats():
+            chat_count += 1
+            batch.append(chat)
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                indexed += index.add_chats(batch)
+                batch = []
+        indexed += index.add_chats(batch)
+        if verbose:
+            click.echo(f"Indexed {indexed} message(s) from {chat_count} chat(s)")
+
+    hits = index.search(query, limit=limit)
+    chats: Dict[str, Optional[Chat]] = {}
+    for hit in hits:
+        if hit.chat_id not in chats:
+            chats[hit.chat_id] = await service.get_chat(hit.chat_id)
+    return hits, chats
+
+@click.command('search')
+@click.argument('query')
+@click.option('--semantic', '-s', is_flag=True, help='Rank messages by semantic similarity (offline hashed TF-IDF)')
+@click.option('--limit', '-l', default=10, help='Maximum number of results to show (default: 10)')
+@click.option('--rebuild', is_flag=True, help='Rebuild the semantic index from the chat store before searching')
+@click.option('--verbose', '-v', is_flag=True, help='Show detailed information')
+def search(query: str, semantic: bool, limit: int, rebuild: bool, verbose: bool = False):
+    """Search chat history.
+
+    By default chats are matched by keyword.
+    Use --semantic/-s to rank individual messages by similarity to QUERY
+    using the local vector index, which is updated as chats are saved.
+    Use --rebuild to re-index the whole chat store.
+    """
+    service = ChatService.read_only()
+    widths = get_column_widths()
+
+    if not semantic:
+        chats = asyncio.run(service.list_chats(keyword=query, limit=limit))
+        if not chats:
+            click.echo(f"No chats found matching '{query}'")
+            return
+        table_data = []
+        for chat in chats:
+            title = get_message_text(chat.messages[0]) if chat.messages else "No messages"
+            table_data.append([
+                chat.id,
+                f"{chat.create_time.split('T')[0]} {chat.create_time.split('T')[1][:5]}",
+                make_snippet(title, widths[2] + widths[3])
+            ])
+        click.echo(tabulate(table_data, headers=["ID", "Created", "Title"], tablefmt="simple", stralign='left'))
+        return
+
+    index = SemanticIndex(config['index_dir'])
+    hits, chats = asyncio.run(semantic_search(service, index, query, limit, rebuild, verbose))
+    if verbose:
+        click.echo(f"Searched {index.size} indexed message(s)")
+    if not hits:
+        click.echo(f"No messages found similar to '{query}'")
+        return
+
+    table_data = []
+    for hit in hits:
+        chat = chats.get(hit.chat_id)
+        if not chat or hit.message_index >= len(chat.messages):
+            # Chat was deleted or rewritten since it was indexed
+            continue
+        message = chat.messages[hit.message_index]
+        table_data.append([
+            hit.chat_id,
+            hit.message_index,
+            f"{hit.score:.3f}",
+            message.role,
+            make_snippet(get_message_text(message), widths[2] + widths[3])
+        ])
+    click.echo(tabulate(
+        table_data,
+        headers=["ID", "Msg", "Score", "Role", "Content"],
+        tablefmt="simple",
+        numalign='left',
+        stralign='left'
+    ))
@@ -3,7 +3,7 @@ import asyncio
 from typing import Optional
 import click
 
-from chat.app import ChatApp
+from chat.service import ChatService
 from config import config
 
 @click.command()
@@ -16,11 +16,11 @@ def share(chat_id: Optional[str], latest: bool, push: bool):
     Use --latest/-l to share your most recent chat.
     Use --chat-id/-c to share a specific chat ID.
     """
-    chat_app = ChatApp()
+    service = ChatService.read_only()
 
     # Handle --latest flag
     if latest:
-        chats = asyncio.run(chat_app.chat_manager.service.list_chats(limit=1))
+        chats = asyncio.run(service.list_chat_summaries(limit=1))
         if not chats:
             click.echo("Error: No chats found to share")
             raise click.Abort()
@@ -30,7 +30,7 @@ def share(chat_id: Optional[str], latest: bool, push: bool):
 
     try:
         # Generate HTML file
-        tmp_file = asyncio.run(chat_app.chat_manager.service.generate_share_html(chat_id))
+        tmp_file = asyncio.run(service.generate_share_html(chat_id))
 
         if push and (not config["s3_bucket"] or not config["cloudfront_distribution_id"]):
             click.echo("Error: S3 bucket and CloudFront distribution ID must be configured")
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Optional
+import click
+from tabulate import tabulate
+
+from chat.analytics import load_message_columns, usage_report, GROUP_BY_CHOICES, PERIOD_CHOICES
+from chat.repository.factory import get_chat_repository
+from config import config
+
+@click.command('stats')
+@click.option('--by', '-b', 'group_by', type=click.Choice(GROUP_BY_CHOICES), default='model', help='Group usage by model, provider, tool or role (default: model)')
+@click.option('--period', '-p', type=click.Choice(PERIOD_CHOICES), default='all', help='Split usage by time period (default: all)')
+@click.option('--since', '-s', type=click.DateTime(formats=['%Y-%m-%d']), help='Only count messages on or after this date (YYYY-MM-DD)')
+@click.option('--refresh', is_flag=True, help='Rebuild the cached message columns')
+@click.option('--verbose', '-v', is_flag=True, help='Show detailed information')
+def stats(group_by: str, period: str, since: Optional[datetime], refresh: bool, verbose: bool = False):
+    """Show usage statistics of chat history.
+
+    Reports message counts, characters, reasoning length and tool calls
+    per model, provider, tool (server/tool) or role, optionally per day,
+    week, month or year. Message columns are built once and cached until
+    the chat store changes.
+    """
+    start = time.perf_counter()
+    cache_file = os.path.join(config['index_dir'], 'stats_columns.npz')
+    columns = asyncio.run(load_message_columns(get_chat_repository(), cache_file, refresh=refresh))
+    loaded = time.perf_counter()
+
+    since_ms = int(since.timestamp() * 1000) if since else None
+    rows = usage_report(columns, by=group_by, period=period, since=since_ms)
+    if verbose:
+        click.echo(f"Loaded {len(columns)} message(s) in {loaded - start:.2f}s, aggregated in {time.perf_counter() - loaded:.3f}s")
+    if not rows:
+        click.echo("No messages found")
+        return
+
+    headers = ["Period"] if period != 'all' else []
+    headers += [group_by.capitalize(), "Messages", "Chats", "Chars", "Reasoning", "Tool Calls"]
+    table_data = []
+    for row in rows:
+        line = [row.period] if period != 'all' else []
+        line += [row.group or "N/A", row.messages, row.chats, row.content_chars, row.reasoning_chars, row.tool_calls]
+        table_data.append(line)
+    click.echo(tabulate(table_data, headers=headers, tablefmt="simple", numalign='left', stralign='left'))
@@ -0,0 +1,13 @@
+import click
+
+from .dedup import storage_dedup
+from .migrate import storage_migrate
+
+@click.group('storage')
+def storage_group():
+    """Inspect and maintain the chat store."""
+    pass
+
+# Register storage subcommands
+storage_group.add_command(storage_dedup)
+storage_group.add_command(storage_migrate)
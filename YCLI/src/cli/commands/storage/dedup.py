@@ -0,0 +1,90 @@
+import asyncio
+from typing import Dict, List, Tuple
+import click
+from tabulate import tabulate
+
+from chat.index import MinHashIndex
+from chat.repository import ChatRepository
+from chat.repository.factory import get_chat_repository
+from chat.utils.message_utils import get_message_text
+from config import config
+
+def find_root(parents: Dict[str, str], chat_id: str) -> str:
+    """Find the cluster root of a chat, compressing the path on the way."""
+    while parents[chat_id] != chat_id:
+        parents[chat_id] = parents[parents[chat_id]]
+        chat_id = parents[chat_id]
+    return chat_id
+
+async def scan_chats(repository: ChatRepository, index: MinHashIndex) -> Tuple[Dict[str, Tuple[str, int, str]], int]:
+    """Stream the chat store into the index, keeping only what the report shows of each chat."""
+    summaries: Dict[str, Tuple[str, int, str]] = {}
+    computed = 0
+    async for chat in repository.iter_chats():
+        title = get_message_text(chat.messages[0]) if chat.messages else ""
+        summaries[chat.id] = (chat.create_time, len(chat.messages), " ".join(title.split()))
+        if index.refresh(chat):
+            computed += 1
+    index.prune(summaries)
+    return summaries, computed
+
+@click.command('dedup')
+@click.option('--threshold', '-t', default=0.8, type=click.FloatRange(0, 1), help='Similarity above which chats are near-duplicates (default: 0.8)')
+@click.option('--verbose', '-v', is_flag=True, help='Show detailed information')
+def storage_dedup(threshold: float, verbose: bool = False):
+    """Report groups of near-duplicate chats.
+
+    Chats are compared by MinHash signatures of their message text, using
+    an LSH index that is only recomputed for chats changed since the last
+    run. Nothing is deleted; the report lists the groups to review.
+    """
+    repository = get_chat_repository()
+    index = MinHashIndex(config['index_dir'], threshold=threshold)
+    summaries, computed = asyncio.run(scan_chats(repository, index))
+    index.save()
+    if verbose:
+        click.echo(f"Scanned {len(summaries)} chat(s), computed {computed} new signature(s)")
+
+    # Union near-duplicate pairs into groups
+    parents = {chat_id: chat_id for chat_id in summaries}
+    similarities: Dict[str, float] = {}
+    for chat_id in summaries:
+        for match in index.duplicates_of(chat_id):
+            if match.chat_id not in parents:
+                continue
+            similarities[chat_id] = max(similarities.get(chat_id, 0.0), match.similarity)
+            root_a, root_b = find_root(parents, chat_id), find_root(parents, match.chat_id)
+            if root_a != root_b:
+                parents[root_b] = root_a
+
+    groups: Dict[str, List[str]] = {}
+    for chat_id in similarities:
+        groups.setdefault(find_root(parents, chat_id), []).append(chat_id)
+    groups = {root: members for root, members in groups.items() if len(members) > 1}
+    if not groups:
+        click.echo("No near-duplicate chats found")
+        return
+
+    table_data = []
+    for group_index, members in enumerate(groups.values(), start=1):
+        members.sort(key=lambda chat_id: summaries[chat_id][0])
+        for chat_id in members:
+            create_time, message_count, title = summaries[chat_id]
+            table_data.append([
+                group_index,
+                chat_id,
+                f"{create_time.split('T')[0]} {create_time.split('T')[1][:5]}",
+                message_count,
+                f"{similarities[chat_id]:.0%}",
+                title[:40] + ("..." if len(title) > 40 else "")
+            ])
+
+    click.echo(tabulate(
+        table_data,
+        headers=["Group", "ID", "Created", "Messages", "Similarity", "Title"],
+        tablefmt="simple",
+        numalign='left',
+        stralign='left'
+    ))
+    duplicates = sum(len(members) - 1 for members in groups.values())
+    click.echo(f"\n{len(groups)} group(s), {duplicates} redundant chat(s)")
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+import click
+
+from chat.models import Chat
+from chat.repository.cloudflare_d1 import CloudflareD1Repository
+from chat.repository.file import FileRepository
+from chat.repository.metrics import OperationMetrics, collect
+from config import config
+
+TARGETS = ['cloudflare_d1']
+
+class MigrationCheckpoint:
+    """
+    Journal of the chats a migration has uploaded, for resuming it.
+
+    A JSONL file: a header line naming the source and target, then one
+    {id, update_time} line per uploaded chat, appended as each batch
+    completes. Chats whose update_time still matches are skipped on the
+    next run; chats changed since are uploaded again. A header for another
+    source or target starts the journal over.
+    """
+    def __init__(self, path: str, header: Dict[str, str]):
+        self.path = path
+        self.header = header
+        self.done: Dict[str, str] = {}
+
+    def load(self) -> int:
+        """Read the journal, returning the number of chats already uploaded"""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        if not lines or lines[0] != json.dumps(self.header, sort_keys=True):
+            return 0
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interruption
+                continue
+            self.done[entry['id']] = entry['update_time']
+        return len(self.done)
+
+    def start(self) -> None:
+        """Begin a fresh journal unless the loaded one is being resumed"""
+        if self.done:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.header, sort_keys=True) + '\n')
+
+    def is_done(self, chat: Chat) -> bool:
+        return self.done.get(chat.id) == chat.update_time
+
+    def record(self, chats: List[Chat]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps({'id': chat.id, 'update_time': chat.update_time}) + '\n' for chat in chats))
+        for chat in chats:
+            self.done[chat.id] = chat.update_time
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+async def migrate_chats(source, target: CloudflareD1Repository, checkpoint: MigrationCheckpoint,
+                        batch_size: int = 100, concurrency: int = 4,
+                        progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Stream chats from source and upload them to target in concurrent batches.
+
+    A bounded queue sits between the reader and `concurrency` upload
+    workers, so at most a few batches are held in memory however large
+    the source is. Each worker uploads a batch with save_chats, which
+    packs it into D1 batch requests, then records it in the checkpoint.
+
+    Chats D1 already holds with the same content hash are left out, so
+    migrating an unchanged history again only costs the hash lookups.
+
+    Returns:
+        Dict: Counts of chats read, skipped by the checkpoint, migrated,
+        unchanged and failed, with the failed chat ids mapped to their errors
+    """
+    stats = {'read': 0, 'skipped': 0, 'migrated': 0, 'unchanged': 0, 'failed': 0, 'failed_chats': {}}
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+
+    async def upload():
+        while True:
+            batch = await queue.get()
+            try:
+                if batch is None:
+                    return
+                try:
+                    result = await target.save_chats(batch, skip_unchanged=True)
+                except Exception as e:
+                    # The reader would wait on a full queue if a worker died
+                    result = {'success': 0, 'skipped': 0, 'failed': len(batch),
+                              'failed_chats': {chat.id: str(e) for chat in batch}}
+                checkpoint.record([chat for chat in batch if chat.id not in result['failed_chats']])
+                stats['migrated'] += result['success']
+                stats['unchanged'] += result['skipped']
+                stats['failed'] += result['failed']
+                stats['failed_chats'].update(result['failed_chats'])
+                if progress:
+                    progress(stats)
+            finally:
+                queue.task_done()
+
+    # Before the workers start, so they do not all create or migrate the schema at once
+    await target._ensure_schema_exists()
+    workers = [asyncio.create_task(upload()) for _ in range(concurrency)]
+    try:
+        batch = []
+        async for chat in source.iter_chats():
+            stats['read'] += 1
+            if checkpoint.is_done(chat):
+                stats['skipped'] += 1
+                continue
+            batch.append(chat)
+            if len(batch) >= batch_size:
+                await queue.put(batch)
+                batch = []
+        if batch:
+            await queue.put(batch)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for worker in workers:
+            worker.cancel()
+    return stats
+
+@click.command('migrate')
+@click.option('--to', 'target_type', required=True, type=click.Choice(TARGETS), help='Storage to migrate chats into')
+@click.option('--source', type=click.Path(exists=True, dir_okay=False), help='Chat file to migrate (default: the configured chat_file)')
+@click.option('--batch-size', '-b', default=100, type=click.IntRange(1), help='Chats per upload batch (default: 100)')
+@click.option('--concurrency', '-c', default=4, type=click.IntRange(1), help='Batches uploaded at once (default: 4)')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an interrupted migration and start over')
+@click.option('--verbose', '-v', is_flag=True, help='Show progress after every batch')
+def storage_migrate(target_type: str, source: Optional[str], batch_size: int, concurrency: int,
+                    restart: bool, verbose: bool = False):
+    """Migrate chats from the JSONL chat file into Cloudflare D1.
+
+    Chats are streamed from the file and uploaded in batches, several at
+    once. Progress is checkpointed, so an interrupted migration resumes
+    where it stopped when run again; chats changed since are uploaded
+    again. Existing D1 chats with the same id are overwritten, unless
+    their content hash shows they are identical. Set storage_type to
+    cloudflare_d1 afterwards to use the migrated store.
+    """
+    source_repo = FileRepository()
+    if source:
+        source_repo.data_file = os.path.expanduser(source)
+    try:
+        target = CloudflareD1Repository()
+    except ValueError as e:
+        click.echo(f"Error: {str(e)}")
+        raise click.Abort()
+
+    checkpoint = MigrationCheckpoint(
+        os.path.join(os.path.dirname(config['chat_file']), f"migrate_{target_type}.checkpoint.jsonl"),
+        {'source': os.path.abspath(source_repo.data_file), 'target': target_type, 'user_prefix': target.user_prefix}
+    )
+    if restart:
+        checkpoint.remove()
+    resumed = checkpoint.load()
+    if resumed:
+        click.echo(f"Resuming: {resumed} chat(s) already migrated")
+    checkpoint.start()
+
+    start = time.perf_counter()
+
+    def report(stats: Dict):
+        if verbose:
+            rate = stats['migrated'] / max(time.perf_counter() - start, 1e-9)
+            click.echo(f"  {stats['migrated']} migrated, {stats['failed']} failed ({rate:.0f} chats/s)")
+
+    async def run():
+        try:
+            return await migrate_chats(source_repo, target, checkpoint, batch_size, concurrency, report)
+        finally:
+            await target.close()
+
+    metrics = OperationMetrics(operation='migrate', backend=target_type)
+    with collect(metrics):
+        stats = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    click.echo(
+        f"Migrated {stats['migrated']} chat(s) in {elapsed:.1f}s "
+        f"({stats['migrated'] / max(elapsed, 1e-9):.0f} chats/s, "
+        f"{metrics.bytes_written / 1024 / 1024 / max(elapsed, 1e-9):.2f} MB/s uploaded, "
+        f"{metrics.counts.get('requests', 0)} request(s))"
+    )
+    if stats['skipped']:
+        click.echo(f"Skipped {stats['skipped']} chat(s) migrated by an earlier run")
+    if stats['unchanged']:
+        click.echo(f"Skipped {stats['unchanged']} chat(s) already in {target_type} with the same content")
+    if stats['failed']:
+        click.echo(f"{stats['failed']} chat(s) failed; run the command again to retry them")
+        return
+    checkpoint.remove()
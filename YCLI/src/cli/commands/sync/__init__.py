@@ -0,0 +1,39 @@
+import asyncio
+import click
+
+from chat.service import ChatService
+from .status import sync_status
+
+async def run_sync(service: ChatService):
+    """Sync the local mirror with D1 and release the connections."""
+    try:
+        return await service.sync()
+    finally:
+        await service.repository.close()
+
+@click.group('sync', invoke_without_command=True)
+@click.pass_context
+def sync_group(ctx):
+    """Sync the local mirror of a Cloudflare D1 chat store.
+
+    Pulls chats changed in D1 since the last sync, then pushes chats
+    changed locally. Requires cloudflare_d1.mirror to be enabled.
+    Use 'sync status' to see the queued local changes.
+    """
+    if ctx.invoked_subcommand is not None:
+        return
+    service = ChatService.read_only()
+    if service.mirror() is None:
+        click.echo("Error: sync needs storage_type 'cloudflare_d1' with cloudflare_d1.mirror enabled")
+        raise click.Abort()
+    stats = asyncio.run(run_sync(service))
+    click.echo(f"Pulled {stats['pulled']} chat(s), removed {stats['deleted']} deleted in D1, pushed {stats['pushed']} local change(s)")
+    if stats['unchanged']:
+        click.echo(f"Skipped {stats['unchanged']} chat(s) with identical content on both sides")
+    if stats['failed']:
+        click.echo(f"{stats['failed']} local change(s) failed to push and stay queued")
+        if service.mirror().last_push_error:
+            click.echo(f"Last error: {service.mirror().last_push_error}")
+
+# Register sync subcommands
+sync_group.add_command(sync_status)
@@ -0,0 +1,40 @@
+import asyncio
+import click
+from tabulate import tabulate
+
+from chat.service import ChatService
+
+async def read_status(service: ChatService):
+    """Read the outbox status of the mirror without contacting D1."""
+    try:
+        return await service.mirror().outbox_status()
+    finally:
+        await service.repository.close()
+
+@click.command('status')
+def sync_status():
+    """Show the queue of local changes waiting to be pushed to D1.
+
+    Only a mirrored store (cloudflare_d1.mirror enabled) queues writes.
+    Without the mirror, each save goes straight to D1, and this command
+    says so instead.
+    """
+    service = ChatService.read_only()
+    mirror = service.mirror()
+    if mirror is None:
+        if service.writes_unqueued():
+            click.echo("Saves go straight to D1 and nothing is queued: a chat turn is not saved while D1 is unreachable.")
+            click.echo("Enable cloudflare_d1.mirror to queue saves locally and push them in the background.")
+            return
+        click.echo("Error: sync needs storage_type 'cloudflare_d1' with cloudflare_d1.mirror enabled")
+        raise click.Abort()
+    status = asyncio.run(read_status(service))
+    table_data = [
+        ["Queued saves", status['queued_saves']],
+        ["Queued deletes", status['queued_deletes']],
+        ["Oldest queued", status['oldest_queued_at'] or "-"],
+        ["Last sync", status['synced_at'] or "never"],
+        ["Synced up to", status['high_water_time'] or "-"],
+        ["Mirror", mirror.mirror_file],
+    ]
+    click.echo(tabulate(table_data, tablefmt="simple", numalign='left', stralign='left'))
@@ -27,13 +27,50 @@ def get_default_config():
         "openrouter_import_dir": f"{base_dir}/openrouter_import",
         "openrouter_import_history": f"{base_dir}/openrouter_import_history.jsonl",
         "tmp_dir": f"{cache_dir}/tmp",
+        "index_dir": f"{base_dir}/index",
+        # Append per-operation repository metrics to this JSONL file (empty to disable)
+        "metrics_log": "",
         
+        # Pooled HTTP connections to chat providers, shared per base_url across turns (http2 needs the h2 package)
+        "provider_http": {
+            "http2": False,
+            "max_connections": 10,
+            "max_keepalive_connections": 10,
+            "keepalive_expiry": 120.0,
+            # Open a connection to the bot's base_url (and refresh Topia tokens) while the prompt waits for input
+            "prewarm": False
+        },
+
         # Cloudflare configuration
         "cloudflare_d1": {
             "account_id": "",
             "database_id": "",
             "api_token": "",
-            "user_prefix": "default"
+            "user_prefix": "default",
+            # Override the D1 API endpoint, e.g. a local stand-in (python -m benchmark d1-server)
+            "base_url": "",
+            # Pooled HTTP client settings (http2 needs the h2 package)
+            "http2": False,
+            "max_connections": 10,
+            # Limits of one batched write request; the byte limit shrinks if D1 refuses a payload
+            "batch_max_statements": 50,
+            "batch_max_bytes": 921600,
+            # Retries with jittered exponential backoff (seconds); writes are only retried when D1 cannot have run them
+            "retries": 3,
+            "retry_backoff": 0.2,
+            "retry_max_backoff": 5.0,
+            # Refuse requests for the cooldown (seconds) after this many failures in a row (0 disables)
+            "circuit_breaker_threshold": 5,
+            "circuit_breaker_cooldown": 30.0,
+            # Send a duplicate read when the first is slower than hedge_delay_ms (0: the p95 of recent reads)
+            "hedge_reads": False,
+            "hedge_delay_ms": 0,
+            # Compress message JSON of at least compression_min_bytes: none, zlib or zstd (needs zstandard)
+            "compression": "none",
+            "compression_min_bytes": 1024,
+            # Serve reads from a local SQLite mirror synced with D1 (y-cli sync)
+            "mirror": False,
+            "mirror_file": f"{base_dir}/d1_mirror.sqlite3"
         },
         
         # Other settings
@@ -70,7 +107,7 @@ def load_config():
                     config[key] = value
 
     # Set up data files
-    for file_key in ["chat_file", "bot_config_file", "mcp_config_file", "prompt_config_file", "tmp_dir"]:
+    for file_key in ["chat_file", "bot_config_file", "mcp_config_file", "prompt_config_file", "tmp_dir", "index_dir"]:
         config[file_key] = os.path.expanduser(config[file_key])
         os.makedirs(os.path.dirname(config[file_key]), exist_ok=True)
 
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from chat.models import Chat
+from chat.repository.file import FileRepository
+from chat.service import ChatService
+
+# A chat stored before messages had ids
+LEGACY_CHAT = {
+    'id': 'abc123',
+    'create_time': '2025-01-01T10:00:00+00:00',
+    'update_time': '2025-01-01T10:02:00+00:00',
+    'messages': [
+        {'role': 'user', 'content': 'hello', 'timestamp': '2025-01-01T10:00:00+00:00', 'unix_timestamp': 1735725600000},
+        {'role': 'assistant', 'content': 'hi', 'timestamp': '2025-01-01T10:01:00+00:00', 'unix_timestamp': 1735725660000},
+        {'role': 'user', 'content': 'bye', 'timestamp': '2025-01-01T10:02:00+00:00', 'unix_timestamp': 1735725720000},
+    ],
+}
+
+def _legacy_repository(tmp_path) -> FileRepository:
+    data_file = tmp_path / 'chat.jsonl'
+    data_file.write_text(json.dumps(LEGACY_CHAT) + '\n', encoding='utf-8')
+    return FileRepository(data_file=str(data_file))
+
+def test_legacy_message_ids_are_stable_across_loads():
+    first = Chat.from_dict(LEGACY_CHAT)
+    second = Chat.from_dict(LEGACY_CHAT)
+    assert [m.id for m in first.active_messages()] == [m.id for m in second.active_messages()]
+    assert [m.parent_id for m in first.active_messages()] == [None, first.messages[0].id, first.messages[1].id]
+
+def test_fork_legacy_chat_by_id_from_earlier_load(tmp_path):
+    async def run():
+        repository = _legacy_repository(tmp_path)
+        shown = await ChatService(repository).get_chat('abc123')
+        message_id = shown.active_messages()[1].id
+
+        # A later run reads the chat again
+        fork = await ChatService(FileRepository(data_file=repository.data_file)).fork_chat('abc123', message_id)
+        assert [m.content for m in fork.prefix_messages] == ['hello', 'hi']
+        assert fork.origin_message_id == message_id
+    asyncio.run(run())
+
+def test_legacy_chat_hashes_like_its_stored_copy():
+    # A backend stores the chat with the ids its tree gave the messages
+    written = Chat.from_dict(LEGACY_CHAT)
+    written.tree
+    stored = Chat.from_dict(written.to_dict())
+    assert all(m.id for m in stored.messages)
+    assert Chat.from_dict(LEGACY_CHAT).compute_content_hash() == stored.compute_content_hash()
+
+def test_fork_readable_after_origin_deleted(tmp_path):
+    async def run():
+        service = ChatService(_legacy_repository(tmp_path))
+        fork = await service.fork_chat('abc123')
+        await service.delete_chat('abc123')
+
+        reread = await service.get_chat(fork.id)
+        assert reread.prefix_messages == []
+        assert reread.origin_chat_id == 'abc123'
+    asyncio.run(run())